@@ -9,6 +9,7 @@ interface EnvConfig {
     DATABASE_URL: string;
     LLM_BACKEND_URL: string;
     EMBEDDING_MODEL: string;
+    LLM_LOCAL_SEARCH: boolean;
 }
 
 function validateEnv(): EnvConfig {
@@ -34,6 +35,8 @@ function validateEnv(): EnvConfig {
         DATABASE_URL: databaseUrl,
         LLM_BACKEND_URL: process.env.LLM_BACKEND_URL || 'http://localhost:8000',
         EMBEDDING_MODEL: process.env.EMBEDDING_MODEL || 'nomic-embed-text',
+        // Use the llm_backend vector index (/rag/search) instead of pgvector for retrieval
+        LLM_LOCAL_SEARCH: process.env.LLM_LOCAL_SEARCH === 'true',
     };
 }
 
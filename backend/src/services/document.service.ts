@@ -1,6 +1,8 @@
 import fs from 'fs';
 import { NotFoundError } from '../common/errors';
+import { config } from '../config/env';
 import { pool } from '../db/pool';
+import { deleteDocumentVectors } from './llm_backend.service';
 
 export interface CreateDocumentDTO {
     title: string;
@@ -76,4 +78,12 @@ export async function deleteDocument(userId: string, docId: string) {
     } catch (e) {
         console.error('Failed to delete file from disk:', e);
     }
+
+    if (config.LLM_LOCAL_SEARCH) {
+        try {
+            await deleteDocumentVectors(docId);
+        } catch (e) {
+            console.error('Failed to delete local vector index:', e);
+        }
+    }
 }
@@ -9,12 +9,15 @@ import { fromPath as pdfToPic } from 'pdf2pic';
 import { createWorker } from 'tesseract.js';
 import textract from 'textract';
 import xlsx from 'xlsx';
+import { config } from '../config/env';
 import { pool } from '../db/pool';
 import {
     answerWithContext,
     embedTexts,
     generateFlashcards as llmGenerateFlashcards,
     generateQuiz as llmGenerateQuiz,
+    indexDocumentVectors,
+    searchDocument,
 } from './llm_backend.service';
 
 const CHUNK_WORDS = 500;
@@ -75,6 +78,13 @@ export async function indexDocument(params: {
         );
 
         let processed = 0;
+        const localIndexChunks: Array<{
+            id: string;
+            text: string;
+            index: number;
+            metadata: any;
+            embedding: number[];
+        }> = [];
 
         for (let start = 0; start < chunks.length; start += EMBEDDING_BATCH_SIZE) {
             const batch = chunks.slice(start, start + EMBEDDING_BATCH_SIZE);
@@ -122,12 +132,28 @@ export async function indexDocument(params: {
                 );
             });
 
-            await pool.query(
+            const inserted = await pool.query(
                 `INSERT INTO document_chunks (document_id, chunk_text, chunk_index, metadata, embedding)
-                 VALUES ${placeholders.join(',')}`,
+                 VALUES ${placeholders.join(',')}
+                 RETURNING id, chunk_index`,
                 values
             );
 
+            if (config.LLM_LOCAL_SEARCH) {
+                const idsByIndex = new Map<number, string>(
+                    inserted.rows.map((r: { id: string; chunk_index: number }) => [r.chunk_index, r.id])
+                );
+                batch.forEach((chunk, index) => {
+                    localIndexChunks.push({
+                        id: idsByIndex.get(chunk.index)!,
+                        text: chunk.text,
+                        index: chunk.index,
+                        metadata: chunk.metadata,
+                        embedding: embeddings[index],
+                    });
+                });
+            }
+
             processed += batch.length;
             const progress = processed / totalChunks;
             await pool.query(
@@ -139,6 +165,15 @@ export async function indexDocument(params: {
             await new Promise((resolve) => setTimeout(resolve, 150));
         }
 
+        if (config.LLM_LOCAL_SEARCH) {
+            try {
+                await indexDocumentVectors(params.documentId, localIndexChunks);
+            } catch (error) {
+                // pgvector still has the chunks; chatWithDocument falls back to it.
+                console.warn('Local vector index update failed:', error);
+            }
+        }
+
         await pool.query(
             `UPDATE documents
              SET status = 'ready', total_chunks = $2, indexed_at = NOW(), error_message = NULL, processing_progress = 1.00, summary = $3
@@ -151,13 +186,29 @@ export async function indexDocument(params: {
     }
 }
 
-export async function chatWithDocument(params: {
-    documentId: string;
-    question: string;
-    docTitle: string;
-    history?: Array<{ role: string; content: string }>;
-}): Promise<{ answer: string; sources: RagSource[] }> {
-    const [queryEmbedding] = await embedTexts([params.question]);
+type RetrievedChunk = {
+    id: string;
+    chunk_text: string;
+    chunk_index: number;
+    metadata: any;
+};
+
+async function retrieveChunks(documentId: string, question: string): Promise<RetrievedChunk[]> {
+    if (config.LLM_LOCAL_SEARCH) {
+        try {
+            const hits = await searchDocument(documentId, question, TOP_K);
+            return hits.map((h) => ({
+                id: h.id,
+                chunk_text: h.text,
+                chunk_index: h.index,
+                metadata: h.metadata,
+            }));
+        } catch (error) {
+            console.warn('Local vector search failed, falling back to pgvector:', error);
+        }
+    }
+
+    const [queryEmbedding] = await embedTexts([question], true);
     const vector = `[${queryEmbedding.join(',')}]`;
 
     const res = await pool.query(
@@ -166,15 +217,19 @@ export async function chatWithDocument(params: {
          WHERE document_id = $1
          ORDER BY embedding <=> $2::vector
          LIMIT $3`,
-        [params.documentId, vector, TOP_K]
+        [documentId, vector, TOP_K]
     );
 
-    const chunks = res.rows as Array<{
-        id: string;
-        chunk_text: string;
-        chunk_index: number;
-        metadata: any;
-    }>;
+    return res.rows as RetrievedChunk[];
+}
+
+export async function chatWithDocument(params: {
+    documentId: string;
+    question: string;
+    docTitle: string;
+    history?: Array<{ role: string; content: string }>;
+}): Promise<{ answer: string; sources: RagSource[] }> {
+    const chunks = await retrieveChunks(params.documentId, params.question);
 
     if (chunks.length === 0) {
         return {
@@ -5,6 +5,30 @@ interface EmbeddingResponse {
     embeddings: number[][];
 }
 
+interface PackedEmbeddingResponse {
+    encoding: 'float32';
+    count: number;
+    dims: number;
+    data: string; // base64, little-endian float32, row-major
+}
+
+function unpackEmbeddings(packed: PackedEmbeddingResponse): number[][] {
+    const buffer = Buffer.from(packed.data, 'base64');
+    if (buffer.length !== packed.count * packed.dims * 4) {
+        throw new Error('Embedding error: packed payload size mismatch');
+    }
+    const vectors: number[][] = [];
+    for (let row = 0; row < packed.count; row += 1) {
+        const vector = new Array<number>(packed.dims);
+        const offset = row * packed.dims * 4;
+        for (let i = 0; i < packed.dims; i += 1) {
+            vector[i] = buffer.readFloatLE(offset + i * 4);
+        }
+        vectors.push(vector);
+    }
+    return vectors;
+}
+
 interface RagAnswerResponse {
     answer: string;
 }
@@ -13,21 +37,34 @@ interface ChatResponse {
     answer: string;
 }
 
-export async function embedTexts(texts: string[]): Promise<number[][]> {
+export interface LocalSearchHit {
+    id: string;
+    text: string;
+    index: number;
+    metadata: any;
+    score: number;
+}
+
+export async function embedTexts(texts: string[], interactive = false): Promise<number[][]> {
     let lastError: Error | null = null;
     for (let attempt = 1; attempt <= 3; attempt += 1) {
         try {
             const response = await fetch(`${config.LLM_BACKEND_URL}/rag/embeddings`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ texts }),
+                // Packed float32 is ~3x smaller than decimal JSON and cheaper to parse.
+                // interactive: a user is waiting, so the backend schedules it ahead of bulk indexing.
+                body: JSON.stringify({ texts, encoding: 'float32', interactive }),
             });
             if (!response.ok) {
                 const body = await response.text();
                 throw new Error(`Embedding error: ${response.status} ${body}`);
             }
-            const data = (await response.json()) as EmbeddingResponse;
-            return data.embeddings;
+            const data = (await response.json()) as EmbeddingResponse | PackedEmbeddingResponse;
+            if ('embeddings' in data) {
+                return data.embeddings;
+            }
+            return unpackEmbeddings(data);
         } catch (error) {
             lastError = error instanceof Error ? error : new Error('Embedding request failed');
             if (attempt < 3) {
@@ -38,6 +75,53 @@ export async function embedTexts(texts: string[]): Promise<number[][]> {
     throw lastError!;
 }
 
+export async function indexDocumentVectors(
+    documentId: string,
+    chunks: Array<{ id: string; text: string; index: number; metadata: any; embedding: number[] }>
+): Promise<void> {
+    const response = await fetch(`${config.LLM_BACKEND_URL}/rag/index/${documentId}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ chunks }),
+    });
+
+    if (!response.ok) {
+        const body = await response.text();
+        throw new Error(`LLM index error: ${response.status} ${body}`);
+    }
+}
+
+export async function deleteDocumentVectors(documentId: string): Promise<void> {
+    const response = await fetch(`${config.LLM_BACKEND_URL}/rag/index/${documentId}`, {
+        method: 'DELETE',
+    });
+
+    if (!response.ok) {
+        const body = await response.text();
+        throw new Error(`LLM index delete error: ${response.status} ${body}`);
+    }
+}
+
+export async function searchDocument(
+    documentId: string,
+    query: string,
+    topK: number
+): Promise<LocalSearchHit[]> {
+    const response = await fetch(`${config.LLM_BACKEND_URL}/rag/search`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ document_id: documentId, query, top_k: topK }),
+    });
+
+    if (!response.ok) {
+        const body = await response.text();
+        throw new Error(`LLM search error: ${response.status} ${body}`);
+    }
+
+    const data = (await response.json()) as { hits: LocalSearchHit[] };
+    return data.hits;
+}
+
 export async function answerWithContext(
     question: string,
     context: string,
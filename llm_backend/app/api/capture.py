@@ -0,0 +1,157 @@
+import json
+import os
+import time
+
+from app.api.metrics import route_template
+from app.core.config import CAPTURE_BLOB_CHARS, CAPTURE_DIR, CAPTURE_MAX_FILE_BYTES
+from app.core.logger import LOG_DIR
+from app.services.capture import TrafficRecorder
+
+# Request headers that change the response and so are needed for replay.
+_REPLAY_HEADERS = ("accept", "content-type")
+
+
+class CaptureMiddleware:
+    """
+    Records each request under one of `paths` with its response and timings
+    (see TrafficRecorder). Response bodies are kept up to `max_body` bytes;
+    streamed responses are captured whole, up to the same limit.
+    """
+
+    def __init__(
+        self, app, recorder: TrafficRecorder, paths: tuple[str, ...], max_body: int
+    ):
+        self.app = app
+        self.recorder = recorder
+        self.paths = paths
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        ts = time.time()
+        start = time.perf_counter()
+        request_body = bytearray()
+        response_body = bytearray()
+        response_bytes = 0
+        status = None
+        content_type = ""
+        encoded = False
+        ttfb = None
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, content_type, encoded, ttfb, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        content_type = value.decode("latin-1")
+                    elif name.lower() == b"content-encoding":
+                        encoded = True
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body and ttfb is None:
+                    ttfb = time.perf_counter() - start
+                response_bytes += len(body)
+                room = self.max_body - len(response_body)
+                if room > 0:
+                    response_body.extend(body[:room])
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception:
+            status = status or 500
+            raise
+        finally:
+            self.recorder.record(
+                self._entry(
+                    scope,
+                    ts,
+                    time.perf_counter() - start,
+                    ttfb,
+                    bytes(request_body),
+                    status,
+                    content_type,
+                    # Packed vectors and gzip bodies are only counted.
+                    (
+                        None
+                        if encoded or not _is_text(content_type)
+                        else bytes(response_body)
+                    ),
+                    response_bytes,
+                )
+            )
+
+    def _entry(
+        self,
+        scope,
+        ts: float,
+        duration: float,
+        ttfb: float | None,
+        request_body: bytes,
+        status: int | None,
+        content_type: str,
+        response_body: bytes | None,
+        response_bytes: int,
+    ) -> dict:
+        headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+            if name.decode("latin-1").lower() in _REPLAY_HEADERS
+        }
+        truncated = response_body is not None and response_bytes > len(response_body)
+        if response_body is None:
+            response = None
+        elif truncated:
+            response = response_body.decode("utf-8", "replace")
+        else:
+            response = _decode(response_body, content_type)
+        return {
+            "ts": round(ts, 3),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "headers": headers,
+            "request": _decode(request_body, headers.get("content-type", "")),
+            # None when the client went away before a response started.
+            "status": status,
+            "duration_ms": round(duration * 1000, 2),
+            "ttfb_ms": round(ttfb * 1000, 2) if ttfb is not None else None,
+            "response_type": content_type,
+            "response_bytes": response_bytes,
+            "response": response,
+            "truncated": truncated,
+        }
+
+
+def _is_text(content_type: str) -> bool:
+    return "json" in content_type or content_type.startswith("text/")
+
+
+def _decode(body: bytes, content_type: str):
+    """JSON bodies as values (normalised, so blobs can be shared), else text."""
+    if not body:
+        return None
+    if "json" in content_type and "ndjson" not in content_type:
+        try:
+            return json.loads(body)
+        except ValueError:
+            pass
+    return body.decode("utf-8", "replace")
+
+
+traffic_recorder = TrafficRecorder(
+    CAPTURE_DIR or os.path.join(LOG_DIR, "capture"),
+    CAPTURE_MAX_FILE_BYTES,
+    CAPTURE_BLOB_CHARS,
+)
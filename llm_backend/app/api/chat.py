@@ -1,26 +1,43 @@
 import time
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.models.chat_models import ChatRequest, ChatResponse
 from app.services.llm_service import ask_llama
+from app.api.disconnect import ClientDisconnected, run_or_cancel, stream_or_cancel
+from app.services.scheduler import SchedulerOverloaded
+from app.services.streaming import (
+    STREAM_MEDIA_TYPES,
+    format_stream,
+    negotiate_stream_format,
+)
 from app.core.logger import logger
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 @router.post("")
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request):
     start_time = time.time()
     try:
         # Determine chat type based on message content
         chat_type = "COACH_TIP" if "Merhaba Koç, benim \"Learning Coach\" asistanımsın" in req.message else "GENERAL_CHAT"
         
         if req.stream:
-            generator = await ask_llama(req.message, req.history, stream=True)
-            return StreamingResponse(generator, media_type="text/plain")
+            fmt = negotiate_stream_format(
+                req.stream_format, request.headers.get("accept", "")
+            )
+            events = await ask_llama(req.message, req.history, stream=True)
+            return StreamingResponse(
+                stream_or_cancel(request, format_stream(events, fmt), "chat_stream"),
+                media_type=STREAM_MEDIA_TYPES[fmt],
+            )
         else:
-            answer = await ask_llama(req.message, req.history, stream=False)
+            answer = await run_or_cancel(
+                request, ask_llama(req.message, req.history, stream=False), "chat"
+            )
             duration_ms = (time.time() - start_time) * 1000
             return ChatResponse(answer=answer)
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail="LLM error")
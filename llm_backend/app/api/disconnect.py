@@ -0,0 +1,106 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, TypeVar
+
+from fastapi import Request
+
+from app.core.logger import logger
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready."""
+
+
+class DisconnectStats:
+    def __init__(self):
+        self.cancelled: dict[str, int] = {}
+
+    def record(self, label: str):
+        self.cancelled[label] = self.cancelled.get(label, 0) + 1
+        logger.info("[DISCONNECT] %s: client gone, upstream work cancelled", label)
+
+    def stats(self) -> dict:
+        return {
+            "cancelled": dict(self.cancelled),
+            "total": sum(self.cancelled.values()),
+        }
+
+
+disconnect_stats = DisconnectStats()
+
+
+async def _wait_for_disconnect(request: Request):
+    # The request body has already been read, so the next message the server
+    # delivers is the disconnect.
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_or_cancel(request: Request, work: Awaitable[T], label: str) -> T:
+    """
+    Await `work`, cancelling it (and the upstream calls it is waiting on) as
+    soon as the client disconnects. Raises ClientDisconnected in that case.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not task.done():
+            task.cancel()
+        watcher.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+
+    if task.cancelled():
+        disconnect_stats.record(label)
+        raise ClientDisconnected(label)
+    return task.result()
+
+
+async def stream_or_cancel(
+    request: Request, chunks: AsyncIterator[str], label: str
+) -> AsyncIterator[str]:
+    """
+    Relay `chunks` to the client. The source is consumed in its own task, so
+    it can be cancelled (closing the upstream stream) the moment the client
+    disconnects, even while the model has not produced the next token yet.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    finished = False
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                return
+            item = getter.result()
+            if item is _END:
+                finished = True
+                return
+            if isinstance(item, Exception):
+                finished = True
+                raise item
+            yield item
+    finally:
+        if not finished:
+            disconnect_stats.record(label)
+        producer.cancel()
+        watcher.cancel()
+        await asyncio.gather(producer, watcher, return_exceptions=True)
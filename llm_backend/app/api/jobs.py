@@ -0,0 +1,86 @@
+import json
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.rag import build_quiz, build_flashcards
+from app.core.config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RETENTION_SECONDS
+from app.core.logger import logger
+from app.models.chat_models import (
+    QuizGenerateRequest,
+    FlashcardGenerateRequest,
+    JobAcceptedResponse,
+)
+from app.services.jobs import Job, JobManager, JobQueueFull
+
+router = APIRouter(tags=["Jobs"])
+
+job_manager = JobManager(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RETENTION_SECONDS)
+
+
+def _accepted(job: Job) -> JobAcceptedResponse:
+    return JobAcceptedResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"/jobs/{job.id}",
+        events_url=f"/jobs/{job.id}/events",
+    )
+
+
+def _submit(kind: str, factory) -> JobAcceptedResponse:
+    try:
+        return _accepted(job_manager.submit(kind, factory))
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Job queue is full",
+            headers={"Retry-After": "30"},
+        )
+
+
+@router.post("/rag/quiz/jobs", status_code=202, response_model=JobAcceptedResponse)
+async def submit_quiz_job(req: QuizGenerateRequest):
+    logger.info(f"Quiz işi istendi (count: {req.count}, diff: {req.difficulty})")
+    return _submit("quiz", lambda: build_quiz(req))
+
+
+@router.post(
+    "/rag/flashcards/jobs", status_code=202, response_model=JobAcceptedResponse
+)
+async def submit_flashcards_job(req: FlashcardGenerateRequest):
+    logger.info(f"Flash kart işi istendi (count: {req.count}, diff: {req.difficulty})")
+    return _submit("flashcards", lambda: build_flashcards(req))
+
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).as_dict()
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = _get_job(job_id)
+    return {"cancelled": job_manager.cancel(job), "status": job.status}
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = _get_job(job_id)
+
+    async def stream():
+        async for event in job_manager.events(job):
+            yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        yield f"event: result\ndata: {json.dumps(job.as_dict(), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
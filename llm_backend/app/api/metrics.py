@@ -0,0 +1,84 @@
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.api.jobs import job_manager
+from app.core.metrics import (
+    ERRORS,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUEST_SECONDS,
+    JOB_QUEUE_DEPTH,
+    REGISTRY,
+    SCHEDULER_ACTIVE,
+    SCHEDULER_QUEUED,
+)
+from app.services.llm_service import scheduler
+
+router = APIRouter(tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsMiddleware:
+    """
+    Request latency and in-flight gauge per route.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, which would hide
+    the client's http.disconnect message from the disconnect watchers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        started = False
+
+        def observe(status: int):
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_template(scope),
+                status=str(status),
+            )
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                # Streaming responses are measured up to the first byte.
+                observe(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # The 500 is sent by Starlette's outermost error middleware.
+            ERRORS.inc(where="http", type=type(exc).__name__)
+            if not started:
+                observe(500)
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec()
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route (/jobs/{job_id}), or "unmatched"."""
+    # The template keeps label cardinality bounded.
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    for priority, stats in scheduler.stats()["classes"].items():
+        SCHEDULER_ACTIVE.set(stats["active"], priority=priority)
+        SCHEDULER_QUEUED.set(stats["queued"], priority=priority)
+    JOB_QUEUE_DEPTH.set(job_manager.stats()["queue_depth"])
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,8 +1,18 @@
-from fastapi import APIRouter, HTTPException
+import gzip
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 from app.core.logger import logger
 from app.models.chat_models import (
     EmbeddingRequest,
     EmbeddingResponse,
+    EncodedEmbeddingResponse,
+    VectorIndexRequest,
+    VectorIndexResponse,
+    RagSearchRequest,
+    RagSearchResponse,
     RagAnswerRequest,
     RagAnswerResponse,
     QuizGenerateRequest,
@@ -15,117 +25,287 @@ from app.services.llm_service import (
     ask_document,
     generate_quiz,
     generate_flashcards,
+    stream_quiz,
+    stream_flashcards,
+    vector_index,
+    index_document_chunks,
+    delete_document_index,
+    search_document,
+)
+from app.api.disconnect import ClientDisconnected, run_or_cancel, stream_or_cancel
+from app.services.scheduler import SchedulerOverloaded
+from app.services.streaming import (
+    STREAM_MEDIA_TYPES,
+    format_stream,
+    negotiate_stream_format,
+)
+from app.services.vector_index import DocumentNotIndexed
+from app.services.vector_codec import pack_vectors
+from app.services.result_cache import ResultCache
+from app.core.config import (
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_VARIANTS,
 )
 
 from fastapi.responses import StreamingResponse
 
 router = APIRouter(prefix="/rag", tags=["RAG"])
 
+# Generated quizzes/flashcards keyed by (context, count, difficulty, instructions).
+result_cache = ResultCache(RESULT_CACHE_TTL, RESULT_CACHE_SIZE, RESULT_CACHE_VARIANTS)
+
+
+# Media types a client can list in Accept to receive packed vectors instead of JSON.
+_PACKED_MEDIA_TYPES = {
+    "application/x-embeddings-float32": "float32",
+    "application/x-embeddings-float16": "float16",
+}
+_GZIP_MIN_BYTES = 1024
+
+
+def _negotiate_encoding(req: EmbeddingRequest, request: Request) -> str:
+    if req.encoding:
+        return req.encoding
+    accept = request.headers.get("accept", "")
+    for media_type in accept.split(","):
+        encoding = _PACKED_MEDIA_TYPES.get(media_type.split(";")[0].strip())
+        if encoding:
+            return encoding
+    return "json"
+
 
-@router.post("/embeddings", response_model=EmbeddingResponse)
-async def embeddings(req: EmbeddingRequest):
+def _json_response(payload: dict, request: Request) -> Response:
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if len(body) >= _GZIP_MIN_BYTES and "gzip" in accept_encoding.lower():
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post(
+    "/embeddings",
+    response_model=EmbeddingResponse | EncodedEmbeddingResponse,
+)
+async def embeddings(req: EmbeddingRequest, request: Request):
     try:
-        logger.info("Embedding isteği alındı")
-        vectors = await get_embeddings(req.texts)
-        return EmbeddingResponse(embeddings=vectors)
+        encoding = _negotiate_encoding(req, request)
+        logger.info(f"Embedding isteği alındı (encoding: {encoding})")
+        # A user is waiting on an interactive request (a question being
+        # embedded for retrieval); it must not queue behind bulk indexing.
+        priority = "rag" if req.interactive else "embeddings"
+        vectors = await run_or_cancel(
+            request, get_embeddings(req.texts, priority), "embeddings"
+        )
+        if encoding == "json":
+            return _json_response({"embeddings": vectors}, request)
+        return _json_response(pack_vectors(vectors, encoding), request)
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
     except Exception as e:
         logger.exception("Embedding error")
         raise HTTPException(status_code=500, detail=f"Embedding error: {e}")
 
 
+def _ensure_vector_index():
+    if vector_index is None:
+        raise HTTPException(
+            status_code=503, detail="Local vector index is disabled (VECTOR_INDEX_DIR)"
+        )
+
+
+@router.put("/index/{document_id}", response_model=VectorIndexResponse)
+async def index_document(document_id: str, req: VectorIndexRequest, request: Request):
+    _ensure_vector_index()
+    try:
+        logger.info(f"Vektör indeksleme isteği alındı ({len(req.chunks)} parça)")
+        dims = await run_or_cancel(
+            request,
+            index_document_chunks(
+                document_id, [chunk.model_dump() for chunk in req.chunks]
+            ),
+            "index",
+        )
+        return VectorIndexResponse(
+            document_id=document_id, chunks=len(req.chunks), dims=dims
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
+    except Exception as e:
+        logger.exception("Vector index error")
+        raise HTTPException(status_code=500, detail=f"Vector index error: {e}")
+
+
+@router.delete("/index/{document_id}")
+async def delete_index(document_id: str):
+    _ensure_vector_index()
+    try:
+        return {"deleted": await delete_document_index(document_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/search", response_model=RagSearchResponse)
+async def search(req: RagSearchRequest, request: Request):
+    _ensure_vector_index()
+    try:
+        hits = await run_or_cancel(
+            request,
+            search_document(req.document_id, req.query, req.top_k),
+            "search",
+        )
+        return RagSearchResponse(hits=hits)
+    except DocumentNotIndexed:
+        raise HTTPException(status_code=404, detail="Document is not indexed")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
+    except Exception as e:
+        logger.exception("RAG search error")
+        raise HTTPException(status_code=500, detail=f"RAG search error: {e}")
+
+
 @router.post("/answer")
-async def answer(req: RagAnswerRequest):
+async def answer(req: RagAnswerRequest, request: Request):
     try:
         logger.info("RAG cevap isteği alındı")
         if req.stream:
-            generator = await ask_document(
+            fmt = negotiate_stream_format(
+                req.stream_format, request.headers.get("accept", "")
+            )
+            events = await ask_document(
                 req.question, req.context, req.history, stream=True
             )
-            return StreamingResponse(generator, media_type="text/plain")
+            return StreamingResponse(
+                stream_or_cancel(request, format_stream(events, fmt), "rag_stream"),
+                media_type=STREAM_MEDIA_TYPES[fmt],
+            )
         else:
-            result = await ask_document(
-                req.question, req.context, req.history, stream=False
+            result = await run_or_cancel(
+                request,
+                ask_document(req.question, req.context, req.history, stream=False),
+                "rag_answer",
             )
             return RagAnswerResponse(answer=result)
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
     except Exception as e:
         logger.exception("RAG answer error")
         raise HTTPException(status_code=500, detail=f"RAG answer error: {e}")
 
 
+async def build_quiz(req: QuizGenerateRequest) -> dict:
+    cache_key = result_cache.make_key(
+        "quiz", req.context, req.count, req.difficulty, req.instructions
+    )
+    if req.use_cache:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Quiz önbellekten döndü")
+            return cached
+
+    # Items are validated one by one during generation.
+    result = await generate_quiz(
+        req.context, req.count, req.difficulty, req.instructions
+    )
+    if result["questions"]:
+        result_cache.put(cache_key, result)
+    return result
+
+
+async def build_flashcards(req: FlashcardGenerateRequest) -> dict:
+    cache_key = result_cache.make_key(
+        "flashcards", req.context, req.count, req.difficulty, req.instructions
+    )
+    if req.use_cache:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Flash kartlar önbellekten döndü")
+            return cached
+
+    result = await generate_flashcards(
+        req.context, req.count, req.difficulty, req.instructions
+    )
+    if result["cards"]:
+        result_cache.put(cache_key, result)
+    return result
+
+
+async def _cached_item_events(
+    items: list[dict], requested: int
+) -> AsyncIterator[dict]:
+    for index, item in enumerate(items):
+        yield {"event": "item", "index": index, "item": item}
+    yield {
+        "event": "done",
+        "count": len(items),
+        "requested": requested,
+        "cached": True,
+    }
+
+
+def _item_stream_response(
+    request: Request, req, kind: str, items_key: str, stream
+) -> StreamingResponse:
+    """
+    Items as NDJSON/SSE events as soon as each one is generated. A cached
+    result is replayed instead; streamed results skip verification, so they
+    are not written to the cache.
+    """
+    fmt = negotiate_stream_format(
+        req.stream_format, request.headers.get("accept", ""), default="ndjson"
+    )
+    cached = None
+    if req.use_cache:
+        cached = result_cache.get(
+            result_cache.make_key(
+                kind, req.context, req.count, req.difficulty, req.instructions
+            )
+        )
+    if cached is not None:
+        events = _cached_item_events(cached[items_key], req.count)
+    else:
+        events = stream(req.context, req.count, req.difficulty, req.instructions)
+    return StreamingResponse(
+        stream_or_cancel(request, format_stream(events, fmt), f"{kind}_stream"),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+    )
+
+
 @router.post("/quiz", response_model=QuizGenerateResponse)
-async def quiz_endpoint(req: QuizGenerateRequest):
+async def quiz_endpoint(req: QuizGenerateRequest, request: Request):
     try:
         logger.info(
             f"Quiz üretimi istendi (count: {req.count}, diff: {req.difficulty})"
         )
-        result_json = await generate_quiz(
-            req.context, req.count, req.difficulty, req.instructions
-        )
-        import json
-        import re
-
-        match = re.search(r"(\{.*\}|\[.*\])", result_json, re.DOTALL)
-        if match:
-            result_json = match.group(0)
-
-        parsed = json.loads(result_json)
-
-        questions = (
-            parsed.get("questions", [])
-            if isinstance(parsed, dict)
-            else parsed if isinstance(parsed, list) else []
-        )
-        if isinstance(parsed, dict) and "quiz" in parsed:
-            questions = parsed["quiz"]
-
-        for q in questions:
-            ans = str(q.get("answer", "")).strip()
-            options = q.get("options", [])
-            valid_letters = ["A", "B", "C", "D"]
-
-            if ans not in valid_letters and options:
-                for i, opt in enumerate(options):
-                    if i < 4 and (
-                        ans.lower() == str(opt).lower()
-                        or str(opt).lower().startswith(ans.lower())
-                        or ans.lower().startswith(str(opt).lower())
-                    ):
-                        q["answer"] = valid_letters[i]
-                        break
-
-        return {"questions": questions}
+        if req.stream:
+            return _item_stream_response(request, req, "quiz", "questions", stream_quiz)
+        return await run_or_cancel(request, build_quiz(req), "quiz")
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
     except Exception as e:
         logger.exception("Quiz generation error")
         raise HTTPException(status_code=500, detail=f"Quiz error: {e}")
 
 
 @router.post("/flashcards", response_model=FlashcardGenerateResponse)
-async def flashcards_endpoint(req: FlashcardGenerateRequest):
+async def flashcards_endpoint(req: FlashcardGenerateRequest, request: Request):
     try:
         logger.info(
             f"Flash kart üretimi istendi (count: {req.count}, diff: {req.difficulty})"
         )
-        result_json = await generate_flashcards(
-            req.context, req.count, req.difficulty, req.instructions
-        )
-        import json
-        import re
-
-        match = re.search(r"(\{.*\}|\[.*\])", result_json, re.DOTALL)
-        if match:
-            result_json = match.group(0)
-
-        parsed = json.loads(result_json)
-
-        cards = (
-            parsed.get("cards", [])
-            if isinstance(parsed, dict)
-            else parsed if isinstance(parsed, list) else []
-        )
-        if isinstance(parsed, dict) and "flashcards" in parsed:
-            cards = parsed["flashcards"]
-
-        return {"cards": cards}
+        if req.stream:
+            return _item_stream_response(
+                request, req, "flashcards", "cards", stream_flashcards
+            )
+        return await run_or_cancel(request, build_flashcards(req), "flashcards")
+    except (SchedulerOverloaded, ClientDisconnected):
+        raise
     except Exception as e:
         logger.exception("Flashcard generation error")
         raise HTTPException(status_code=500, detail=f"Flashcard error: {e}")
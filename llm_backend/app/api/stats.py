@@ -0,0 +1,55 @@
+from fastapi import APIRouter
+
+from app.api.capture import traffic_recorder
+from app.api.disconnect import disconnect_stats
+from app.api.jobs import job_manager
+from app.api.rag import result_cache
+
+from app.services.llm_service import (
+    embedding_cache,
+    chat_flight,
+    embedding_flight,
+    scheduler,
+    stream_metrics,
+    chat_pool,
+    embedding_pool,
+    context_compressor,
+    history_manager,
+    language_detector,
+    quiz_parser,
+    flashcard_parser,
+    verification_policy,
+    vector_index,
+)
+
+router = APIRouter(tags=["Stats"])
+
+
+@router.get("/stats")
+def stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "verification": verification_policy.stats(),
+        "context_compression": context_compressor.stats(),
+        "history": history_manager.stats(),
+        "language": language_detector.stats(),
+        "result_cache": result_cache.stats(),
+        "structured_output": {
+            "quiz": quiz_parser.stats(),
+            "flashcards": flashcard_parser.stats(),
+        },
+        "scheduler": scheduler.stats(),
+        "streaming": stream_metrics.stats(),
+        "disconnects": disconnect_stats.stats(),
+        "upstreams": {
+            "chat": chat_pool.stats(),
+            "embeddings": embedding_pool.stats(),
+        },
+        "jobs": job_manager.stats(),
+        "capture": traffic_recorder.stats(),
+        "singleflight": {
+            "chat": chat_flight.stats(),
+            "embeddings": embedding_flight.stats(),
+        },
+        "vector_index": vector_index.stats() if vector_index else None,
+    }
@@ -3,10 +3,18 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-OLLAMA_URL = os.getenv("OLLAMA_URL")
+
+def _url_list(value: str | None) -> list[str]:
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+
+# OLLAMA_URL / OLLAMA_EMBEDDINGS_URL accept a comma separated list of upstreams;
+# the singular names keep pointing at the first one.
+OLLAMA_URLS = _url_list(os.getenv("OLLAMA_URL"))
+OLLAMA_URL = OLLAMA_URLS[0] if OLLAMA_URLS else None
 MODEL_NAME = os.getenv("MODEL_NAME")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
-OLLAMA_EMBEDDINGS_URL = os.getenv("OLLAMA_EMBEDDINGS_URL")
+OLLAMA_EMBEDDINGS_URLS = _url_list(os.getenv("OLLAMA_EMBEDDINGS_URL"))
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 600))
 OLLAMA_KEEP_ALIVE_RAW = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
 try:
@@ -14,12 +22,180 @@ try:
 except ValueError:
     OLLAMA_KEEP_ALIVE = OLLAMA_KEEP_ALIVE_RAW
 
-OLLAMA_GENERATE_URL = os.getenv(
-    "OLLAMA_GENERATE_URL", "http://localhost:11434/api/generate"
+# One generate (warm-up) URL per chat upstream.
+OLLAMA_GENERATE_URLS = _url_list(os.getenv("OLLAMA_GENERATE_URL"))
+if not OLLAMA_GENERATE_URLS:
+    OLLAMA_GENERATE_URLS = [
+        (
+            url.replace("/api/chat", "/api/generate")
+            if url.endswith("/api/chat")
+            else "http://localhost:11434/api/generate"
+        )
+        for url in OLLAMA_URLS
+    ] or ["http://localhost:11434/api/generate"]
+
+if not OLLAMA_EMBEDDINGS_URLS:
+    OLLAMA_EMBEDDINGS_URLS = [
+        (
+            url.replace("/api/chat", "/api/embeddings")
+            if url.endswith("/api/chat")
+            else f"{url.rstrip('/')}/api/embeddings"
+        )
+        for url in OLLAMA_URLS
+    ]
+OLLAMA_EMBEDDINGS_URL = OLLAMA_EMBEDDINGS_URLS[0] if OLLAMA_EMBEDDINGS_URLS else None
+
+# Batch embedding endpoint (/api/embed accepts a list of inputs), one per
+# embeddings upstream. Falls back to the single-prompt OLLAMA_EMBEDDINGS_URL
+# when the upstream does not support it.
+OLLAMA_EMBED_BATCH_URLS: list[str | None] = _url_list(
+    os.getenv("OLLAMA_EMBED_BATCH_URL")
+)
+if not OLLAMA_EMBED_BATCH_URLS:
+    OLLAMA_EMBED_BATCH_URLS = [
+        (
+            url[: -len("/api/embeddings")] + "/api/embed"
+            if url.endswith("/api/embeddings")
+            else None
+        )
+        for url in OLLAMA_EMBEDDINGS_URLS
+    ]
+
+# Chat API spoken by the upstreams: "auto" probes each one at startup,
+# "ollama" (/api/chat) or "openai" (/v1/chat/completions) skip the probe.
+OLLAMA_PROTOCOL = os.getenv("OLLAMA_PROTOCOL", "auto").lower()
+if OLLAMA_PROTOCOL not in ("auto", "ollama", "openai"):
+    raise ValueError(f"Invalid OLLAMA_PROTOCOL: {OLLAMA_PROTOCOL}")
+
+# Seconds between upstream health probes (0 disables probing).
+UPSTREAM_HEALTH_INTERVAL = float(os.getenv("UPSTREAM_HEALTH_INTERVAL", 15))
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 16))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+EMBEDDING_RETRIES = int(os.getenv("EMBEDDING_RETRIES", 3))
+
+# Embedding cache: in-memory LRU entries (0 disables) and optional on-disk tier.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 5000))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+
+# Verification pass: "always" (default), "never" or "adaptive" (only when cheap
+# local checks fail). Each endpoint can override the global mode.
+VERIFICATION_MODE = os.getenv("VERIFICATION_MODE", "always").lower()
+VERIFICATION_MODES = {
+    kind: os.getenv(f"VERIFICATION_MODE_{kind.upper()}", VERIFICATION_MODE).lower()
+    for kind in ("rag", "quiz", "flashcards")
+}
+VERIFICATION_GROUNDING_THRESHOLD = float(
+    os.getenv("VERIFICATION_GROUNDING_THRESHOLD", 0.5)
 )
 
-if not OLLAMA_EMBEDDINGS_URL and OLLAMA_URL:
-    if OLLAMA_URL.endswith("/api/chat"):
-        OLLAMA_EMBEDDINGS_URL = OLLAMA_URL.replace("/api/chat", "/api/embeddings")
-    else:
-        OLLAMA_EMBEDDINGS_URL = f"{OLLAMA_URL.rstrip('/')}/api/embeddings"
+# Local vector index for /rag/search; disabled unless a directory is given.
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR")
+VECTOR_INDEX_OPEN_DOCUMENTS = int(os.getenv("VECTOR_INDEX_OPEN_DOCUMENTS", 64))
+
+# Extractive context compression before prompting (overlap/duplicate removal and
+# question-aware sentence selection down to CONTEXT_TOKEN_BUDGET).
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "false").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+
+# Fan-out quiz/flashcard generation: large counts are split into parts of
+# GENERATION_FANOUT_PART_SIZE items generated concurrently, then merged.
+GENERATION_FANOUT = os.getenv("GENERATION_FANOUT", "false").lower() == "true"
+GENERATION_FANOUT_MIN_COUNT = int(os.getenv("GENERATION_FANOUT_MIN_COUNT", 8))
+GENERATION_FANOUT_PART_SIZE = int(os.getenv("GENERATION_FANOUT_PART_SIZE", 5))
+GENERATION_FANOUT_CONCURRENCY = int(os.getenv("GENERATION_FANOUT_CONCURRENCY", 3))
+
+# Result cache for /rag/quiz and /rag/flashcards. RESULT_CACHE_VARIANTS > 1 keeps
+# several generations per request and rotates between them.
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 3600))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_VARIANTS = int(os.getenv("RESULT_CACHE_VARIANTS", 1))
+
+# Background job API for long-running generations (/rag/quiz/jobs, /jobs/{id}).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 32))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 900))
+
+# Share one upstream call between concurrent identical chat/embedding requests.
+SINGLEFLIGHT = os.getenv("SINGLEFLIGHT", "true").lower() == "true"
+
+# Priority scheduler in front of Ollama (chat > rag > generation > embeddings).
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", 4))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", 32))
+SCHEDULER_CLASS_LIMITS = {
+    "chat": int(os.getenv("SCHEDULER_CONCURRENCY_CHAT", 4)),
+    "rag": int(os.getenv("SCHEDULER_CONCURRENCY_RAG", 3)),
+    "generation": int(os.getenv("SCHEDULER_CONCURRENCY_GENERATION", 2)),
+    "embeddings": int(os.getenv("SCHEDULER_CONCURRENCY_EMBEDDINGS", 2)),
+}
+
+# Logging: records are handed to a background thread, so handlers never block
+# the event loop. LOG_ROTATION is "size" (LOG_MAX_BYTES) or "time" (LOG_ROTATE_WHEN).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+if LOG_FORMAT not in ("text", "json"):
+    raise ValueError(f"Invalid LOG_FORMAT: {LOG_FORMAT}")
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()
+if LOG_ROTATION not in ("size", "time"):
+    raise ValueError(f"Invalid LOG_ROTATION: {LOG_ROTATION}")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 7))
+# User messages and model responses are cut to LOG_PAYLOAD_CHARS at INFO and
+# their text is kept for a LOG_PAYLOAD_SAMPLE_RATE fraction only (the rest log
+# just their length); DEBUG logs every payload in full.
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", 200))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 1.0))
+
+# Conversation history compaction: beyond HISTORY_TOKEN_BUDGET (estimated)
+# tokens, the last HISTORY_KEEP_RECENT messages are kept verbatim and older
+# ones are folded into a cached rolling summary, HISTORY_SUMMARY_STEP messages
+# at a time.
+HISTORY_COMPACTION = os.getenv("HISTORY_COMPACTION", "false").lower() == "true"
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 2000))
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", 6))
+HISTORY_SUMMARY_STEP = int(os.getenv("HISTORY_SUMMARY_STEP", 6))
+HISTORY_SUMMARY_CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", 512))
+
+# "prefix" puts the document context right after the system prompt, before the
+# history, so the upstream can reuse its prompt cache on follow-up questions;
+# "legacy" sends it inside the last user message. Only pays off when follow-up
+# turns reuse the same context; measure with scripts/bench_prompt_layout.py.
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "legacy").lower()
+if PROMPT_LAYOUT not in ("prefix", "legacy"):
+    raise ValueError(f"Invalid PROMPT_LAYOUT: {PROMPT_LAYOUT}")
+# Route a conversation (or document) to the same upstream every turn.
+SESSION_AFFINITY = os.getenv("SESSION_AFFINITY", "false").lower() == "true"
+
+# num_ctx is picked per request as the smallest of these sizes that fits the
+# estimated prompt plus expected output. Each distinct size makes Ollama reload
+# the model, so keep the list short; a single value means a fixed num_ctx.
+NUM_CTX_BUCKETS = tuple(
+    sorted(int(v) for v in os.getenv("NUM_CTX_BUCKETS", "2048,4096,8192").split(","))
+)
+
+# Quiz/flashcard generation: send the item JSON schema as the upstream's
+# `format` (false: plain JSON mode), and how many extra calls may regenerate
+# items that were invalid or missing.
+STRUCTURED_OUTPUT_SCHEMA = (
+    os.getenv("STRUCTURED_OUTPUT_SCHEMA", "true").lower() == "true"
+)
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", 1))
+
+# Output language detection: contexts longer than LANGUAGE_SAMPLE_CHARS are
+# sampled, and results are cached per context (LANGUAGE_CACHE_SIZE entries).
+LANGUAGE_SAMPLE_CHARS = int(os.getenv("LANGUAGE_SAMPLE_CHARS", 4096))
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", 256))
+
+# Opt-in traffic capture for scripts/replay.py: requests under CAPTURE_PATHS
+# and their responses (up to CAPTURE_MAX_BODY bytes) are written as JSON lines
+# to CAPTURE_DIR (default logs/capture), rotating at CAPTURE_MAX_FILE_BYTES.
+# Request strings of CAPTURE_BLOB_CHARS or more are stored once per file.
+CAPTURE_TRAFFIC = os.getenv("CAPTURE_TRAFFIC", "false").lower() == "true"
+CAPTURE_DIR = os.getenv("CAPTURE_DIR")
+CAPTURE_PATHS = tuple(
+    p.strip() for p in os.getenv("CAPTURE_PATHS", "/chat,/rag").split(",") if p.strip()
+)
+CAPTURE_MAX_BODY = int(os.getenv("CAPTURE_MAX_BODY", 65536))
+CAPTURE_MAX_FILE_BYTES = int(os.getenv("CAPTURE_MAX_FILE_BYTES", 50 * 1024 * 1024))
+CAPTURE_BLOB_CHARS = int(os.getenv("CAPTURE_BLOB_CHARS", 512))
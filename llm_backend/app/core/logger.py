@@ -1,25 +1,156 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+from datetime import datetime, timezone
+
+from app.core.config import (
+    LOG_BACKUP_COUNT,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_PAYLOAD_CHARS,
+    LOG_PAYLOAD_SAMPLE_RATE,
+    LOG_ROTATE_WHEN,
+    LOG_ROTATION,
+)
 
 # Logs directory setup
-LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "logs")
+LOG_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "logs"
+)
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Generate a unique filename for this session
-session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_filename = f"chat_log_{session_timestamp}.txt"
-log_filepath = os.path.join(LOG_DIR, log_filename)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # Console output
-        logging.FileHandler(log_filepath, encoding='utf-8')  # File output
-    ]
-)
+# One file for all runs; rotation keeps the directory bounded.
+log_filepath = os.path.join(LOG_DIR, "chat_log.txt")
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message and `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _file_handler() -> logging.Handler:
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            log_filepath,
+            when=LOG_ROTATE_WHEN,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_filepath,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the stock handler, keep the traceback apart from the message
+        # (in exc_text, which every formatter appends) so JSON records carry it
+        # as a field. Args are merged now; they may change after the call.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _level(name: str) -> int:
+    level = logging.getLevelName(name)
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown LOG_LEVEL: {name!r}")
+    return level
+
+
+LEVEL = _level(LOG_LEVEL)
+
+
+def _setup() -> logging.handlers.QueueListener:
+    formatter = (
+        JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    handlers = [logging.StreamHandler(), _file_handler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Unbounded, so a slow disk can never make a caller wait.
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(log_queue)]
+    root.setLevel(LEVEL)
+    listener.start()
+    return listener
+
+
+_listener = _setup()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
 
 logger = logging.getLogger("AI-COACH")
+logger.setLevel(LEVEL)
 logger.info(f"Logging started. Log file: {log_filepath}")
+
+
+def truncate(text: str, limit: int = LOG_PAYLOAD_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… (+{len(text) - limit} chars)"
+
+
+def log_payload(event: str, text: str, **fields):
+    """
+    Log a user message or model response: in full at DEBUG, otherwise
+    truncated and sampled at LOG_PAYLOAD_SAMPLE_RATE. `fields` are attached
+    as structured data (e.g. elapsed_ms) and always logged.
+    """
+    fields["chars"] = len(text)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: %s", event, text, extra=fields)
+    elif random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        logger.info("%s: %s", event, truncate(text), extra=fields)
+    else:
+        logger.info("%s: <%s chars, not sampled>", event, len(text), extra=fields)
@@ -0,0 +1,265 @@
+"""
+Minimal in-process metrics registry rendered in the Prometheus text format.
+
+Everything runs on the single event loop, so no locking is needed.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+# Seconds; LLM calls routinely take tens of seconds, so the tail goes far out.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [
+        f'{n}="{v}"' for n, v in extra
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class _HistogramValue:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        hist = self._values.get(key)
+        if hist is None:
+            hist = self._values[key] = _HistogramValue(len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                hist.counts[i] += 1
+                break
+        hist.total += value
+        hist.count += 1
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, hist in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, hist.counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, extra=(("le", _format_value(bound)),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(hist.total)}")
+            lines.append(f"{self.name}_count{labels} {hist.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time until the response headers are sent, by route.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+)
+LLM_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "llm_stage_duration_seconds",
+        "Duration of a pipeline stage (draft, verify, embed, parse, ...).",
+        ("kind", "stage"),
+    )
+)
+LLM_UPSTREAM_IN_FLIGHT = REGISTRY.register(
+    Gauge(
+        "llm_upstream_requests_in_flight",
+        "Requests currently outstanding per upstream.",
+        ("pool", "upstream"),
+    )
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter(
+        "llm_tokens_total",
+        "Tokens reported by the upstream (prompt_eval_count / eval_count).",
+        ("kind", "type"),
+    )
+)
+LLM_TOKENS_PER_SECOND = REGISTRY.register(
+    Histogram(
+        "llm_generation_tokens_per_second",
+        "Generation speed derived from eval_count / eval_duration.",
+        ("kind",),
+        buckets=TOKENS_PER_SECOND_BUCKETS,
+    )
+)
+SCHEDULER_ACTIVE = REGISTRY.register(
+    Gauge(
+        "llm_scheduler_active",
+        "Upstream slots in use per priority class.",
+        ("priority",),
+    )
+)
+SCHEDULER_QUEUED = REGISTRY.register(
+    Gauge(
+        "llm_scheduler_queued",
+        "Requests waiting for an upstream slot per priority class.",
+        ("priority",),
+    )
+)
+JOB_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("llm_job_queue_depth", "Background jobs waiting for a worker.")
+)
+ERRORS = REGISTRY.register(
+    Counter(
+        "llm_errors_total", "Errors by where they happened and type.", ("where", "type")
+    )
+)
+
+
+@contextmanager
+def stage(kind: str, name: str):
+    """Time a pipeline stage and count the error type if it fails."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.inc(where=f"{kind}.{name}", type=type(e).__name__)
+        raise
+    finally:
+        LLM_STAGE_SECONDS.observe(time.perf_counter() - start, kind=kind, stage=name)
+
+
+async def timed(kind: str, name: str, awaitable):
+    """`await awaitable` inside `stage(kind, name)`."""
+    with stage(kind, name):
+        return await awaitable
+
+
+def record_usage(kind: str, usage: dict):
+    """Record token counts and generation speed from upstream usage fields."""
+    prompt_tokens = usage.get("prompt_eval_count")
+    completion_tokens = usage.get("eval_count")
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, kind=kind, type="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, kind=kind, type="completion")
+        eval_duration = usage.get("eval_duration")
+        if eval_duration:
+            LLM_TOKENS_PER_SECOND.observe(
+                completion_tokens / (eval_duration / 1e9), kind=kind
+            )
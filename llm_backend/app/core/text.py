@@ -0,0 +1,49 @@
+import math
+import re
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Words are compared by prefix so Turkish suffixes ("hücre", "hücrenin") still match.
+STEM_LEN = 5
+MIN_WORD_LEN = 4
+
+# Rough characters-per-token ratio for Llama-family tokenizers on mixed TR/EN text.
+CHARS_PER_TOKEN = 3.5
+
+
+def content_stems(text: str) -> set[str]:
+    return {
+        word[:STEM_LEN]
+        for word in WORD_RE.findall(text.lower())
+        if len(word) >= MIN_WORD_LEN and not word.isdigit()
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: list[dict]) -> int:
+    # A few tokens of chat-template overhead per message.
+    return sum(estimate_tokens(str(m.get("content", ""))) + 4 for m in messages)
+
+
+# Headroom for the chars-per-token estimate being off.
+NUM_CTX_MARGIN = 1.1
+
+
+def select_num_ctx(
+    prompt_tokens: int, output_tokens: int, buckets: tuple[int, ...]
+) -> int:
+    """
+    Smallest bucket that holds the prompt plus the expected output, or the
+    largest one if none does. A fixed set of sizes keeps Ollama from reloading
+    the model for every distinct num_ctx.
+    """
+    needed = math.ceil((prompt_tokens + output_tokens) * NUM_CTX_MARGIN)
+    for size in buckets:
+        if needed <= size:
+            return size
+    return buckets[-1]
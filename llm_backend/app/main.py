@@ -1,12 +1,24 @@
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
+from app.api.capture import CaptureMiddleware, traffic_recorder
 from app.api.chat import router as chat_router
+from app.api.disconnect import ClientDisconnected
 from app.api.health import router as health_router
+from app.api.jobs import router as jobs_router, job_manager
+from app.api.metrics import MetricsMiddleware, router as metrics_router
 from app.api.rag import router as rag_router
-from app.services.llm_service import preload_models, close_client
+from app.api.stats import router as stats_router
+from app.services.llm_service import (
+    preload_models,
+    close_client,
+    start_upstream_probes,
+)
+from app.services.scheduler import SchedulerOverloaded
+from app.core.config import CAPTURE_MAX_BODY, CAPTURE_PATHS, CAPTURE_TRAFFIC
 from app.core.logger import logger
 
 
@@ -16,7 +28,13 @@ async def lifespan(app: FastAPI):
         "Starting up Learning Coach Backend. Preloading models in background..."
     )
     asyncio.create_task(preload_models())
+    start_upstream_probes()
+    job_manager.start()
+    if CAPTURE_TRAFFIC:
+        traffic_recorder.start()
     yield
+    await job_manager.stop()
+    traffic_recorder.stop()
     await close_client()
     logger.info("Shutting down Backend.")
 
@@ -30,7 +48,34 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+if CAPTURE_TRAFFIC:
+    app.add_middleware(
+        CaptureMiddleware,
+        recorder=traffic_recorder,
+        paths=CAPTURE_PATHS,
+        max_body=CAPTURE_MAX_BODY,
+    )
+
+
+@app.exception_handler(SchedulerOverloaded)
+async def scheduler_overloaded_handler(request: Request, exc: SchedulerOverloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Nobody is listening anymore; 499 (client closed request) is for the logs.
+    return Response(status_code=499)
+
 
 app.include_router(chat_router)
 app.include_router(health_router)
 app.include_router(rag_router)
+app.include_router(jobs_router)
+app.include_router(stats_router)
+app.include_router(metrics_router)
@@ -6,6 +6,10 @@ class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1)
     history: list[dict] = Field(default_factory=list)
     stream: bool = False
+    stream_format: Literal["text", "sse", "ndjson"] | None = Field(
+        None,
+        description="Akış biçimi; verilmezse Accept başlığına bakılır, varsayılan düz metin",
+    )
 
 
 class ChatResponse(BaseModel):
@@ -14,17 +18,77 @@ class ChatResponse(BaseModel):
 
 class EmbeddingRequest(BaseModel):
     texts: list[str] = Field(..., min_length=1)
+    encoding: Literal["json", "float32", "float16"] | None = Field(
+        default=None,
+        description="Vektör kodlaması; verilmezse Accept başlığına bakılır, varsayılan json",
+    )
+    interactive: bool = Field(
+        default=False,
+        description="Kullanıcının beklediği tekil istek (ör. soru embedding'i); rag önceliğiyle çalışır",
+    )
 
 
 class EmbeddingResponse(BaseModel):
     embeddings: list[list[float]]
 
 
+class EncodedEmbeddingResponse(BaseModel):
+    encoding: Literal["float32", "float16"]
+    count: int
+    dims: int
+    data: str  # base64, little-endian, row-major (count x dims)
+
+
+# ── Yerel Vektör İndeksi ──────────────────────────────────────────────────────
+
+
+class IndexedChunk(BaseModel):
+    id: str
+    text: str
+    index: int
+    metadata: dict = Field(default_factory=dict)
+    embedding: list[float] | None = Field(
+        default=None, description="Verilmezse metin burada embed edilir"
+    )
+
+
+class VectorIndexRequest(BaseModel):
+    chunks: list[IndexedChunk] = Field(..., min_length=1)
+
+
+class VectorIndexResponse(BaseModel):
+    document_id: str
+    chunks: int
+    dims: int
+
+
+class RagSearchRequest(BaseModel):
+    document_id: str = Field(..., min_length=1)
+    query: str = Field(..., min_length=1)
+    top_k: int = Field(default=5, ge=1, le=50)
+
+
+class RagSearchHit(BaseModel):
+    id: str
+    text: str
+    index: int
+    metadata: dict
+    score: float
+
+
+class RagSearchResponse(BaseModel):
+    hits: list[RagSearchHit]
+
+
 class RagAnswerRequest(BaseModel):
     question: str = Field(..., min_length=1)
     context: str = Field(..., min_length=1)
     history: list[dict] = Field(default_factory=list)
     stream: bool = False
+    stream_format: Literal["text", "sse", "ndjson"] | None = Field(
+        None,
+        description="Akış biçimi; verilmezse Accept başlığına bakılır, varsayılan düz metin",
+    )
 
 
 class RagAnswerResponse(BaseModel):
@@ -43,12 +107,23 @@ class QuizGenerateRequest(BaseModel):
     instructions: str | None = Field(
         default=None, description="Opsiyonel özel talimatlar"
     )
+    use_cache: bool = Field(
+        default=True, description="False ise önbellek atlanır ve yeni üretim yapılır"
+    )
+    stream: bool = Field(
+        default=False,
+        description="True ise her madde hazır olur olmaz NDJSON/SSE olayı olarak gönderilir",
+    )
+    stream_format: Literal["sse", "ndjson"] | None = Field(
+        None,
+        description="Akış biçimi; verilmezse Accept başlığına bakılır, varsayılan ndjson",
+    )
 
 
 class QuizQuestion(BaseModel):
-    question: str
-    options: list[str]  # [A, B, C, D]
-    answer: str  # "A" | "B" | "C" | "D"
+    question: str = Field(..., min_length=1)
+    options: list[str] = Field(..., min_length=4, max_length=4)  # [A, B, C, D]
+    answer: Literal["A", "B", "C", "D"]
     explanation: str
 
 
@@ -68,12 +143,33 @@ class FlashcardGenerateRequest(BaseModel):
     instructions: str | None = Field(
         default=None, description="Opsiyonel özel talimatlar"
     )
+    use_cache: bool = Field(
+        default=True, description="False ise önbellek atlanır ve yeni üretim yapılır"
+    )
+    stream: bool = Field(
+        default=False,
+        description="True ise her madde hazır olur olmaz NDJSON/SSE olayı olarak gönderilir",
+    )
+    stream_format: Literal["sse", "ndjson"] | None = Field(
+        None,
+        description="Akış biçimi; verilmezse Accept başlığına bakılır, varsayılan ndjson",
+    )
 
 
 class Flashcard(BaseModel):
-    front: str  # ön yüz: kavram / soru
-    back: str  # arka yüz: tanım / cevap
+    front: str = Field(..., min_length=1)  # ön yüz: kavram / soru
+    back: str = Field(..., min_length=1)  # arka yüz: tanım / cevap
 
 
 class FlashcardGenerateResponse(BaseModel):
     cards: list[Flashcard]
+
+
+# ── Arka Plan İşleri ───────────────────────────────────────────────────────────
+
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
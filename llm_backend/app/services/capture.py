@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from app.core.logger import logger
+
+_STOP = object()
+
+
+class TrafficRecorder:
+    """
+    Writes captured request/response pairs as JSON lines for scripts/replay.py.
+
+    Records are queued and written by a background thread, so capturing never
+    blocks the event loop. Long strings in request bodies (document contexts,
+    which repeat across a session's requests) are stored once per file as a
+    {"blob": hash, "text": ...} line and referenced as {"$blob": hash}.
+    Files rotate at `max_file_bytes`; each one is self-contained.
+    """
+
+    def __init__(self, directory: str, max_file_bytes: int, blob_chars: int):
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.blob_chars = blob_chars
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._file = None
+        self._file_bytes = 0
+        self._blobs: set[str] = set()
+
+        self.path: str | None = None
+        self.records = 0
+        self.blobs = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name="traffic-capture", daemon=True
+        )
+        self._thread.start()
+        logger.info("[CAPTURE] Recording traffic to %s", self.directory)
+
+    def stop(self):
+        """Write what is queued and close the file (idempotent)."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def record(self, entry: dict):
+        self._queue.put(entry)
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            try:
+                self._write(entry)
+            except Exception as e:
+                self.write_errors += 1
+                logger.warning("[CAPTURE] Could not write record: %s", e)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        if self._file is not None:
+            self._file.close()
+        name = time.strftime("capture-%Y%m%d-%H%M%S", time.localtime())
+        path = os.path.join(self.directory, f"{name}.jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}-{suffix}.jsonl")
+            suffix += 1
+        # Binary, so sizes are counted in bytes (Turkish text is not ASCII).
+        self._file = open(path, "wb")
+        self._file_bytes = 0
+        self._blobs.clear()
+        self.path = path
+
+    def _write(self, entry: dict):
+        if self._file is None or self._file_bytes >= self.max_file_bytes:
+            self._open()
+        lines = []
+        if "request" in entry:
+            entry["request"] = self._externalize(entry["request"], lines)
+        lines.append(_dumps(entry))
+        data = "".join(line + "\n" for line in lines).encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.bytes_written += len(data)
+        self.records += 1
+
+    def _externalize(self, value, lines: list[str]):
+        if isinstance(value, str) and len(value) >= self.blob_chars:
+            key = hashlib.sha256(value.encode("utf-8")).hexdigest()[:24]
+            if key not in self._blobs:
+                self._blobs.add(key)
+                self.blobs += 1
+                lines.append(_dumps({"blob": key, "text": value}))
+            return {"$blob": key}
+        if isinstance(value, dict):
+            return {k: self._externalize(v, lines) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._externalize(v, lines) for v in value]
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._thread is not None,
+            "file": self.path,
+            "records": self.records,
+            "blobs": self.blobs,
+            "bytes_written": self.bytes_written,
+            "write_errors": self.write_errors,
+        }
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_capture(path: str) -> list[dict]:
+    """Records of a capture file with blob references resolved."""
+    blobs: dict[str, str] = {}
+    entries = []
+
+    def resolve(value):
+        if isinstance(value, dict):
+            if set(value) == {"$blob"}:
+                return blobs[value["$blob"]]
+            return {k: resolve(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [resolve(v) for v in value]
+        return value
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if "blob" in data:
+                blobs[data["blob"]] = data["text"]
+            else:
+                data["request"] = resolve(data.get("request"))
+                entries.append(data)
+    return entries
@@ -0,0 +1,197 @@
+import math
+import re
+
+from app.core.text import CHARS_PER_TOKEN, content_stems, estimate_tokens
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+_CHUNK_SPLIT_RE = re.compile(r"\n\s*-{3,}\s*\n")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+_NON_SPACE_RE = re.compile(r"\S+")
+
+# Indexer chunks overlap by 50 words; allow some slack for whitespace changes.
+MAX_OVERLAP_WORDS = 80
+MIN_OVERLAP_WORDS = 8
+
+
+class CompressionResult:
+    def __init__(self, text: str, original_tokens: int, compressed_tokens: int):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.compressed_tokens = compressed_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compressed_tokens
+
+
+def _overlap_words(left: list[str], right: list[str]) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    longest = min(MAX_OVERLAP_WORDS, len(left), len(right))
+    for n in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+        if left[-n:] == right[:n]:
+            return n
+    return 0
+
+
+def _drop_overlaps(chunks: list[str]) -> list[str]:
+    """
+    Remove text that a chunk shares with an already kept chunk at its start or
+    end, i.e. the sliding-window overlap the indexer adds between neighbours.
+    """
+    kept: list[tuple[str, list[str]]] = []
+    for chunk in chunks:
+        spans = list(_NON_SPACE_RE.finditer(chunk))
+        words = [m.group(0) for m in spans]
+        start, end = 0, len(words)
+
+        for _, prev_words in kept:
+            head = _overlap_words(prev_words, words[start:end])
+            start += head
+            tail = _overlap_words(words[start:end], prev_words[:MAX_OVERLAP_WORDS])
+            end -= tail
+            if start >= end:
+                break
+
+        if start >= end:
+            continue
+        text = chunk[spans[start].start() : spans[end - 1].end()]
+        kept.append((text, words[start:end]))
+    return [text for text, _ in kept]
+
+
+def _truncate(text: str, token_budget: int) -> str:
+    """The start of `text` within `token_budget`, cut at a word boundary."""
+    cut = text[: int(max(1, token_budget) * CHARS_PER_TOKEN)]
+    if len(cut) < len(text) and " " in cut.strip():
+        cut = cut[: cut.rstrip().rfind(" ")]
+    return cut.rstrip()
+
+
+def _split_sentences(chunk: str) -> list[tuple[str, str]]:
+    """
+    (sentence, separator after it) pairs; joining them gives the chunk back, so
+    line breaks of lists, tables and code survive when sentences are dropped.
+    """
+    pieces: list[tuple[str, str]] = []
+    pos = 0
+    for match in _SENTENCE_SPLIT_RE.finditer(chunk):
+        text = chunk[pos : match.start()]
+        if text.strip():
+            pieces.append((text, match.group(0)))
+        elif pieces:
+            pieces[-1] = (pieces[-1][0], pieces[-1][1] + text + match.group(0))
+        pos = match.end()
+    if chunk[pos:].strip():
+        pieces.append((chunk[pos:], ""))
+    return pieces
+
+
+class ContextCompressor:
+    """
+    Question-aware extractive compression for RAG/quiz contexts:
+    1. drop the overlap between `---` separated chunks and duplicate sentences,
+    2. score sentences against the query (IDF-weighted stem overlap),
+    3. keep the best sentences, in original order, until the token budget is met.
+    A context with nothing to drop is returned unchanged.
+    """
+
+    def __init__(self, enabled: bool, token_budget: int):
+        self.enabled = enabled
+        self.token_budget = token_budget
+        self.calls = 0
+        self.original_tokens = 0
+        self.compressed_tokens = 0
+
+    def compress(self, context: str, query: str | None = None) -> CompressionResult:
+        original_tokens = estimate_tokens(context)
+        if not self.enabled:
+            return CompressionResult(context, original_tokens, original_tokens)
+
+        chunks = [c.strip() for c in _CHUNK_SPLIT_RE.split(context) if c.strip()]
+        kept_chunks = _drop_overlaps(chunks)
+        dropped = kept_chunks != chunks
+
+        # (chunk index, sentence, separator) with duplicate sentences removed.
+        seen: set[str] = set()
+        sentences: list[tuple[int, str, str]] = []
+        for chunk_idx, chunk in enumerate(kept_chunks):
+            for sentence, separator in _split_sentences(chunk):
+                key = " ".join(sentence.lower().split())
+                if key in seen:
+                    dropped = True
+                    continue
+                seen.add(key)
+                sentences.append((chunk_idx, sentence, separator))
+
+        total_tokens = sum(estimate_tokens(s) for _, s, _ in sentences)
+        if total_tokens > self.token_budget:
+            sentences = self._select(sentences, query)
+            dropped = True
+
+        if dropped:
+            compressed = CHUNK_SEPARATOR.join(
+                "".join(
+                    s + sep for idx, s, sep in sentences if idx == chunk_idx
+                ).rstrip()
+                for chunk_idx in sorted({idx for idx, _, _ in sentences})
+            )
+        else:
+            compressed = context
+        result = CompressionResult(
+            compressed, original_tokens, estimate_tokens(compressed)
+        )
+
+        self.calls += 1
+        self.original_tokens += result.original_tokens
+        self.compressed_tokens += result.compressed_tokens
+        return result
+
+    def _select(
+        self, sentences: list[tuple[int, str, str]], query: str | None
+    ) -> list[tuple[int, str, str]]:
+        stems = [content_stems(s) for _, s, _ in sentences]
+        doc_freq: dict[str, int] = {}
+        for sentence_stems in stems:
+            for stem in sentence_stems:
+                doc_freq[stem] = doc_freq.get(stem, 0) + 1
+        n = len(sentences)
+        idf = {stem: math.log(1 + n / df) for stem, df in doc_freq.items()}
+
+        query_stems = content_stems(query) if query else set()
+
+        def score(i: int) -> float:
+            sentence_stems = stems[i]
+            if not sentence_stems:
+                return 0.0
+            if query_stems:
+                matched = sum(idf[s] for s in sentence_stems & query_stems)
+                # Information density breaks ties between equally matching sentences.
+                density = sum(idf[s] for s in sentence_stems) / len(sentence_stems)
+                return matched + 0.1 * density
+            return sum(idf[s] for s in sentence_stems) / math.sqrt(len(sentence_stems))
+
+        chosen: set[int] = set()
+        used = 0
+        for i in sorted(range(n), key=score, reverse=True):
+            cost = estimate_tokens(sentences[i][1])
+            if used + cost > self.token_budget:
+                continue
+            chosen.add(i)
+            used += cost
+        if not chosen and n:
+            # Not even one sentence fits (e.g. a long text without punctuation):
+            # keep the start of the best one rather than no context at all.
+            best = max(range(n), key=score)
+            chunk_idx, sentence, _ = sentences[best]
+            return [(chunk_idx, _truncate(sentence, self.token_budget), "")]
+        return [sentences[i] for i in sorted(chosen)]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "token_budget": self.token_budget,
+            "calls": self.calls,
+            "original_tokens": self.original_tokens,
+            "compressed_tokens": self.compressed_tokens,
+            "saved_tokens": self.original_tokens - self.compressed_tokens,
+        }
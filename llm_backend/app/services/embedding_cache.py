@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+from app.core.logger import logger
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _to_float32(vector: list[float]) -> array:
+    return array("f", vector)
+
+
+def _to_le_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array("f", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _DiskTier:
+    """
+    Append-only on-disk store: `<model>.vec` holds fixed-size little-endian float32
+    rows, `<model>.keys` holds one hex key per row. Reads go through mmap.
+    The N-th key belongs to the N-th row, so on load both files are cut back to
+    the rows they have in common (a crash between the two appends leaves one
+    of them longer).
+    """
+
+    def __init__(self, directory: str, model: str):
+        os.makedirs(directory, exist_ok=True)
+        slug = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+        self.vec_path = os.path.join(directory, f"{slug}.vec")
+        self.keys_path = os.path.join(directory, f"{slug}.keys")
+        self.meta_path = os.path.join(directory, f"{slug}.meta.json")
+
+        self.dim: int | None = None
+        self.rows: dict[str, int] = {}
+        self._row_count = 0
+        self._mm: mmap.mmap | None = None
+        self._mapped_rows = 0
+        self._write_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.dim = int(json.load(f)["dim"])
+        if self.dim is None or not os.path.exists(self.keys_path):
+            return
+
+        row_bytes = self.dim * 4
+        vec_bytes = (
+            os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        )
+        with open(self.keys_path, encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        # The last piece is "" after a complete line, else a torn key.
+        keys = lines[:-1]
+        rows = min(len(keys), vec_bytes // row_bytes)
+
+        if vec_bytes != rows * row_bytes:
+            logger.warning(
+                "Embedding disk cache: dropping %s bytes of vectors without keys",
+                vec_bytes - rows * row_bytes,
+            )
+            os.truncate(self.vec_path, rows * row_bytes)
+        if len(keys) != rows or lines[-1]:
+            logger.warning(
+                "Embedding disk cache: dropping %s keys without vectors",
+                len(keys) - rows + bool(lines[-1]),
+            )
+            with open(self.keys_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{key}\n" for key in keys[:rows])
+
+        for row, key in enumerate(keys[:rows]):
+            if key:
+                self.rows[key] = row
+        self._row_count = rows
+
+    def _remap(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._mapped_rows = 0
+        if (
+            self.dim
+            and os.path.exists(self.vec_path)
+            and os.path.getsize(self.vec_path) > 0
+        ):
+            with open(self.vec_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_rows = len(self._mm) // (self.dim * 4)
+
+    def get(self, key: str) -> array | None:
+        row = self.rows.get(key)
+        if row is None or self.dim is None:
+            return None
+        if row >= self._mapped_rows:
+            self._remap()
+        row_bytes = self.dim * 4
+        values = array("f")
+        values.frombytes(self._mm[row * row_bytes : (row + 1) * row_bytes])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def put_many(self, items: list[tuple[str, array]]):
+        """Appends new rows with one write per file (called off the event loop)."""
+        with self._write_lock:
+            if self.dim is None and items:
+                self.dim = len(items[0][1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+
+            keys: list[str] = []
+            vectors: list[bytes] = []
+            for key, values in items:
+                if key in self.rows or key in keys:
+                    continue
+                if len(values) != self.dim:
+                    logger.warning(
+                        "Embedding dimension changed (%s != %s), skipping disk cache write",
+                        len(values),
+                        self.dim,
+                    )
+                    continue
+                keys.append(key)
+                vectors.append(_to_le_bytes(values))
+            if not keys:
+                return
+
+            with open(self.vec_path, "ab") as f:
+                f.write(b"".join(vectors))
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in keys))
+            for key in keys:
+                self.rows[key] = self._row_count
+                self._row_count += 1
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by sha256(model, text).
+    An in-memory LRU tier sits in front of an optional memory-mapped disk tier.
+    """
+
+    def __init__(self, model: str, max_entries: int, directory: str | None = None):
+        self.model = model
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, array] = OrderedDict()
+        self._disk: _DiskTier | None = None
+        # Written to the disk tier in batches by flush().
+        self._pending: list[tuple[str, array]] = []
+        if directory and max_entries > 0:
+            try:
+                self._disk = _DiskTier(directory, model)
+                logger.info(
+                    "Embedding disk cache loaded: %s entries from %s",
+                    len(self._disk.rows),
+                    directory,
+                )
+            except OSError as exc:
+                logger.warning("Embedding disk cache disabled: %s", exc)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, text: str) -> list[float] | None:
+        if not self.enabled:
+            return None
+        key = embedding_key(self.model, text)
+
+        values = self._memory.get(key)
+        if values is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return values.tolist()
+
+        if self._disk is not None:
+            values = self._disk.get(key)
+            if values is not None:
+                self.disk_hits += 1
+                self._remember(key, values)
+                return values.tolist()
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, vector: list[float]):
+        if not self.enabled:
+            return
+        key = embedding_key(self.model, text)
+        values = _to_float32(vector)
+        self._remember(key, values)
+        if self._disk is not None:
+            self._pending.append((key, values))
+
+    async def flush(self):
+        """Writes vectors put since the last flush to disk, in a worker thread."""
+        if self._disk is None or not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._disk.put_many, pending)
+        except OSError as exc:
+            logger.warning("Embedding disk cache write failed: %s", exc)
+
+    def _remember(self, key: str, values: array):
+        self._memory[key] = values
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def close(self):
+        if self._disk is not None:
+            pending, self._pending = self._pending, []
+            try:
+                self._disk.put_many(pending)
+            except OSError as exc:
+                logger.warning("Embedding disk cache write failed: %s", exc)
+            self._disk.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model": self.model,
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            ),
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_entries": len(self._disk.rows) if self._disk is not None else None,
+        }
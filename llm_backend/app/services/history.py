@@ -0,0 +1,153 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from app.core.logger import logger
+from app.core.text import estimate_message_tokens
+
+# (previous summary or None, messages to fold in) -> new summary
+Summarizer = Callable[[str | None, list[dict]], Awaitable[str]]
+
+SUMMARY_PREFIX = "Önceki konuşmanın özeti:\n"
+
+
+def _prefix_keys(messages: list[dict]) -> list[str]:
+    """keys[i] identifies messages[:i + 1]; a chained hash, so O(n) in total."""
+    keys = []
+    digest = b""
+    for message in messages:
+        raw = json.dumps(
+            [message.get("role"), message.get("content")], ensure_ascii=False
+        )
+        digest = hashlib.sha256(digest + raw.encode("utf-8")).digest()
+        keys.append(digest.hex())
+    return keys
+
+
+class HistoryManager:
+    """
+    Keeps conversation history within a token budget.
+
+    While the history fits the budget it is sent unchanged. Beyond that the most
+    recent messages are kept verbatim and everything older is replaced by a
+    rolling summary. The split point advances in steps of `summary_step`
+    messages, so a summary is produced once every few turns and reused in
+    between.
+
+    Clients resend the whole history every turn, so a hash of the summarised
+    prefix identifies the conversation: summaries are cached under it, and the
+    next summary starts from the longest cached prefix instead of from scratch.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        token_budget: int,
+        keep_recent: int,
+        summary_step: int,
+        cache_size: int,
+    ):
+        self.enabled = enabled
+        self.token_budget = token_budget
+        self.keep_recent = max(0, keep_recent)
+        self.summary_step = max(1, summary_step)
+        self.cache_size = cache_size
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+
+        self.calls = 0
+        self.compactions = 0
+        self.summaries_generated = 0
+        self.summary_cache_hits = 0
+        self.summary_failures = 0
+        self.original_tokens = 0
+        self.compacted_tokens = 0
+
+    async def compact(self, history: list[dict], summarize: Summarizer) -> list[dict]:
+        self.calls += 1
+        original_tokens = estimate_message_tokens(history)
+        self.original_tokens += original_tokens
+        if not self.enabled or original_tokens <= self.token_budget:
+            self.compacted_tokens += original_tokens
+            return history
+
+        older_count = len(history) - self.keep_recent
+        older_count -= older_count % self.summary_step
+        if older_count <= 0:
+            self.compacted_tokens += original_tokens
+            return history
+
+        older, recent = history[:older_count], history[older_count:]
+        summary = await self._summary_for(older, summarize)
+        if summary:
+            compacted = [{"role": "system", "content": SUMMARY_PREFIX + summary}]
+            compacted += recent
+        else:
+            # No summary available: dropping old turns still beats overflowing
+            # num_ctx, where the model would silently lose the latest ones.
+            compacted = recent
+
+        compacted_tokens = estimate_message_tokens(compacted)
+        self.compactions += 1
+        self.compacted_tokens += compacted_tokens
+        logger.info(
+            "[HISTORY] %s messages compacted to %s: ~%s -> ~%s tokens",
+            len(history),
+            len(compacted),
+            original_tokens,
+            compacted_tokens,
+        )
+        return compacted
+
+    async def _summary_for(
+        self, messages: list[dict], summarize: Summarizer
+    ) -> str | None:
+        keys = _prefix_keys(messages)
+        cached = self._summaries.get(keys[-1])
+        if cached is not None:
+            self._summaries.move_to_end(keys[-1])
+            self.summary_cache_hits += 1
+            return cached
+
+        # Continue from the summary of the longest prefix seen before.
+        previous, start = None, 0
+        for i in range(len(keys) - 2, -1, -1):
+            if keys[i] in self._summaries:
+                previous, start = self._summaries[keys[i]], i + 1
+                break
+
+        try:
+            summary = (await summarize(previous, messages[start:])).strip()
+        except Exception as e:
+            self.summary_failures += 1
+            logger.warning("[HISTORY] Summary failed, dropping old turns: %s", e)
+            return previous
+        if not summary:
+            return previous
+
+        self.summaries_generated += 1
+        self._put(keys[-1], summary)
+        return summary
+
+    def _put(self, key: str, summary: str):
+        if self.cache_size <= 0:
+            return
+        self._summaries[key] = summary
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "token_budget": self.token_budget,
+            "calls": self.calls,
+            "compactions": self.compactions,
+            "summaries_generated": self.summaries_generated,
+            "summary_cache_hits": self.summary_cache_hits,
+            "summary_failures": self.summary_failures,
+            "cached_summaries": len(self._summaries),
+            "original_tokens": self.original_tokens,
+            "compacted_tokens": self.compacted_tokens,
+            "saved_tokens": self.original_tokens - self.compacted_tokens,
+        }
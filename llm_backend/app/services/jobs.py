@@ -0,0 +1,196 @@
+import asyncio
+import time
+import uuid
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.core.logger import logger
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+_current_job: ContextVar["Job | None"] = ContextVar("current_job", default=None)
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, factory: Callable[[], Awaitable[dict]]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.events: list[dict] = []
+        self._factory = factory
+        self._task: asyncio.Task | None = None
+        self._cancel_requested = False
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def emit(self, event: str, **data):
+        self.events.append({"event": event, "time": time.time(), **data})
+        # Wake current subscribers and arm a fresh event for the next change.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def as_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.events[-1] if self.events else None,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+def report_progress(stage: str, **data):
+    """Record a progress event on the job running in the current context, if any."""
+    job = _current_job.get()
+    if job is not None:
+        job.emit("progress", stage=stage, **data)
+
+
+class JobManager:
+    """
+    Bounded background execution for long-running generations. Submitted jobs
+    wait in a queue of at most `max_queue` entries and are run by `workers`
+    worker tasks; finished jobs are kept for `retention_seconds`.
+    """
+
+    def __init__(self, workers: int, max_queue: int, retention_seconds: float):
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max(1, max_queue))
+        self._jobs: dict[str, Job] = {}
+        self._worker_tasks: list[asyncio.Task] = []
+
+    def start(self):
+        if self._worker_tasks:
+            return
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, kind: str, factory: Callable[[], Awaitable[dict]]) -> Job:
+        self._purge()
+        job = Job(kind, factory)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull("Job queue is full")
+        self._jobs[job.id] = job
+        job.emit("queued", position=self._queue.qsize())
+        logger.info("[JOBS] %s job queued: %s", kind, job.id)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job: Job) -> bool:
+        if job.done:
+            return False
+        job._cancel_requested = True
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            # Still queued; the worker skips it when dequeued.
+            self._finish(job, "cancelled")
+        return True
+
+    async def events(self, job: Job) -> AsyncIterator[dict]:
+        sent = 0
+        while True:
+            changed = job._changed
+            while sent < len(job.events):
+                yield job.events[sent]
+                sent += 1
+            if job.done:
+                return
+            await changed.wait()
+
+    def _finish(self, job: Job, status: str, error: str | None = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.emit(status, **({"error": error} if error else {}))
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.done:
+                    continue
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        job.emit("running", waited_ms=round((job.started_at - job.created_at) * 1000))
+
+        token = _current_job.set(job)
+        try:
+            job._task = asyncio.create_task(job._factory())
+            job.result = await job._task
+            self._finish(job, "succeeded")
+        except asyncio.CancelledError:
+            if not job._cancel_requested:
+                raise  # the worker itself is being shut down
+            self._finish(job, "cancelled")
+        except Exception as e:
+            logger.exception("[JOBS] %s job failed: %s", job.kind, job.id)
+            self._finish(job, "failed", str(e))
+        finally:
+            _current_job.reset(token)
+            job._task = None
+
+        logger.info(
+            "[JOBS] %s job %s: %s in %.2fms",
+            job.kind,
+            job.status,
+            job.id,
+            (job.finished_at - job.started_at) * 1000,
+        )
+
+    def _purge(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.done and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        by_status: dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "queue_limit": self._queue.maxsize,
+            "jobs": by_status,
+        }
@@ -0,0 +1,318 @@
+import math
+import re
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+# Language names as they appear in prompts ("ÇIKTI DİLİ: ...").
+DEFAULT_LANGUAGE = "Türkçe"
+
+# Short seed texts in each language; their character trigram frequencies form
+# the language profiles. Study material is mostly expository prose, so the
+# seeds are too. Adding a language means adding a seed here.
+_SEEDS = {
+    "Türkçe": (
+        "Bu bölümde hücrenin yapısı ve görevleri ele alınmaktadır. Canlıların "
+        "temel birimi olan hücre, çevresinden aldığı maddeleri kullanarak enerji "
+        "üretir ve bu enerjiyi büyüme, onarım ve üreme için harcar. Bitkilerde "
+        "fotosentez kloroplastlarda gerçekleşir; ışık enerjisi kimyasal enerjiye "
+        "dönüştürülür. Öğrencilerin konuyu anlayabilmesi için örneklerle "
+        "açıklamalar yapılmış, her başlığın sonunda değerlendirme soruları "
+        "verilmiştir. Tarih dersinde ise Osmanlı Devleti'nin kuruluşu, "
+        "yükselişi ve dağılma süreci incelenir. Ekonomik ve siyasi gelişmelerin "
+        "toplum üzerindeki etkileri önemlidir. Matematikte bir fonksiyonun "
+        "türevi, değişim hızını gösterir ve grafiğin eğimiyle ilişkilidir. "
+        "Sınavlara hazırlanırken düzenli tekrar yapmak, notlar almak ve "
+        "soruları çözmek başarıyı artırır. Kitaplardaki bilgiler ile "
+        "öğretmenin anlattıkları birbirini tamamlamalıdır."
+    ),
+    "English": (
+        "This chapter describes the structure and functions of the cell. The "
+        "cell is the basic unit of living things; it takes in substances from "
+        "its surroundings and uses them to produce the energy needed for "
+        "growth, repair and reproduction. In plants, photosynthesis takes place "
+        "in the chloroplasts, where light energy is converted into chemical "
+        "energy. Each section includes examples, and there are review questions "
+        "at the end of every topic. In history, students examine how the empire "
+        "was founded, how it expanded and why it eventually declined. The "
+        "economic and political developments of the period had a lasting "
+        "effect on society. In mathematics, the derivative of a function shows "
+        "the rate of change and is related to the slope of its graph. When "
+        "preparing for exams, regular review, taking notes and solving "
+        "questions will improve your results."
+    ),
+    "Deutsch": (
+        "Dieses Kapitel beschreibt den Aufbau und die Aufgaben der Zelle. Die "
+        "Zelle ist die kleinste Einheit des Lebens; sie nimmt Stoffe aus ihrer "
+        "Umgebung auf und gewinnt daraus die Energie, die sie für Wachstum, "
+        "Reparatur und Fortpflanzung braucht. Bei Pflanzen findet die "
+        "Photosynthese in den Chloroplasten statt, wo Lichtenergie in chemische "
+        "Energie umgewandelt wird. Jeder Abschnitt enthält Beispiele, und am "
+        "Ende jedes Themas stehen Wiederholungsfragen. Im Geschichtsunterricht "
+        "untersuchen die Schüler, wie das Reich gegründet wurde, wie es sich "
+        "ausdehnte und warum es schließlich zerfiel. Die wirtschaftlichen und "
+        "politischen Entwicklungen dieser Zeit hatten große Auswirkungen auf "
+        "die Gesellschaft. In der Mathematik zeigt die Ableitung einer Funktion "
+        "die Änderungsrate und hängt mit der Steigung des Graphen zusammen."
+    ),
+    "Français": (
+        "Ce chapitre décrit la structure et les fonctions de la cellule. La "
+        "cellule est l'unité de base des êtres vivants ; elle prélève des "
+        "substances dans son environnement et les utilise pour produire "
+        "l'énergie nécessaire à la croissance, à la réparation et à la "
+        "reproduction. Chez les plantes, la photosynthèse a lieu dans les "
+        "chloroplastes, où l'énergie lumineuse est transformée en énergie "
+        "chimique. Chaque section comprend des exemples et des questions de "
+        "révision sont proposées à la fin de chaque thème. En histoire, les "
+        "élèves étudient la fondation de l'empire, son expansion et les raisons "
+        "de son déclin. Les évolutions économiques et politiques de cette "
+        "période ont eu des effets durables sur la société. En mathématiques, "
+        "la dérivée d'une fonction indique le taux de variation et correspond "
+        "à la pente de sa courbe."
+    ),
+    "Español": (
+        "Este capítulo describe la estructura y las funciones de la célula. La "
+        "célula es la unidad básica de los seres vivos; toma sustancias de su "
+        "entorno y las utiliza para producir la energía que necesita para el "
+        "crecimiento, la reparación y la reproducción. En las plantas, la "
+        "fotosíntesis se produce en los cloroplastos, donde la energía de la "
+        "luz se convierte en energía química. Cada sección incluye ejemplos y "
+        "al final de cada tema hay preguntas de repaso. En historia, los "
+        "estudiantes analizan cómo se fundó el imperio, cómo se expandió y por "
+        "qué finalmente decayó. Los cambios económicos y políticos de esa época "
+        "tuvieron un efecto duradero en la sociedad. En matemáticas, la "
+        "derivada de una función muestra la tasa de cambio y está relacionada "
+        "con la pendiente de su gráfica."
+    ),
+    "Italiano": (
+        "Questo capitolo descrive la struttura e le funzioni della cellula. La "
+        "cellula è l'unità fondamentale degli esseri viventi; assorbe sostanze "
+        "dall'ambiente circostante e le utilizza per produrre l'energia "
+        "necessaria alla crescita, alla riparazione e alla riproduzione. Nelle "
+        "piante la fotosintesi avviene nei cloroplasti, dove l'energia della "
+        "luce viene trasformata in energia chimica. Ogni sezione contiene degli "
+        "esempi e alla fine di ciascun argomento ci sono domande di ripasso. In "
+        "storia gli studenti esaminano come è stato fondato l'impero, come si è "
+        "espanso e perché alla fine è crollato. Gli sviluppi economici e "
+        "politici di quel periodo hanno avuto effetti duraturi sulla società. "
+        "In matematica la derivata di una funzione indica la velocità di "
+        "variazione ed è legata alla pendenza del suo grafico."
+    ),
+    "Português": (
+        "Este capítulo descreve a estrutura e as funções da célula. A célula é "
+        "a unidade básica dos seres vivos; ela retira substâncias do ambiente "
+        "e as utiliza para produzir a energia necessária ao crescimento, à "
+        "reparação e à reprodução. Nas plantas, a fotossíntese ocorre nos "
+        "cloroplastos, onde a energia da luz é transformada em energia química. "
+        "Cada seção traz exemplos e, no final de cada tema, há questões de "
+        "revisão. Em história, os alunos estudam como o império foi fundado, "
+        "como se expandiu e por que acabou entrando em declínio. As mudanças "
+        "econômicas e políticas dessa época tiveram efeitos duradouros na "
+        "sociedade. Em matemática, a derivada de uma função mostra a taxa de "
+        "variação e está relacionada com a inclinação do seu gráfico."
+    ),
+}
+
+# Frequent short words of each language. Trigrams alone let Latinate
+# technical English ("Normalization reduces redundancy") pass for French; a
+# language other than Türkçe/English also has to show more of its own
+# function words than English does.
+_FUNCTION_WORDS = {
+    language: frozenset(words.split())
+    for language, words in {
+        "English": "the and of to is are in for with that this it as on be by "
+        "an or from can",
+        "Deutsch": "der die das und ist nicht ein eine mit den dem zu auf für "
+        "sich von im",
+        "Français": "le la les et est des une un du pour dans que qui sur avec "
+        "pas au ce",
+        "Español": "el la los las y es del una un para en que por con se al lo",
+        "Italiano": "il la di e è che per una un con del della non sono gli le",
+        "Português": "o a os as e é do da dos das uma um para em que com não",
+    }.items()
+}
+
+# Explicit requests in the user's instructions: the Turkish language adverb
+# ("İngilizce hazırla", "Almancaya çevir"), "English"/"Turkish" anywhere, or
+# "in <language>" for the others ("answer in French", "en français"). A bare
+# "French" or "German" names a topic (the French Revolution), not the output
+# language.
+_EXPLICIT = {
+    # Turkish forms may take suffixes ("İngilizceye"), "in Germany" is no request.
+    language: re.compile(rf"(?<!\w)(?:{pattern})")
+    for language, pattern in {
+        "Türkçe": r"türkçe|turkce|turkish\b",
+        "English": r"ingilizce|english\b",
+        "Deutsch": r"almanca|in(?:to)?\s+german\b|auf\s+deutsch",
+        "Français": r"fransızca|fransizca|in(?:to)?\s+french\b|en\s+français",
+        "Español": r"ispanyolca|in(?:to)?\s+spanish\b|en\s+español",
+        "Italiano": r"italyanca|in(?:to)?\s+italian\b|in\s+italiano",
+        "Português": r"portekizce|in(?:to)?\s+portuguese\b|em\s+português",
+    }.items()
+}
+
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Too little text to tell languages apart reliably.
+MIN_WORDS = 3
+
+# Per-word log-likelihood lead (nats) needed to move away from Türkçe/English.
+# Code and very short texts score close to several languages at once, and code
+# leans English through its keywords; below these margins the answer stays in
+# Türkçe, or English when it clearly leads.
+FOREIGN_MARGIN = 0.5
+ENGLISH_MARGIN = 1.5
+
+
+def _trigrams(word: str) -> list[str]:
+    padded = f" {word} "
+    return [padded[i : i + 3] for i in range(len(padded) - 2)]
+
+
+def _lower(text: str) -> str:
+    # str.lower() turns "İ" into "i" plus a combining dot, which would split
+    # words such as "BİLGİ". ("I" stays "i": it is far more common in English.)
+    return text.replace("İ", "i").lower()
+
+
+def _build_profiles() -> tuple[tuple[str, ...], dict[str, tuple[float, ...]], tuple]:
+    """Add-one smoothed log P(trigram | language) for every seed trigram."""
+    languages = tuple(_SEEDS)
+    counts = {
+        language: Counter(
+            gram for word in _WORD_RE.findall(_lower(seed)) for gram in _trigrams(word)
+        )
+        for language, seed in _SEEDS.items()
+    }
+    vocabulary = set().union(*counts.values())
+    denominators = [
+        sum(counts[language].values()) + len(vocabulary) for language in languages
+    ]
+    log_probs = {
+        gram: tuple(
+            math.log((counts[language][gram] + 1) / denominator)
+            for language, denominator in zip(languages, denominators)
+        )
+        for gram in vocabulary
+    }
+    unseen = tuple(math.log(1 / denominator) for denominator in denominators)
+    return languages, log_probs, unseen
+
+
+_LANGUAGES, _LOG_PROBS, _UNSEEN = _build_profiles()
+_TR = _LANGUAGES.index("Türkçe")
+_EN = _LANGUAGES.index("English")
+
+
+@lru_cache(maxsize=65536)
+def _word_scores(word: str) -> tuple[float, ...]:
+    # Words repeat a lot (Zipf), so each distinct one is scored once.
+    scores = [0.0] * len(_LANGUAGES)
+    for gram in _trigrams(word):
+        for i, value in enumerate(_LOG_PROBS.get(gram, _UNSEEN)):
+            scores[i] += value
+    return tuple(scores)
+
+
+def _function_words(words: Counter, language: str) -> int:
+    vocabulary = _FUNCTION_WORDS[language]
+    return sum(count for word, count in words.items() if word in vocabulary)
+
+
+def explicit_language(instructions: str | None) -> str | None:
+    if not instructions:
+        return None
+    lowered = _lower(instructions)
+    for language, pattern in _EXPLICIT.items():
+        if pattern.search(lowered):
+            return language
+    return None
+
+
+class LanguageDetector:
+    """
+    Dominant language of a context, by a character-trigram naive Bayes model.
+
+    Long contexts are sampled (`sample_chars` spread over evenly spaced windows)
+    rather than scanned in full, and the sample is tokenised in a single pass.
+    Results are memoised by a hash of the context, since the same document is
+    checked again for every draft, verification and follow-up question.
+    """
+
+    SAMPLE_WINDOWS = 4
+
+    def __init__(self, sample_chars: int, cache_size: int):
+        self.sample_chars = max(0, sample_chars)
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[int, int], str] = OrderedDict()
+
+        self.calls = 0
+        self.cache_hits = 0
+        self.sampled = 0
+        self.uncertain = 0
+        self.detected: Counter = Counter()
+
+    def detect(self, text: str) -> str:
+        self.calls += 1
+        # str's own hash: no encoding pass, and a miss only costs a detection.
+        key = (len(text), hash(text))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+
+        language = self._classify(self._sample(text))
+        self.detected[language] += 1
+        if self.cache_size > 0:
+            self._cache[key] = language
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return language
+
+    def _sample(self, text: str) -> str:
+        if not self.sample_chars or len(text) <= self.sample_chars:
+            return text
+        self.sampled += 1
+        window = self.sample_chars // self.SAMPLE_WINDOWS
+        step = (len(text) - window) / (self.SAMPLE_WINDOWS - 1)
+        return " ".join(
+            text[round(i * step) : round(i * step) + window]
+            for i in range(self.SAMPLE_WINDOWS)
+        )
+
+    def _classify(self, text: str) -> str:
+        words = Counter(_WORD_RE.findall(_lower(text)))
+        total_words = sum(words.values())
+        if total_words < MIN_WORDS:
+            return DEFAULT_LANGUAGE
+        totals = [0.0] * len(_LANGUAGES)
+        for word, count in words.items():
+            for i, score in enumerate(_word_scores(word)):
+                totals[i] += count * score
+
+        best = max(range(len(_LANGUAGES)), key=totals.__getitem__)
+        english = (totals[_EN] - totals[_TR]) / total_words >= ENGLISH_MARGIN
+        if best == _TR:
+            return DEFAULT_LANGUAGE
+        if best == _EN and english:
+            return "English"
+        if best != _EN:
+            language = _LANGUAGES[best]
+            lead = (totals[best] - max(totals[_TR], totals[_EN])) / total_words
+            evidence = _function_words(words, language) > _function_words(
+                words, "English"
+            )
+            if lead >= FOREIGN_MARGIN and evidence:
+                return language
+        self.uncertain += 1
+        return "English" if english else DEFAULT_LANGUAGE
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "sampled": self.sampled,
+            "uncertain": self.uncertain,
+            "cached": len(self._cache),
+            "detected": dict(self.detected),
+        }
@@ -1,17 +1,51 @@
 import time
-import json
+import math
 import asyncio
 import httpx
 import re
 from typing import AsyncGenerator
 from app.core.config import (
-    OLLAMA_URL,
+    OLLAMA_URLS,
     MODEL_NAME,
     EMBEDDING_MODEL,
-    OLLAMA_EMBEDDINGS_URL,
+    OLLAMA_EMBEDDINGS_URLS,
     REQUEST_TIMEOUT,
     OLLAMA_KEEP_ALIVE,
-    OLLAMA_GENERATE_URL,
+    OLLAMA_GENERATE_URLS,
+    OLLAMA_EMBED_BATCH_URLS,
+    UPSTREAM_HEALTH_INTERVAL,
+    OLLAMA_PROTOCOL,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_RETRIES,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_DIR,
+    VERIFICATION_MODES,
+    VERIFICATION_GROUNDING_THRESHOLD,
+    VECTOR_INDEX_DIR,
+    VECTOR_INDEX_OPEN_DOCUMENTS,
+    CONTEXT_COMPRESSION,
+    CONTEXT_TOKEN_BUDGET,
+    GENERATION_FANOUT,
+    GENERATION_FANOUT_MIN_COUNT,
+    GENERATION_FANOUT_PART_SIZE,
+    GENERATION_FANOUT_CONCURRENCY,
+    SINGLEFLIGHT,
+    SCHEDULER_MAX_CONCURRENCY,
+    SCHEDULER_MAX_QUEUE,
+    SCHEDULER_CLASS_LIMITS,
+    HISTORY_COMPACTION,
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_KEEP_RECENT,
+    HISTORY_SUMMARY_STEP,
+    HISTORY_SUMMARY_CACHE_SIZE,
+    PROMPT_LAYOUT,
+    SESSION_AFFINITY,
+    NUM_CTX_BUCKETS,
+    STRUCTURED_OUTPUT_SCHEMA,
+    STRUCTURED_OUTPUT_RETRIES,
+    LANGUAGE_SAMPLE_CHARS,
+    LANGUAGE_CACHE_SIZE,
 )
 from app.core.prompts import (
     SYSTEM_PROMPT,
@@ -21,8 +55,39 @@ from app.core.prompts import (
     QUIZ_VERIFICATION_PROMPT,
     FLASHCARD_VERIFICATION_PROMPT,
     RAG_VERIFICATION_PROMPT,
+    HISTORY_SUMMARY_PROMPT,
+)
+from app.core.logger import log_payload, logger
+from app.core.metrics import record_usage, stage, timed
+from app.core.text import (
+    content_stems,
+    estimate_message_tokens,
+    estimate_tokens,
+    select_num_ctx,
+)
+from app.services.embedding_cache import EmbeddingCache
+from app.services.verification import VerificationPolicy
+from app.services.vector_index import VectorIndex
+from app.services.context_compressor import ContextCompressor
+from app.services.history import HistoryManager
+from app.services.language import LanguageDetector, explicit_language
+from app.models.chat_models import Flashcard, QuizQuestion
+from app.services.structured_output import (
+    ItemParser,
+    repair_flashcard,
+    repair_quiz_question,
+)
+from app.services.jobs import report_progress
+from app.services.singleflight import SingleFlight, payload_key
+from app.services.scheduler import Scheduler
+from app.services.upstream_pool import Upstream, UpstreamPool
+from app.services.streaming import StreamMetrics
+from app.services.protocols import (
+    PROTOCOLS,
+    ChatProtocol,
+    detect_protocol,
+    protocol_from_url,
 )
-from app.core.logger import logger
 
 # Global client to reuse connections (Connection Pooling)
 _client: httpx.AsyncClient | None = None
@@ -35,40 +100,95 @@ def get_client() -> httpx.AsyncClient:
     return _client
 
 
-async def close_client():
-    global _client
-    if _client:
-        await _client.aclose()
-        _client = None
+# Chat and embedding traffic can be served by separate sets of upstreams.
+chat_pool = UpstreamPool(
+    "chat",
+    [
+        Upstream(
+            {
+                "chat": url,
+                "generate": OLLAMA_GENERATE_URLS[
+                    min(idx, len(OLLAMA_GENERATE_URLS) - 1)
+                ],
+            }
+        )
+        for idx, url in enumerate(OLLAMA_URLS)
+    ],
+)
+embedding_pool = UpstreamPool(
+    "embeddings",
+    [
+        Upstream(
+            {
+                "embeddings": url,
+                "embed": (
+                    OLLAMA_EMBED_BATCH_URLS[idx]
+                    if idx < len(OLLAMA_EMBED_BATCH_URLS)
+                    else None
+                ),
+            }
+        )
+        for idx, url in enumerate(OLLAMA_EMBEDDINGS_URLS)
+    ],
+)
+
+
+def _chat_protocol(upstream: Upstream) -> ChatProtocol:
+    if OLLAMA_PROTOCOL != "auto":
+        return PROTOCOLS[OLLAMA_PROTOCOL]
+    if upstream.protocol:
+        return PROTOCOLS[upstream.protocol]
+    return protocol_from_url(upstream.url("chat"))
 
 
-def _alternate_chat_url(url: str) -> str | None:
-    if "/api/chat" in url:
-        return url.replace("/api/chat", "/v1/chat/completions")
-    if "/v1/chat/completions" in url:
-        return url.replace("/v1/chat/completions", "/api/chat")
-    return None
+# Upstream origin -> when its protocol was last probed (monotonic seconds).
+_protocol_probed_at: dict[str, float] = {}
+_PROTOCOL_RETRY_S = 10.0
 
 
-def _extract_message_content(data: dict) -> str:
-    message = data.get("message")
-    if isinstance(message, dict) and "content" in message:
-        return str(message["content"])
+async def _detect_upstream_protocol(upstream: Upstream):
+    _protocol_probed_at[upstream.origin] = time.monotonic()
+    upstream.protocol = await detect_protocol(get_client(), upstream.url("chat"))
+    logger.info(
+        "[PROTOCOL] %s speaks %s",
+        upstream.origin,
+        upstream.protocol or "unknown (unreachable, using configured URL)",
+    )
 
-    choices = data.get("choices")
-    if isinstance(choices, list) and choices:
-        first = choices[0]
-        if isinstance(first, dict):
-            msg = first.get("message")
-            if isinstance(msg, dict) and "content" in msg:
-                return str(msg["content"])
 
-    raise ValueError("Could not extract message content from LLM response")
+async def detect_chat_protocols():
+    """Probe each chat upstream once and remember which API it speaks."""
+    if OLLAMA_PROTOCOL != "auto":
+        return
+    await asyncio.gather(*(_detect_upstream_protocol(u) for u in chat_pool.upstreams))
 
 
-def _extract_json_block(text: str) -> str:
-    match = re.search(r"(\{.*\}|\[.*\])", text, re.DOTALL)
-    return match.group(0) if match else text
+async def _resolve_chat_protocol(upstream: Upstream) -> ChatProtocol:
+    """
+    Like _chat_protocol, but probes again (at most every _PROTOCOL_RETRY_S) an
+    upstream that was unreachable when detection last ran, e.g. one started
+    after the backend.
+    """
+    if OLLAMA_PROTOCOL == "auto" and upstream.protocol is None:
+        probed_at = _protocol_probed_at.get(upstream.origin)
+        if probed_at is None or time.monotonic() - probed_at >= _PROTOCOL_RETRY_S:
+            await _detect_upstream_protocol(upstream)
+    return _chat_protocol(upstream)
+
+
+def start_upstream_probes():
+    chat_pool.start(get_client, UPSTREAM_HEALTH_INTERVAL)
+    embedding_pool.start(get_client, UPSTREAM_HEALTH_INTERVAL)
+
+
+async def close_client():
+    global _client
+    await chat_pool.stop()
+    await embedding_pool.stop()
+    if _client:
+        await _client.aclose()
+        _client = None
+    embedding_cache.close()
 
 
 def _language_priority_directive(instructions: str | None = None) -> str:
@@ -82,49 +202,11 @@ def _language_priority_directive(instructions: str | None = None) -> str:
     return directive
 
 
-def _detect_explicit_language(instructions: str | None) -> str | None:
-    if not instructions:
-        return None
-
-    lowered = instructions.lower()
-    if any(token in lowered for token in ["türkçe", "turkce", "turkish"]):
-        return "Türkçe"
-    if any(token in lowered for token in ["ingilizce", "english"]):
-        return "English"
-    return None
-
-
-def _infer_context_language(context: str) -> str:
-    lowered = context.lower()
-
-    tr_markers = [
-        " ve ",
-        " için ",
-        " ile ",
-        " bir ",
-        " bu ",
-        "ö",
-        "ü",
-        "ğ",
-        "ş",
-        "ı",
-        "ç",
-    ]
-    en_markers = [" the ", " and ", " with ", " of ", " in ", " is ", " are "]
-
-    tr_score = sum(lowered.count(marker) for marker in tr_markers)
-    en_score = sum(lowered.count(marker) for marker in en_markers)
-
-    if en_score > tr_score:
-        return "English"
-    return "Türkçe"
-
-
 def _resolve_output_language(context: str, instructions: str | None) -> str:
-    explicit = _detect_explicit_language(instructions)
+    explicit = explicit_language(instructions)
     if explicit:
         return explicit
-    return _infer_context_language(context)
+    return language_detector.detect(context)
 
 
 def _language_quality_directive(language: str) -> str:
@@ -133,77 +215,260 @@ def _language_quality_directive(language: str) -> str:
             "Dil Kalitesi: Sadece doğal ve akıcı Türkçe kullan. "
             "Uydurma/bozuk kelime üretme. Türkçe karakterleri (ç, ğ, ı, İ, ö, ş, ü) doğru kullan."
         )
+    if language == "English":
+        return (
+            "Language Quality: Use natural, grammatically correct English. "
+            "Do not invent malformed words."
+        )
     return (
-        "Language Quality: Use natural, grammatically correct English. "
-        "Do not invent malformed words."
+        f"Language Quality: Write only in natural, grammatically correct {language}, "
+        "with its proper accents and special characters. Do not invent malformed words."
     )
 
 
-async def _call_chat(
-    messages: list[dict], options: dict | None = None, force_json: bool = False
+def _compress_context(context: str, query: str | None, label: str, kind: str) -> str:
+    with stage(kind, "compress"):
+        result = context_compressor.compress(context, query)
+    if result.saved_tokens > 0:
+        logger.info(
+            "[%s] Context compressed: ~%s -> ~%s tokens (saved ~%s)",
+            label,
+            result.original_tokens,
+            result.compressed_tokens,
+            result.saved_tokens,
+        )
+    return result.text
+
+
+async def _summarize_history(
+    previous: str | None, messages: list[dict], priority: str
 ) -> str:
-    chat_urls = [OLLAMA_URL]
-    alternate = _alternate_chat_url(OLLAMA_URL)
-    if alternate:
-        chat_urls.append(alternate)
+    transcript = "\n".join(f"{m['role']}: {m.get('content', '')}" for m in messages)
+    content = f"Yeni mesajlar:\n{transcript}"
+    if previous:
+        content = f"Önceki özet:\n{previous}\n\n{content}"
+    return await timed(
+        priority,
+        "summarize",
+        _call_chat(
+            messages=[
+                {"role": "system", "content": HISTORY_SUMMARY_PROMPT},
+                {"role": "user", "content": content},
+            ],
+            options={"temperature": 0.1, "num_predict": SUMMARY_OUTPUT_TOKENS},
+            priority=priority,
+            output_tokens=SUMMARY_OUTPUT_TOKENS,
+        ),
+    )
 
-    client = get_client()
-    last_exc: Exception | None = None
 
-    for idx, url in enumerate(chat_urls):
-        try:
-            if "/v1/chat/completions" in url:
-                payload = {
-                    "model": MODEL_NAME,
-                    "messages": messages,
-                    "stream": False,
-                }
-                if options:
-                    if "temperature" in options:
-                        payload["temperature"] = options["temperature"]
-                response = await client.post(url, json=payload)
-            else:
-                payload = {
-                    "model": MODEL_NAME,
-                    "keep_alive": OLLAMA_KEEP_ALIVE,
-                    "messages": messages,
-                    "stream": False,
-                }
-                if options:
-                    payload["options"] = options
-                if force_json:
-                    payload["format"] = "json"
-                response = await client.post(url, json=payload)
+async def _prepare_history(history: list[dict], priority: str) -> list[dict]:
+    # Validate role (ollama expects 'user', 'assistant', 'system')
+    valid = [m for m in history if m.get("role") in ["user", "assistant", "system"]]
+    return await history_manager.compact(
+        valid,
+        lambda previous, messages: _summarize_history(previous, messages, priority),
+    )
 
-            response.raise_for_status()
-            return _extract_message_content(response.json())
-        except httpx.HTTPStatusError as exc:
-            last_exc = exc
-            if exc.response is not None and exc.response.status_code == 404:
-                response_text = (exc.response.text or "").lower()
-                if "model" in response_text and "not found" in response_text:
-                    raise RuntimeError(
-                        f"Model not found: {MODEL_NAME}. Please pull/select an available model."
-                    ) from exc
-                if idx < len(chat_urls) - 1:
-                    logger.warning(
-                        "Chat endpoint not found at %s, trying fallback endpoint...",
-                        url,
+
+# Expected completion sizes (tokens) used to size num_ctx.
+CHAT_OUTPUT_TOKENS = 1024
+RAG_OUTPUT_TOKENS = 768
+SUMMARY_OUTPUT_TOKENS = 400
+QUIZ_OUTPUT_TOKENS_PER_ITEM = 150
+FLASHCARD_OUTPUT_TOKENS_PER_ITEM = 90
+# Verification rewrites the draft; leave room for it to grow a little.
+VERIFY_EXTRA_OUTPUT_TOKENS = 256
+
+
+def _num_ctx(messages: list[dict], output_tokens: int, kind: str) -> int:
+    """Context window for this request, from one of NUM_CTX_BUCKETS."""
+    prompt_tokens = estimate_message_tokens(messages)
+    num_ctx = select_num_ctx(prompt_tokens, output_tokens, NUM_CTX_BUCKETS)
+    if prompt_tokens + output_tokens > num_ctx:
+        logger.warning(
+            "[NUM_CTX] %s: ~%s prompt + ~%s output tokens exceed num_ctx %s; "
+            "the upstream will truncate the prompt",
+            kind,
+            prompt_tokens,
+            output_tokens,
+            num_ctx,
+        )
+    return num_ctx
+
+
+def _affinity_key(*parts) -> str | None:
+    """Upstream affinity for requests sharing a prompt prefix (see chat_pool)."""
+    return payload_key(MODEL_NAME, *parts) if SESSION_AFFINITY else None
+
+
+async def _call_chat(
+    messages: list[dict],
+    options: dict | None = None,
+    force_json: bool | dict = False,
+    priority: str = "rag",
+    affinity: str | None = None,
+    output_tokens: int = CHAT_OUTPUT_TOKENS,
+) -> str:
+    options = {**(options or {})}
+    options.setdefault("num_ctx", _num_ctx(messages, output_tokens, priority))
+    key = payload_key(MODEL_NAME, messages, options, force_json)
+    return await chat_flight.do(
+        key,
+        lambda: _call_chat_upstream(messages, options, force_json, priority, affinity),
+    )
+
+
+async def _call_chat_upstream(
+    messages: list[dict],
+    options: dict | None,
+    force_json: bool | dict,
+    priority: str,
+    affinity: str | None = None,
+) -> str:
+    tried: tuple[Upstream, ...] = ()
+    async with scheduler.slot(priority):
+        while True:
+            try:
+                async with chat_pool.acquire(tried, affinity) as upstream:
+                    return await _post_chat(
+                        upstream, messages, options, force_json, kind=priority
                     )
-                    continue
-            raise
-        except Exception as exc:
-            last_exc = exc
-            if idx < len(chat_urls) - 1:
+            except httpx.ConnectError:
+                # The request never reached the server; try another upstream.
+                tried += (upstream,)
+                if len(tried) >= len(chat_pool.upstreams):
+                    raise
                 logger.warning(
-                    "Chat request failed at %s, trying fallback endpoint...", url
+                    "Chat upstream %s unreachable, trying another one...",
+                    upstream.origin,
                 )
-                continue
-            raise
 
-    if last_exc:
-        raise last_exc
-    raise RuntimeError("No chat endpoint available")
+
+async def _post_chat(
+    upstream: Upstream,
+    messages: list[dict],
+    options: dict | None,
+    force_json: bool | dict,
+    kind: str = "chat",
+) -> str:
+    protocol = await _resolve_chat_protocol(upstream)
+    payload = protocol.build_payload(
+        MODEL_NAME,
+        messages,
+        options=options,
+        force_json=force_json,
+        stream=False,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+    try:
+        response = await get_client().post(
+            protocol.chat_url(upstream.url("chat")), json=payload
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        _raise_if_model_missing(exc)
+        raise
+    data = response.json()
+    record_usage(kind, protocol.parse_usage(data))
+    return protocol.parse_response(data)
+
+
+def _raise_if_model_missing(exc: httpx.HTTPStatusError):
+    if exc.response is not None and exc.response.status_code == 404:
+        response_text = (exc.response.text or "").lower()
+        if "model" in response_text and "not found" in response_text:
+            raise RuntimeError(
+                f"Model not found: {MODEL_NAME}. Please pull/select an available model."
+            ) from exc
+
+
+async def _stream_chat(
+    messages: list[dict],
+    options: dict | None,
+    priority: str,
+    affinity: str | None = None,
+    output_tokens: int = CHAT_OUTPUT_TOKENS,
+    force_json: bool | dict = False,
+) -> AsyncGenerator[dict, None]:
+    """
+    Stream a chat completion as typed events: {"event": "token", "content"}
+    per text delta and a final {"event": "done", ...} with timing and token
+    counts. Time to first token and tokens/sec are recorded per stream.
+    """
+    start = time.perf_counter()
+    first_token_at: float | None = None
+    chunks = 0
+    upstream_stats: dict = {}
+    options = {**(options or {})}
+    options.setdefault("num_ctx", _num_ctx(messages, output_tokens, priority))
+
+    async with scheduler.slot(priority), chat_pool.acquire(
+        affinity=affinity
+    ) as upstream:
+        protocol = await _resolve_chat_protocol(upstream)
+        payload = protocol.build_payload(
+            MODEL_NAME,
+            messages,
+            options=options,
+            force_json=force_json,
+            stream=True,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
+        async with get_client().stream(
+            "POST", protocol.chat_url(upstream.url("chat")), json=payload
+        ) as response:
+            if response.is_error:
+                await response.aread()
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as exc:
+                _raise_if_model_missing(exc)
+                raise
+            async for line in response.aiter_lines():
+                chunk = protocol.parse_stream_line(line)
+                if chunk is None:
+                    continue
+                if chunk.stats:
+                    upstream_stats.update(
+                        {k: v for k, v in chunk.stats.items() if v is not None}
+                    )
+                if chunk.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks += 1
+                    yield {"event": "token", "content": chunk.content}
+
+    end = time.perf_counter()
+    ttft_ms = (first_token_at - start) * 1000 if first_token_at else None
+    tokens = upstream_stats.get("eval_count") or chunks
+    if upstream_stats.get("eval_duration"):
+        tokens_per_sec = tokens / (upstream_stats["eval_duration"] / 1e9)
+    elif first_token_at and end > first_token_at:
+        tokens_per_sec = tokens / (end - first_token_at)
+    else:
+        tokens_per_sec = None
+
+    stream_metrics.record(priority, ttft_ms, tokens, tokens_per_sec)
+    record_usage(priority, upstream_stats)
+    logger.info(
+        "[STREAM] %s: ttft %s, %s tokens, %s tok/s, %.2fms total",
+        priority,
+        f"{ttft_ms:.2f}ms" if ttft_ms is not None else "-",
+        tokens,
+        f"{tokens_per_sec:.1f}" if tokens_per_sec is not None else "-",
+        (end - start) * 1000,
+    )
+    yield {
+        "event": "done",
+        "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
+        "duration_ms": round((end - start) * 1000, 2),
+        "tokens": tokens,
+        "tokens_per_sec": (
+            round(tokens_per_sec, 2) if tokens_per_sec is not None else None
+        ),
+        **upstream_stats,
+    }
 
 
 async def preload_models():
@@ -211,21 +476,32 @@ async def preload_models():
     Preload the AI model into memory by sending an empty request
     so the user doesn't have to wait during the first interaction.
     """
-    logger.info(f"[{MODEL_NAME}] Preloading model...")
+    await detect_chat_protocols()
+    await asyncio.gather(*(_preload_upstream(u) for u in chat_pool.upstreams))
+
+
+async def _preload_upstream(upstream: Upstream):
+    logger.info(f"[{MODEL_NAME}] Preloading model on {upstream.origin}...")
     payload = {"model": MODEL_NAME, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE}
     try:
         client = get_client()
-        response = await client.post(OLLAMA_GENERATE_URL, json=payload)
-        if response.status_code == 404:
+        if (await _resolve_chat_protocol(upstream)).name == "ollama":
+            response = await client.post(upstream.url("generate"), json=payload)
+        else:
+            response = None
+        if response is None or response.status_code == 404:
             logger.warning(
-                "Generate endpoint not found, trying chat endpoint for warm-up..."
+                "Generate endpoint not available, using chat endpoint for warm-up..."
             )
-            await _call_chat(
+            await _post_chat(
+                upstream,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": ""},
                 ],
-                options={"num_ctx": 2048, "temperature": 0.0},
+                options={"num_ctx": NUM_CTX_BUCKETS[0], "temperature": 0.0},
+                force_json=False,
+                kind="warmup",
             )
         else:
             response.raise_for_status()
@@ -238,194 +514,584 @@ async def ask_llama(
     user_message: str, history: list[dict] = [], stream: bool = False
 ) -> str | AsyncGenerator:
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-    # Add history messages if any
-    for msg in history:
-        # Validate role (ollama expects 'user', 'assistant', 'system')
-        if msg.get("role") in ["user", "assistant", "system"]:
-            messages.append(msg)
-
+    messages += await _prepare_history(history, "chat")
     messages.append({"role": "user", "content": user_message})
+    # A conversation is identified by its first message.
+    affinity = _affinity_key(history[0].get("content") if history else user_message)
 
-    payload = {
-        "model": MODEL_NAME,
-        "keep_alive": OLLAMA_KEEP_ALIVE,
-        "messages": messages,
-        "stream": stream,
-        "options": {"num_ctx": 8192, "temperature": 0.3},
-    }
-
-    logger.info(f"[GENERAL_CHAT] REQUEST: {user_message}")
+    log_payload("[GENERAL_CHAT] REQUEST", user_message)
     logger.info("LLAMA isteği gönderildi.")
 
     start_time = time.time()
 
     if stream:
-
-        async def generate():
-            client = get_client()
-            async with client.stream("POST", OLLAMA_URL, json=payload) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line:
-                        data = json.loads(line)
-                        if "message" in data and "content" in data["message"]:
-                            yield data["message"]["content"]
-
-        return generate()
+        # Reject before the response starts; the slot is taken once streaming begins.
+        scheduler.check_admission("chat")
+
+        return _stream_chat(
+            messages,
+            {"temperature": 0.3},
+            priority="chat",
+            affinity=affinity,
+        )
     else:
         response_content = await _call_chat(
-            messages=messages, options={"num_ctx": 8192, "temperature": 0.3}
+            messages=messages,
+            options={"temperature": 0.3},
+            priority="chat",
+            affinity=affinity,
         )
 
         end_time = time.time()
         elapsed_ms = (end_time - start_time) * 1000
-        logger.info(f"[GENERAL_CHAT] RESPONSE ({elapsed_ms:.2f}ms): {response_content}")
+        log_payload(
+            f"[GENERAL_CHAT] RESPONSE ({elapsed_ms:.2f}ms)",
+            response_content,
+            elapsed_ms=round(elapsed_ms, 2),
+        )
         return response_content
 
 
-async def get_embeddings(texts: list[str]) -> list[list[float]]:
-    if not OLLAMA_EMBEDDINGS_URL:
-        raise ValueError("OLLAMA_EMBEDDINGS_URL is not configured")
+# Caps in-flight embedding sub-requests per priority class. A bulk indexing
+# fan-out waits here behind its own requests only; across classes the
+# scheduler decides who goes first.
+_embedding_semaphores: dict[str, asyncio.Semaphore] = {}
+
 
-    embeddings: list[list[float]] = []
+def _embedding_semaphore(priority: str) -> asyncio.Semaphore:
+    semaphore = _embedding_semaphores.get(priority)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, EMBEDDING_CONCURRENCY))
+        _embedding_semaphores[priority] = semaphore
+    return semaphore
+
+embedding_cache = EmbeddingCache(
+    EMBEDDING_MODEL, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DIR
+)
+
+verification_policy = VerificationPolicy(
+    VERIFICATION_MODES, VERIFICATION_GROUNDING_THRESHOLD
+)
+
+context_compressor = ContextCompressor(CONTEXT_COMPRESSION, CONTEXT_TOKEN_BUDGET)
+
+language_detector = LanguageDetector(LANGUAGE_SAMPLE_CHARS, LANGUAGE_CACHE_SIZE)
+
+history_manager = HistoryManager(
+    HISTORY_COMPACTION,
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_KEEP_RECENT,
+    HISTORY_SUMMARY_STEP,
+    HISTORY_SUMMARY_CACHE_SIZE,
+)
+
+vector_index: VectorIndex | None = (
+    VectorIndex(VECTOR_INDEX_DIR, VECTOR_INDEX_OPEN_DOCUMENTS)
+    if VECTOR_INDEX_DIR
+    else None
+)
+
+scheduler = Scheduler(
+    SCHEDULER_CLASS_LIMITS, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_MAX_QUEUE
+)
+
+stream_metrics = StreamMetrics()
+
+# Identical in-flight requests share one upstream call.
+chat_flight = SingleFlight(SINGLEFLIGHT)
+embedding_flight = SingleFlight(SINGLEFLIGHT)
+
+
+def _http_error_detail(exc: Exception | None) -> str:
+    response = getattr(exc, "response", None)
+    if response is not None:
+        return f" | {response.status_code} {response.text}"
+    return ""
+
+
+async def _embed_single(text: str, priority: str) -> list[float]:
+    payload = {
+        "model": EMBEDDING_MODEL,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "prompt": text,
+    }
 
     client = get_client()
-    for text in texts:
-        payload = {
-            "model": EMBEDDING_MODEL,
-            "keep_alive": OLLAMA_KEEP_ALIVE,
-            "prompt": text,
-        }
+    last_exc: Exception | None = None
+    for attempt in range(1, EMBEDDING_RETRIES + 1):
+        try:
+            async with _embedding_semaphore(priority), scheduler.slot(priority):
+                async with embedding_pool.acquire() as upstream:
+                    response = await client.post(
+                        upstream.url("embeddings"), json=payload
+                    )
+                    response.raise_for_status()
+            return response.json()["embedding"]
+        except httpx.HTTPError as exc:
+            last_exc = exc
+            logger.warning(
+                "Embedding request failed (attempt %s)%s",
+                attempt,
+                _http_error_detail(exc),
+            )
+            if attempt < EMBEDDING_RETRIES:
+                await asyncio.sleep(0.5 * attempt)
 
-        last_exc: Exception | None = None
-        for attempt in range(1, 4):
-            try:
-                response = await client.post(OLLAMA_EMBEDDINGS_URL, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                embeddings.append(data["embedding"])
-                last_exc = None
-                break
-            except httpx.HTTPError as exc:
-                last_exc = exc
-                detail = ""
-                if hasattr(exc, "response") and exc.response is not None:
-                    detail = f" | {exc.response.status_code} {exc.response.text}"
-                logger.warning(
-                    "Embedding request failed (attempt %s)%s", attempt, detail
-                )
-                if attempt < 3:
-                    await asyncio.sleep(0.5 * attempt)
+    detail = _http_error_detail(last_exc)
+    logger.error("Embedding request failed%s", detail)
+    raise RuntimeError(f"Embedding request failed{detail}") from last_exc
 
-        if last_exc is not None:
-            detail = ""
-            if hasattr(last_exc, "response") and last_exc.response is not None:
-                detail = f" | {last_exc.response.status_code} {last_exc.response.text}"
-            logger.exception("Embedding request failed%s", detail)
-            raise RuntimeError(f"Embedding request failed{detail}") from last_exc
+
+async def _embed_batch(texts: list[str], priority: str) -> list[list[float]] | None:
+    """
+    Embed several texts with a single /api/embed call.
+    Returns None when the upstream does not provide the batch endpoint.
+    """
+    payload = {
+        "model": EMBEDDING_MODEL,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "input": texts,
+    }
+    client = get_client()
+    async with _embedding_semaphore(priority), scheduler.slot(priority):
+        async with embedding_pool.acquire() as upstream:
+            batch_url = upstream.url("embed")
+            if not batch_url or upstream.capabilities.get("embed_batch") is False:
+                return None
+            response = await client.post(batch_url, json=payload)
+
+            if response.status_code in (404, 405):
+                response_text = (response.text or "").lower()
+                if not ("model" in response_text and "not found" in response_text):
+                    logger.warning(
+                        "Batch embedding endpoint not available at %s, using single requests.",
+                        batch_url,
+                    )
+                    upstream.capabilities["embed_batch"] = False
+                    return None
+
+            response.raise_for_status()
+
+    vectors = response.json().get("embeddings")
+    if not isinstance(vectors, list) or len(vectors) != len(texts):
+        raise ValueError("Batch embedding response size mismatch")
+    upstream.capabilities["embed_batch"] = True
+    return vectors
+
+
+async def _embed_chunk(texts: list[str], priority: str) -> list[list[float]]:
+    # Batch support is learned per upstream; skip it once none has it.
+    if any(
+        u.url("embed") and u.capabilities.get("embed_batch") is not False
+        for u in embedding_pool.upstreams
+    ):
+        try:
+            vectors = await _embed_batch(texts, priority)
+            if vectors is not None:
+                return vectors
+        except (httpx.HTTPError, ValueError, KeyError) as exc:
+            # Retry item by item so one bad input doesn't fail the whole batch.
+            logger.warning(
+                "Batch embedding failed, retrying items individually: %s%s",
+                exc,
+                _http_error_detail(exc),
+            )
+
+    return list(
+        await asyncio.gather(*(_embed_single(text, priority) for text in texts))
+    )
+
+
+async def _fetch_embeddings(texts: list[str], priority: str) -> list[list[float]]:
+    batch_size = max(1, EMBEDDING_BATCH_SIZE)
+    chunks = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*(_embed_chunk(chunk, priority) for chunk in chunks))
+
+    return [vector for chunk_vectors in results for vector in chunk_vectors]
+
+
+async def get_embeddings(
+    texts: list[str], priority: str = "embeddings"
+) -> list[list[float]]:
+    if not embedding_pool.upstreams:
+        raise ValueError("OLLAMA_EMBEDDINGS_URL is not configured")
+
+    embeddings: list[list[float] | None] = [None] * len(texts)
+    missing: dict[str, list[int]] = {}
+    for idx, text in enumerate(texts):
+        cached = embedding_cache.get(text)
+        if cached is not None:
+            embeddings[idx] = cached
+        else:
+            missing.setdefault(text, []).append(idx)
+
+    if missing:
+        unique_texts = list(missing)
+        vectors = await timed(
+            "embeddings",
+            "embed",
+            embedding_flight.do(
+                payload_key(EMBEDDING_MODEL, unique_texts),
+                lambda: _fetch_embeddings(unique_texts, priority),
+            ),
+        )
+        for text, vector in zip(unique_texts, vectors):
+            embedding_cache.put(text, vector)
+            for idx in missing[text]:
+                embeddings[idx] = vector
+        await embedding_cache.flush()
+
+    served = len(texts) - sum(len(indexes) for indexes in missing.values())
+    if served:
+        logger.info(
+            "Embedding cache: %s/%s texts served from cache", served, len(texts)
+        )
 
     return embeddings
 
 
+def _require_vector_index() -> VectorIndex:
+    if vector_index is None:
+        raise RuntimeError("Local vector index is disabled (VECTOR_INDEX_DIR)")
+    return vector_index
+
+
+async def index_document_chunks(document_id: str, chunks: list[dict]) -> int:
+    index = _require_vector_index()
+    missing = [i for i, chunk in enumerate(chunks) if not chunk.get("embedding")]
+    if missing:
+        vectors = await get_embeddings([chunks[i]["text"] for i in missing])
+        for i, vector in zip(missing, vectors):
+            chunks[i]["embedding"] = vector
+
+    vectors = [chunk.pop("embedding") for chunk in chunks]
+    # Writing the .npy and manifest of a large document would stall the loop.
+    return await asyncio.to_thread(index.upsert, document_id, chunks, vectors)
+
+
+async def delete_document_index(document_id: str) -> bool:
+    return await asyncio.to_thread(_require_vector_index().delete, document_id)
+
+
+async def search_document(document_id: str, query: str, top_k: int) -> list[dict]:
+    index = _require_vector_index()
+    start_time = time.time()
+    # The query embedding is on the interactive path, unlike bulk indexing.
+    [query_vector] = await get_embeddings([query], priority="rag")
+    with stage("rag", "search"):
+        hits = index.search(document_id, query_vector, top_k)
+    logger.info(
+        "[RAG_SEARCH] %s hits for %s in %.2fms",
+        len(hits),
+        document_id,
+        (time.time() - start_time) * 1000,
+    )
+    return hits
+
+
 async def ask_document(
     question: str,
     context: str,
     history: list[dict] = [],
     stream: bool = False,
 ) -> str | AsyncGenerator:
-    resolved_language = _infer_context_language(context)
-    messages = [{"role": "system", "content": RAG_SYSTEM_PROMPT}]
-
-    # Add history messages if any
-    for msg in history:
-        if msg.get("role") in ["user", "assistant", "system"]:
-            messages.append(msg)
-
-    messages.append(
-        {
-            "role": "user",
-            "content": (
-                f"Bağlam:\n{context}\n\n"
-                f"Soru: {question}\n\n"
-                f"ÇIKTI DİLİ: {resolved_language}.\n"
-                f"{_language_quality_directive(resolved_language)}"
-            ),
-        }
-    )
-
-    payload = {
-        "model": MODEL_NAME,
-        "keep_alive": OLLAMA_KEEP_ALIVE,
-        "messages": messages,
-        "stream": stream,
-        "options": {"num_ctx": 4096, "temperature": 0.3},
-    }
+    if PROMPT_LAYOUT == "prefix":
+        # System prompt and document first, identical on every turn, so only the
+        # history delta and the new question need prompt evaluation. Compression
+        # must not depend on the question here, or the prefix would change.
+        context = _compress_context(context, None, "DOCUMENT_CHAT", "rag")
+        resolved_language = language_detector.detect(context)
+        messages = [
+            {"role": "system", "content": RAG_SYSTEM_PROMPT},
+            {"role": "system", "content": f"Bağlam:\n{context}"},
+        ]
+        messages += await _prepare_history(history, "rag")
+        messages.append(
+            {
+                "role": "user",
+                "content": (
+                    f"Soru: {question}\n\n"
+                    f"ÇIKTI DİLİ: {resolved_language}.\n"
+                    f"{_language_quality_directive(resolved_language)}"
+                ),
+            }
+        )
+    else:
+        context = _compress_context(context, question, "DOCUMENT_CHAT", "rag")
+        resolved_language = language_detector.detect(context)
+        messages = [{"role": "system", "content": RAG_SYSTEM_PROMPT}]
+        messages += await _prepare_history(history, "rag")
+        messages.append(
+            {
+                "role": "user",
+                "content": (
+                    f"Bağlam:\n{context}\n\n"
+                    f"Soru: {question}\n\n"
+                    f"ÇIKTI DİLİ: {resolved_language}.\n"
+                    f"{_language_quality_directive(resolved_language)}"
+                ),
+            }
+        )
+    # Follow-up questions on the same document go to the upstream that has it cached.
+    affinity = _affinity_key(context)
 
-    logger.info(f"[DOCUMENT_CHAT] REQUEST: {question}")
+    log_payload("[DOCUMENT_CHAT] REQUEST", question)
     logger.info("LLAMA isteği gönderildi.")
 
     start_time = time.time()
 
     if stream:
-
-        async def generate():
-            client = get_client()
-            async with client.stream("POST", OLLAMA_URL, json=payload) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line:
-                        data = json.loads(line)
-                        if "message" in data and "content" in data["message"]:
-                            yield data["message"]["content"]
-
-        return generate()
+        scheduler.check_admission("rag")
+
+        return _stream_chat(
+            messages,
+            {"temperature": 0.3},
+            priority="rag",
+            affinity=affinity,
+            output_tokens=RAG_OUTPUT_TOKENS,
+        )
     else:
-        draft_response = await _call_chat(
-            messages=messages, options={"num_ctx": 4096, "temperature": 0.3}
+        draft_response = await timed(
+            "rag",
+            "draft",
+            _call_chat(
+                messages=messages,
+                options={"temperature": 0.3},
+                priority="rag",
+                affinity=affinity,
+                output_tokens=RAG_OUTPUT_TOKENS,
+            ),
         )
 
         verified_response = draft_response
-        try:
-            verified_response = await _call_chat(
-                messages=[
-                    {"role": "system", "content": RAG_VERIFICATION_PROMPT},
-                    {
-                        "role": "user",
-                        "content": (
-                            f"Bağlam:\n{context}\n\n"
-                            f"Soru:\n{question}\n\n"
-                            f"ÇIKTI DİLİ: {resolved_language}.\n"
-                            f"{_language_quality_directive(resolved_language)}\n\n"
-                            f"İlk Cevap:\n{draft_response}"
-                        ),
-                    },
-                ],
-                options={"num_ctx": 4096, "temperature": 0.1},
-            )
-        except Exception as verify_error:
-            logger.warning(
-                "RAG verification failed, using draft response: %s", verify_error
-            )
+        if verification_policy.should_verify("rag", draft_response, context):
+            try:
+                verified_response = await timed(
+                    "rag",
+                    "verify",
+                    _call_chat(
+                        messages=[
+                            {"role": "system", "content": RAG_VERIFICATION_PROMPT},
+                            {
+                                "role": "user",
+                                "content": (
+                                    f"Bağlam:\n{context}\n\n"
+                                    f"Soru:\n{question}\n\n"
+                                    f"ÇIKTI DİLİ: {resolved_language}.\n"
+                                    f"{_language_quality_directive(resolved_language)}\n\n"
+                                    f"İlk Cevap:\n{draft_response}"
+                                ),
+                            },
+                        ],
+                        options={"temperature": 0.1},
+                        priority="rag",
+                        affinity=affinity,
+                        output_tokens=estimate_tokens(draft_response)
+                        + VERIFY_EXTRA_OUTPUT_TOKENS,
+                    ),
+                )
+                verification_policy.record_result(
+                    "rag", draft_response, verified_response
+                )
+            except Exception as verify_error:
+                verification_policy.record_failure("rag")
+                logger.warning(
+                    "RAG verification failed, using draft response: %s", verify_error
+                )
 
         end_time = time.time()
         elapsed_ms = (end_time - start_time) * 1000
 
-        logger.info(
-            f"[DOCUMENT_CHAT] RESPONSE ({elapsed_ms:.2f}ms): {verified_response}"
+        log_payload(
+            f"[DOCUMENT_CHAT] RESPONSE ({elapsed_ms:.2f}ms)",
+            verified_response,
+            elapsed_ms=round(elapsed_ms, 2),
         )
         return verified_response
 
 
+_DUPLICATE_SIMILARITY = 0.8
+
+quiz_parser = ItemParser(
+    "quiz", QuizQuestion, ("questions", "quiz"), repair_quiz_question, "question"
+)
+flashcard_parser = ItemParser(
+    "flashcards", Flashcard, ("cards", "flashcards"), repair_flashcard, "front"
+)
+
+
+def _response_format(parser: ItemParser) -> bool | dict:
+    """The item schema for the upstream's JSON mode, or plain JSON mode."""
+    return parser.schema if STRUCTURED_OUTPUT_SCHEMA else True
+
+
+def _join_instructions(instructions: str | None, extra: str | None) -> str | None:
+    parts = [part for part in (instructions, extra) if part]
+    return "\n".join(parts) if parts else None
+
+
+def _split_context(context: str, parts: int) -> list[str]:
+    """Split the context into up to `parts` contiguous segments of similar size."""
+    units = [u.strip() for u in re.split(r"\n\s*-{3,}\s*\n", context) if u.strip()]
+    separator = "\n\n---\n\n"
+    if len(units) < parts:
+        units = [u for u in re.split(r"(?<=[.!?…])\s+", context) if u.strip()]
+        separator = " "
+    if len(units) <= 1:
+        return [context]
+
+    parts = min(parts, len(units))
+    target = sum(len(u) for u in units) / parts
+    segments: list[list[str]] = [[]]
+    size = 0
+    for unit in units:
+        if size >= target and len(segments) < parts:
+            segments.append([])
+            size = 0
+        segments[-1].append(unit)
+        size += len(unit)
+    return [separator.join(segment) for segment in segments]
+
+
+def _is_duplicate(stems: set[str], kept_stems: list[set[str]]) -> bool:
+    return any(
+        stems
+        and other
+        and len(stems & other) / len(stems | other) >= _DUPLICATE_SIMILARITY
+        for other in kept_stems
+    )
+
+
+def _dedupe_items(items: list[dict], field: str) -> list[dict]:
+    kept: list[dict] = []
+    kept_stems: list[set[str]] = []
+    for item in items:
+        stems = content_stems(str(item.get(field, "")))
+        if not _is_duplicate(stems, kept_stems):
+            kept.append(item)
+            kept_stems.append(stems)
+    return kept
+
+
+def _avoid_instruction(items: list[dict], field: str) -> str | None:
+    existing = "\n".join(f"- {item.get(field, '')}" for item in items)
+    return f"Şu maddelerden farklı içerik üret:\n{existing}" if existing else None
+
+
+async def _fan_out_generation(
+    parser: ItemParser, context: str, count: int, generate_part
+) -> list[dict]:
+    """
+    Split `count` across context segments, generate the parts concurrently,
+    then merge and dedupe the items (shortfalls are topped up by the caller).
+    """
+    part_count = math.ceil(count / max(1, GENERATION_FANOUT_PART_SIZE))
+    segments = _split_context(context, part_count)
+    base, extra = divmod(count, len(segments))
+    counts = [base + (1 if i < extra else 0) for i in range(len(segments))]
+
+    semaphore = asyncio.Semaphore(max(1, GENERATION_FANOUT_CONCURRENCY))
+
+    async def run(segment: str, n: int, avoid: str | None = None) -> list[dict]:
+        async with semaphore:
+            try:
+                items = await generate_part(segment, n, avoid)
+                report_progress("part_done", items=len(items))
+                return items
+            except Exception as part_error:
+                logger.warning("%s fan-out part failed: %s", parser.kind, part_error)
+                return []
+
+    start_time = time.time()
+    results = await asyncio.gather(
+        *(run(segment, n) for segment, n in zip(segments, counts) if n > 0)
+    )
+    items = _dedupe_items(
+        [item for part in results for item in part], parser.dedupe_field
+    )
+
+    logger.info(
+        "[%s] Fan-out: %s parts, %s/%s items in %.2fms",
+        parser.kind.upper(),
+        len(segments),
+        min(len(items), count),
+        count,
+        (time.time() - start_time) * 1000,
+    )
+    return items
+
+
+async def _generate_items(
+    parser: ItemParser, context: str, count: int, generate_part
+) -> list[dict]:
+    """
+    Generate `count` valid items. Invalid or missing items are regenerated on
+    their own (up to STRUCTURED_OUTPUT_RETRIES extra calls), asking for only the
+    missing number and for content different from what is already kept.
+    """
+    if GENERATION_FANOUT and count >= GENERATION_FANOUT_MIN_COUNT:
+        items = await _fan_out_generation(parser, context, count, generate_part)
+    else:
+        items = _dedupe_items(
+            await generate_part(context, count, None), parser.dedupe_field
+        )
+
+    for _ in range(max(0, STRUCTURED_OUTPUT_RETRIES)):
+        missing = count - len(items)
+        if missing <= 0:
+            break
+        logger.info(
+            "[%s] %s/%s valid items, regenerating %s",
+            parser.kind.upper(),
+            len(items),
+            count,
+            missing,
+        )
+        parser.regenerated_items += missing
+        avoid = _avoid_instruction(items, parser.dedupe_field)
+        try:
+            extra = await generate_part(context, missing, avoid)
+        except Exception as retry_error:
+            logger.warning("%s regeneration failed: %s", parser.kind, retry_error)
+            break
+        items = _dedupe_items(items + extra, parser.dedupe_field)
+
+    if not items:
+        raise ValueError(f"Model output contained no valid {parser.kind} items")
+    return items[:count]
+
+
 async def generate_quiz(
     context: str,
     count: int,
     difficulty: str,
     instructions: str | None = None,
-) -> str:
-    messages = [{"role": "system", "content": QUIZ_SYSTEM_PROMPT}]
+) -> dict:
+    context = _compress_context(context, instructions, "QUIZ", "quiz")
     resolved_output_language = _resolve_output_language(context, instructions)
 
+    async def generate_part(part_context: str, part_count: int, extra: str | None):
+        return await _generate_quiz_once(
+            part_context,
+            part_count,
+            difficulty,
+            _join_instructions(instructions, extra),
+            resolved_output_language,
+        )
+
+    items = await _generate_items(quiz_parser, context, count, generate_part)
+    return {quiz_parser.keys[0]: items}
+
+
+def _quiz_messages(
+    context: str,
+    count: int,
+    difficulty: str,
+    instructions: str | None,
+    resolved_output_language: str,
+) -> list[dict]:
+    messages = [{"role": "system", "content": QUIZ_SYSTEM_PROMPT}]
+
     req_text = f"Bağlam:\n{context}\n\nİstek: Lütfen bu bağlama göre {count} adet {difficulty} (zorluk) seviyede soru içeren bir seçenekli test hazırla."
     req_text += f"\n\n{_language_priority_directive(instructions)}"
     req_text += f"\nÇIKTI DİLİ: {resolved_output_language}."
@@ -437,32 +1103,81 @@ async def generate_quiz(
             "content": req_text,
         }
     )
+    return messages
+
 
-    draft_json = await _call_chat(messages=messages, force_json=True)
-    draft_json = _extract_json_block(draft_json)
+async def _generate_quiz_once(
+    context: str,
+    count: int,
+    difficulty: str,
+    instructions: str | None,
+    resolved_output_language: str,
+) -> list[dict]:
+    messages = _quiz_messages(
+        context, count, difficulty, instructions, resolved_output_language
+    )
+
+    report_progress("draft", count=count)
+    draft_text = await timed(
+        "quiz",
+        "draft",
+        _call_chat(
+            messages=messages,
+            force_json=_response_format(quiz_parser),
+            priority="generation",
+            output_tokens=count * QUIZ_OUTPUT_TOKENS_PER_ITEM,
+        ),
+    )
+    draft = quiz_parser.parse(draft_text)
+    if not draft.items:
+        return []
+    # Verification sees only the valid, normalised items.
+    draft_json = quiz_parser.dump(draft.items)
 
+    if not verification_policy.should_verify("quiz", draft_json, context):
+        return draft.items
+
+    report_progress("verify")
     try:
-        verified_json = await _call_chat(
-            messages=[
-                {"role": "system", "content": QUIZ_VERIFICATION_PROMPT},
-                {
-                    "role": "user",
-                    "content": (
-                        f"Bağlam:\n{context}\n\n"
-                        f"{_language_priority_directive(instructions)}\n\n"
-                        f"ÇIKTI DİLİ: {resolved_output_language}.\n\n"
-                        f"{_language_quality_directive(resolved_output_language)}\n\n"
-                        f"Quiz JSON:\n{draft_json}"
-                    ),
-                },
-            ],
-            force_json=True,
-            options={"num_ctx": 4096, "temperature": 0.1},
+        verified_json = await timed(
+            "quiz",
+            "verify",
+            _call_chat(
+                messages=[
+                    {"role": "system", "content": QUIZ_VERIFICATION_PROMPT},
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Bağlam:\n{context}\n\n"
+                            f"{_language_priority_directive(instructions)}\n\n"
+                            f"ÇIKTI DİLİ: {resolved_output_language}.\n\n"
+                            f"{_language_quality_directive(resolved_output_language)}\n\n"
+                            f"Quiz JSON:\n{draft_json}"
+                        ),
+                    },
+                ],
+                force_json=_response_format(quiz_parser),
+                options={"temperature": 0.1},
+                priority="generation",
+                output_tokens=estimate_tokens(draft_json) + VERIFY_EXTRA_OUTPUT_TOKENS,
+            ),
+        )
+        verified = quiz_parser.parse(verified_json)
+        verification_policy.record_result(
+            "quiz", draft_json, quiz_parser.dump(verified.items)
         )
-        return _extract_json_block(verified_json)
+        if len(verified.items) < len(draft.items):
+            logger.warning(
+                "Quiz verification kept %s/%s valid items, using draft",
+                len(verified.items),
+                len(draft.items),
+            )
+            return draft.items
+        return verified.items
     except Exception as verify_error:
+        verification_policy.record_failure("quiz")
         logger.warning("Quiz verification failed, using draft JSON: %s", verify_error)
-        return draft_json
+        return draft.items
 
 
 async def generate_flashcards(
@@ -470,10 +1185,32 @@ async def generate_flashcards(
     count: int,
     difficulty: str,
     instructions: str | None = None,
-) -> str:
-    messages = [{"role": "system", "content": FLASHCARD_SYSTEM_PROMPT}]
+) -> dict:
+    context = _compress_context(context, instructions, "FLASHCARDS", "flashcards")
     resolved_output_language = _resolve_output_language(context, instructions)
 
+    async def generate_part(part_context: str, part_count: int, extra: str | None):
+        return await _generate_flashcards_once(
+            part_context,
+            part_count,
+            difficulty,
+            _join_instructions(instructions, extra),
+            resolved_output_language,
+        )
+
+    items = await _generate_items(flashcard_parser, context, count, generate_part)
+    return {flashcard_parser.keys[0]: items}
+
+
+def _flashcard_messages(
+    context: str,
+    count: int,
+    difficulty: str,
+    instructions: str | None,
+    resolved_output_language: str,
+) -> list[dict]:
+    messages = [{"role": "system", "content": FLASHCARD_SYSTEM_PROMPT}]
+
     req_text = f"Bağlam:\n{context}\n\nİstek: Lütfen bu bağlama göre {count} adet {difficulty} (zorluk) seviyede flash kart hazırla."
     req_text += f"\n\n{_language_priority_directive(instructions)}"
     req_text += f"\nÇIKTI DİLİ: {resolved_output_language}."
@@ -485,31 +1222,279 @@ async def generate_flashcards(
             "content": req_text,
         }
     )
+    return messages
+
+
+async def _generate_flashcards_once(
+    context: str,
+    count: int,
+    difficulty: str,
+    instructions: str | None,
+    resolved_output_language: str,
+) -> list[dict]:
+    messages = _flashcard_messages(
+        context, count, difficulty, instructions, resolved_output_language
+    )
+
+    report_progress("draft", count=count)
+    draft_text = await timed(
+        "flashcards",
+        "draft",
+        _call_chat(
+            messages=messages,
+            force_json=_response_format(flashcard_parser),
+            priority="generation",
+            output_tokens=count * FLASHCARD_OUTPUT_TOKENS_PER_ITEM,
+        ),
+    )
+    draft = flashcard_parser.parse(draft_text)
+    if not draft.items:
+        return []
+    # Verification sees only the valid, normalised items.
+    draft_json = flashcard_parser.dump(draft.items)
 
-    draft_json = await _call_chat(messages=messages, force_json=True)
-    draft_json = _extract_json_block(draft_json)
+    if not verification_policy.should_verify("flashcards", draft_json, context):
+        return draft.items
 
+    report_progress("verify")
     try:
-        verified_json = await _call_chat(
-            messages=[
-                {"role": "system", "content": FLASHCARD_VERIFICATION_PROMPT},
-                {
-                    "role": "user",
-                    "content": (
-                        f"Bağlam:\n{context}\n\n"
-                        f"{_language_priority_directive(instructions)}\n\n"
-                        f"ÇIKTI DİLİ: {resolved_output_language}.\n\n"
-                        f"{_language_quality_directive(resolved_output_language)}\n\n"
-                        f"Flashcards JSON:\n{draft_json}"
-                    ),
-                },
-            ],
-            force_json=True,
-            options={"num_ctx": 4096, "temperature": 0.1},
+        verified_json = await timed(
+            "flashcards",
+            "verify",
+            _call_chat(
+                messages=[
+                    {"role": "system", "content": FLASHCARD_VERIFICATION_PROMPT},
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Bağlam:\n{context}\n\n"
+                            f"{_language_priority_directive(instructions)}\n\n"
+                            f"ÇIKTI DİLİ: {resolved_output_language}.\n\n"
+                            f"{_language_quality_directive(resolved_output_language)}\n\n"
+                            f"Flashcards JSON:\n{draft_json}"
+                        ),
+                    },
+                ],
+                force_json=_response_format(flashcard_parser),
+                options={"temperature": 0.1},
+                priority="generation",
+                output_tokens=estimate_tokens(draft_json) + VERIFY_EXTRA_OUTPUT_TOKENS,
+            ),
+        )
+        verified = flashcard_parser.parse(verified_json)
+        verification_policy.record_result(
+            "flashcards", draft_json, flashcard_parser.dump(verified.items)
         )
-        return _extract_json_block(verified_json)
+        if len(verified.items) < len(draft.items):
+            logger.warning(
+                "Flashcard verification kept %s/%s valid items, using draft",
+                len(verified.items),
+                len(draft.items),
+            )
+            return draft.items
+        return verified.items
     except Exception as verify_error:
+        verification_policy.record_failure("flashcards")
         logger.warning(
             "Flashcard verification failed, using draft JSON: %s", verify_error
         )
-        return draft_json
+        return draft.items
+
+
+# ── Akışlı (streaming) Quiz / Flash Kart Üretimi ──────────────────────────────
+
+
+async def _stream_parsed_items(
+    parser: ItemParser, messages: list[dict], output_tokens: int
+) -> AsyncGenerator[dict, None]:
+    """Stream one draft and yield each valid item as soon as it is complete."""
+    items = parser.stream()
+    async for event in _stream_chat(
+        messages,
+        None,
+        priority="generation",
+        output_tokens=output_tokens,
+        force_json=_response_format(parser),
+    ):
+        if event["event"] == "token":
+            for item in items.feed(event["content"]):
+                yield item
+    for item in items.finish():
+        yield item
+
+
+async def _merge_item_streams(
+    streams: list[AsyncGenerator[dict, None]], kind: str
+) -> AsyncGenerator[dict, None]:
+    """
+    Run the part streams concurrently (GENERATION_FANOUT_CONCURRENCY at a time)
+    and yield items in arrival order. A failed part is logged and skipped; the
+    last error is raised only if no part produced anything.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, GENERATION_FANOUT_CONCURRENCY))
+    errors: list[Exception] = []
+    done = object()
+
+    async def run(stream: AsyncGenerator[dict, None]):
+        try:
+            async with semaphore:
+                async for item in stream:
+                    await queue.put(item)
+        except Exception as part_error:
+            logger.warning("%s stream part failed: %s", kind, part_error)
+            errors.append(part_error)
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.create_task(run(stream)) for stream in streams]
+    produced = False
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            produced = True
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if errors and not produced:
+        raise errors[-1]
+
+
+async def _stream_items(
+    parser: ItemParser, context: str, count: int, stream_part
+) -> AsyncGenerator[dict, None]:
+    """
+    Streaming counterpart of _generate_items: yields {"event": "item"} for
+    each valid, non-duplicate item as soon as the model closes it, then
+    {"event": "done"}. Fan-out parts stream concurrently and missing items are
+    regenerated the same way. Items are not verified: they are already sent.
+    """
+    start = time.perf_counter()
+    first_item_ms: float | None = None
+    kept: list[dict] = []
+    kept_stems: list[set[str]] = []
+
+    if GENERATION_FANOUT and count >= GENERATION_FANOUT_MIN_COUNT:
+        part_count = math.ceil(count / max(1, GENERATION_FANOUT_PART_SIZE))
+        segments = _split_context(context, part_count)
+        base, extra = divmod(count, len(segments))
+        counts = [base + (1 if i < extra else 0) for i in range(len(segments))]
+        parts = [(segment, n) for segment, n in zip(segments, counts) if n > 0]
+    else:
+        parts = [(context, count)]
+    streams = [stream_part(segment, n, None) for segment, n in parts]
+
+    for attempt in range(max(0, STRUCTURED_OUTPUT_RETRIES) + 1):
+        if attempt:
+            missing = count - len(kept)
+            if missing <= 0:
+                break
+            logger.info(
+                "[%s] %s/%s valid items streamed, regenerating %s",
+                parser.kind.upper(),
+                len(kept),
+                count,
+                missing,
+            )
+            parser.regenerated_items += missing
+            avoid = _avoid_instruction(kept, parser.dedupe_field)
+            streams = [stream_part(context, missing, avoid)]
+
+        merged = _merge_item_streams(streams, parser.kind)
+        try:
+            async for item in merged:
+                stems = content_stems(str(item.get(parser.dedupe_field, "")))
+                if _is_duplicate(stems, kept_stems):
+                    continue
+                if first_item_ms is None:
+                    first_item_ms = (time.perf_counter() - start) * 1000
+                kept.append(item)
+                kept_stems.append(stems)
+                yield {"event": "item", "index": len(kept) - 1, "item": item}
+                if len(kept) >= count:
+                    break
+        except Exception as part_error:
+            if not kept:
+                raise
+            logger.warning("%s regeneration failed: %s", parser.kind, part_error)
+            break
+        finally:
+            # Stops the remaining parts once enough items were sent.
+            await merged.aclose()
+
+    if not kept:
+        raise ValueError(f"Model output contained no valid {parser.kind} items")
+
+    duration_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        "[%s] Streamed %s/%s items, first after %sms, %.2fms total",
+        parser.kind.upper(),
+        len(kept),
+        count,
+        f"{first_item_ms:.2f}" if first_item_ms is not None else "-",
+        duration_ms,
+    )
+    yield {
+        "event": "done",
+        "count": len(kept),
+        "requested": count,
+        "first_item_ms": round(first_item_ms, 2) if first_item_ms else None,
+        "duration_ms": round(duration_ms, 2),
+    }
+
+
+def stream_quiz(
+    context: str,
+    count: int,
+    difficulty: str,
+    instructions: str | None = None,
+) -> AsyncGenerator[dict, None]:
+    # Reject before the response starts; slots are taken once streaming begins.
+    scheduler.check_admission("generation")
+    context = _compress_context(context, instructions, "QUIZ", "quiz")
+    resolved_output_language = _resolve_output_language(context, instructions)
+
+    def stream_part(part_context: str, part_count: int, extra: str | None):
+        messages = _quiz_messages(
+            part_context,
+            part_count,
+            difficulty,
+            _join_instructions(instructions, extra),
+            resolved_output_language,
+        )
+        return _stream_parsed_items(
+            quiz_parser, messages, part_count * QUIZ_OUTPUT_TOKENS_PER_ITEM
+        )
+
+    return _stream_items(quiz_parser, context, count, stream_part)
+
+
+def stream_flashcards(
+    context: str,
+    count: int,
+    difficulty: str,
+    instructions: str | None = None,
+) -> AsyncGenerator[dict, None]:
+    scheduler.check_admission("generation")
+    context = _compress_context(context, instructions, "FLASHCARDS", "flashcards")
+    resolved_output_language = _resolve_output_language(context, instructions)
+
+    def stream_part(part_context: str, part_count: int, extra: str | None):
+        messages = _flashcard_messages(
+            part_context,
+            part_count,
+            difficulty,
+            _join_instructions(instructions, extra),
+            resolved_output_language,
+        )
+        return _stream_parsed_items(
+            flashcard_parser, messages, part_count * FLASHCARD_OUTPUT_TOKENS_PER_ITEM
+        )
+
+    return _stream_items(flashcard_parser, context, count, stream_part)
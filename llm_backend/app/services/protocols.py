@@ -0,0 +1,239 @@
+import json
+from abc import ABC, abstractmethod
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.logger import logger
+
+try:
+    # Noticeably faster than json.loads for the many small stream lines; listed
+    # in requirements.txt, json stays as the fallback for bare installs.
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+OLLAMA_CHAT_PATH = "/api/chat"
+OPENAI_CHAT_PATH = "/v1/chat/completions"
+
+# Ollama options that have a direct OpenAI-compatible counterpart.
+_OPENAI_OPTION_NAMES = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "seed": "seed",
+    "stop": "stop",
+    "num_predict": "max_tokens",
+}
+
+
+# Generation stats Ollama sends with the final stream line (durations in ns).
+_OLLAMA_DONE_FIELDS = (
+    "prompt_eval_count",
+    "eval_count",
+    "total_duration",
+    "load_duration",
+    "prompt_eval_duration",
+    "eval_duration",
+)
+
+
+class StreamChunk:
+    """One parsed line of a streamed response."""
+
+    __slots__ = ("content", "done", "stats")
+
+    def __init__(self, content: str | None = None, done: bool = False, stats=None):
+        self.content = content
+        self.done = done
+        self.stats: dict | None = stats
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _chat_url(configured_url: str, path: str) -> str:
+    """The configured chat URL rewritten to use `path`."""
+    for known in (OLLAMA_CHAT_PATH, OPENAI_CHAT_PATH):
+        if known in configured_url:
+            return configured_url.replace(known, path)
+    return f"{_origin(configured_url)}{path}"
+
+
+class ChatProtocol(ABC):
+    """Request/response format of one chat API flavour."""
+
+    name = ""
+    chat_path = ""
+    probe_path = ""
+
+    def chat_url(self, configured_url: str) -> str:
+        return _chat_url(configured_url, self.chat_path)
+
+    @abstractmethod
+    def build_payload(
+        self,
+        model: str,
+        messages: list[dict],
+        options: dict | None,
+        force_json: bool | dict,
+        stream: bool,
+        keep_alive,
+    ) -> dict:
+        """`force_json` is True for any JSON object, or a JSON schema to follow."""
+
+    @abstractmethod
+    def parse_response(self, data: dict) -> str:
+        """Message text of a non-streamed response."""
+
+    @abstractmethod
+    def parse_stream_line(self, line: str) -> StreamChunk | None:
+        """Parse one line of a streamed response; None for lines without data."""
+
+    @abstractmethod
+    def parse_usage(self, data: dict) -> dict:
+        """Token counts of a non-streamed response, in Ollama field names."""
+
+
+class OllamaProtocol(ChatProtocol):
+    """Ollama native /api/chat: NDJSON streaming, `format` and `options`."""
+
+    name = "ollama"
+    chat_path = OLLAMA_CHAT_PATH
+    probe_path = "/api/tags"
+
+    def build_payload(self, model, messages, options, force_json, stream, keep_alive):
+        payload = {
+            "model": model,
+            "keep_alive": keep_alive,
+            "messages": messages,
+            "stream": stream,
+        }
+        if options:
+            payload["options"] = options
+        if isinstance(force_json, dict):
+            payload["format"] = force_json
+        elif force_json:
+            payload["format"] = "json"
+        return payload
+
+    def parse_response(self, data: dict) -> str:
+        message = data.get("message")
+        if isinstance(message, dict) and "content" in message:
+            return str(message["content"])
+        raise ValueError("Could not extract message content from LLM response")
+
+    def parse_stream_line(self, line: str) -> StreamChunk | None:
+        if not line:
+            return None
+        data = _loads(line)
+        message = data.get("message")
+        content = message.get("content") if isinstance(message, dict) else None
+        if data.get("done"):
+            stats = {k: data[k] for k in _OLLAMA_DONE_FIELDS if k in data}
+            return StreamChunk(content, done=True, stats=stats)
+        return StreamChunk(content)
+
+    def parse_usage(self, data: dict) -> dict:
+        return {k: data[k] for k in _OLLAMA_DONE_FIELDS if k in data}
+
+
+class OpenAIProtocol(ChatProtocol):
+    """OpenAI-compatible /v1/chat/completions: SSE streaming, `response_format`."""
+
+    name = "openai"
+    chat_path = OPENAI_CHAT_PATH
+    probe_path = "/v1/models"
+
+    def build_payload(self, model, messages, options, force_json, stream, keep_alive):
+        payload = {"model": model, "messages": messages, "stream": stream}
+        for option, name in _OPENAI_OPTION_NAMES.items():
+            if options and option in options:
+                payload[name] = options[option]
+        if isinstance(force_json, dict):
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": force_json},
+            }
+        elif force_json:
+            payload["response_format"] = {"type": "json_object"}
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def parse_response(self, data: dict) -> str:
+        choices = data.get("choices")
+        if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+            message = choices[0].get("message")
+            if isinstance(message, dict) and "content" in message:
+                return str(message["content"] or "")
+        raise ValueError("Could not extract message content from LLM response")
+
+    def parse_stream_line(self, line: str) -> StreamChunk | None:
+        if not line.startswith("data:"):
+            return None
+        raw = line[len("data:") :].strip()
+        if not raw:
+            return None
+        if raw == "[DONE]":
+            return StreamChunk(done=True)
+        data = _loads(raw)
+        content = None
+        choices = data.get("choices")
+        if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+            delta = choices[0].get("delta")
+            if isinstance(delta, dict):
+                content = delta.get("content")
+        if isinstance(data.get("usage"), dict):
+            return StreamChunk(content, stats=self.parse_usage(data))
+        return StreamChunk(content)
+
+    def parse_usage(self, data: dict) -> dict:
+        usage = data.get("usage")
+        if not isinstance(usage, dict):
+            return {}
+        return {
+            "prompt_eval_count": usage.get("prompt_tokens"),
+            "eval_count": usage.get("completion_tokens"),
+        }
+
+
+PROTOCOLS: dict[str, ChatProtocol] = {
+    p.name: p for p in (OllamaProtocol(), OpenAIProtocol())
+}
+
+
+def protocol_from_url(url: str) -> ChatProtocol:
+    """The protocol implied by the configured URL, used until probing is done."""
+    if OPENAI_CHAT_PATH in url:
+        return PROTOCOLS["openai"]
+    return PROTOCOLS["ollama"]
+
+
+async def detect_protocol(client: httpx.AsyncClient, configured_url: str) -> str | None:
+    """
+    Find which chat protocol the upstream speaks, trying the one implied by the
+    configured URL first. Returns None when the upstream cannot be reached.
+    """
+    preferred = protocol_from_url(configured_url)
+    candidates = [preferred] + [p for p in PROTOCOLS.values() if p is not preferred]
+    origin = _origin(configured_url)
+
+    reachable = False
+    for protocol in candidates:
+        try:
+            response = await client.get(f"{origin}{protocol.probe_path}", timeout=5.0)
+        except httpx.HTTPError as exc:
+            logger.warning("[PROTOCOL] Probe of %s failed: %s", origin, exc)
+            continue
+        reachable = True
+        if response.status_code == 200:
+            return protocol.name
+
+    if reachable:
+        # Neither listing endpoint exists; trust the configured URL.
+        return preferred.name
+    return None
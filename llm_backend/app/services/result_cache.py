@@ -0,0 +1,93 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    def __init__(self):
+        self.variants: list[tuple[float, dict]] = []
+        self.next_variant = 0
+
+
+class ResultCache:
+    """
+    TTL + LRU cache for generated results (quizzes, flashcards).
+
+    With `variants > 1` each key keeps up to that many distinct results: until
+    the key has collected them all, lookups miss so a fresh result is generated;
+    after that, lookups rotate through the stored variants.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, variants: int = 1):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.variants = max(1, variants)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            fresh = [v for v in entry.variants if now - v[0] < self.ttl_seconds]
+            self.expirations += len(entry.variants) - len(fresh)
+            entry.variants = fresh
+            if not fresh:
+                del self._entries[key]
+                entry = None
+
+        if entry is None or len(entry.variants) < self.variants:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        _, value = entry.variants[entry.next_variant % len(entry.variants)]
+        entry.next_variant += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.variants.append((time.monotonic(), value))
+        # Keep the newest variants only.
+        del entry.variants[: -self.variants]
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "variants": self.variants,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,154 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app.core.logger import logger
+
+# Highest priority first.
+PRIORITY_CLASSES = ("chat", "rag", "generation", "embeddings")
+
+
+class SchedulerOverloaded(RuntimeError):
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"Upstream queue for '{priority}' requests is full")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class _ClassState:
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        # Moving average of how long a slot is held, for Retry-After estimates.
+        self.avg_hold_s = 1.0
+
+    def as_dict(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": (
+                round(self.total_wait_ms / self.admitted, 2) if self.admitted else 0.0
+            ),
+            "max_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+
+class Scheduler:
+    """
+    Admission control in front of the upstream model server.
+
+    Every upstream call holds a slot while it runs. At most `max_concurrency`
+    slots are in use overall and each priority class has its own limit. When a
+    slot frees up, the waiting request of the highest priority class that is
+    still under its own limit goes next. A class whose queue already holds
+    `max_queue` requests rejects new ones with SchedulerOverloaded.
+    """
+
+    def __init__(
+        self, class_limits: dict[str, int], max_concurrency: int, max_queue: int
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._classes = {
+            name: _ClassState(class_limits.get(name, self.max_concurrency))
+            for name in PRIORITY_CLASSES
+        }
+        self._active = 0
+
+    def _state(self, priority: str) -> _ClassState:
+        state = self._classes.get(priority)
+        if state is None:
+            raise ValueError(f"Unknown priority class: {priority}")
+        return state
+
+    def _can_run(self, state: _ClassState) -> bool:
+        return self._active < self.max_concurrency and state.active < state.limit
+
+    def check_admission(self, priority: str):
+        """Raise SchedulerOverloaded if a request of this class would be queued
+        behind a full queue. Used by streaming paths before the response starts."""
+        state = self._state(priority)
+        if len(state.waiters) >= self.max_queue and not self._can_run(state):
+            state.rejected += 1
+            retry_after = math.ceil(
+                (len(state.waiters) + 1) * state.avg_hold_s / state.limit
+            )
+            logger.warning(
+                "[SCHEDULER] %s queue full (%s waiting), rejecting",
+                priority,
+                len(state.waiters),
+            )
+            raise SchedulerOverloaded(priority, min(max(1, retry_after), 60))
+
+    def _dispatch(self):
+        for state in self._classes.values():
+            while state.waiters and self._can_run(state):
+                waiter = state.waiters.popleft()
+                if waiter.done():
+                    continue
+                state.active += 1
+                self._active += 1
+                waiter.set_result(None)
+
+    async def acquire(self, priority: str):
+        self.check_admission(priority)
+        state = self._state(priority)
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        queued_at = time.perf_counter()
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation arrived; hand it back.
+                self._release(state)
+            else:
+                try:
+                    state.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+        wait_ms = (time.perf_counter() - queued_at) * 1000
+        state.admitted += 1
+        state.total_wait_ms += wait_ms
+        state.max_wait_ms = max(state.max_wait_ms, wait_ms)
+
+    def _release(self, state: _ClassState):
+        state.active -= 1
+        self._active -= 1
+        self._dispatch()
+
+    def release(self, priority: str, held_s: float | None = None):
+        state = self._state(priority)
+        if held_s is not None:
+            state.avg_hold_s = 0.8 * state.avg_hold_s + 0.2 * held_s
+        self._release(state)
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        await self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(priority, time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "max_queue": self.max_queue,
+            "classes": {name: s.as_dict() for name, s in self._classes.items()},
+        }
@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def payload_key(*parts) -> str:
+    """Stable key for a request payload (dict key order does not matter)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one upstream call.
+
+    The first caller starts the call as a separate task; callers arriving while
+    it is in flight await the same task. A caller being cancelled only detaches
+    it; the shared call is cancelled once no caller is waiting for it anymore.
+    Results are not kept after the call finishes (see the caches for that).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight: dict[str, _Call] = {}
+        self.calls = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        if not self.enabled:
+            self.upstream_calls += 1
+            return await fn()
+
+        call = self._inflight.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
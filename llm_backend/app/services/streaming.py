@@ -0,0 +1,108 @@
+import json
+from typing import AsyncIterator
+
+from app.core.logger import logger
+
+STREAM_MEDIA_TYPES = {
+    "text": "text/plain",
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def negotiate_stream_format(
+    requested: str | None, accept: str, default: str = "text"
+) -> str:
+    """Explicit `stream_format` wins, then the Accept header, then `default`."""
+    if requested:
+        return requested
+    for media_type in accept.split(","):
+        media_type = media_type.split(";")[0].strip()
+        for fmt, known in STREAM_MEDIA_TYPES.items():
+            if fmt != "text" and media_type == known:
+                return fmt
+    return default
+
+
+async def format_stream(events: AsyncIterator[dict], fmt: str) -> AsyncIterator[str]:
+    """
+    Render typed stream events ("token", "item", "done", "error").
+
+    text:   bare token text, as before; errors abort the response
+    sse:    `event: <type>` / `data: <json>` frames
+    ndjson: one JSON object per line with an "event" field
+    """
+    if fmt == "text":
+        async for event in events:
+            if event["event"] == "token":
+                yield event["content"]
+        return
+
+    def render(event: dict) -> str:
+        if fmt == "sse":
+            data = {k: v for k, v in event.items() if k != "event"}
+            return f"event: {event['event']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        return json.dumps(event, ensure_ascii=False) + "\n"
+
+    try:
+        async for event in events:
+            yield render(event)
+    except Exception as e:
+        logger.exception("Streaming error")
+        yield render({"event": "error", "detail": str(e)})
+
+
+class StreamMetrics:
+    """Time-to-first-token and generation speed of streamed responses."""
+
+    def __init__(self):
+        self._kinds: dict[str, dict] = {}
+
+    def record(
+        self,
+        kind: str,
+        ttft_ms: float | None,
+        tokens: int,
+        tokens_per_sec: float | None,
+    ):
+        stats = self._kinds.setdefault(
+            kind,
+            {
+                "streams": 0,
+                "ttft_ms_total": 0.0,
+                "ttft_ms_max": 0.0,
+                "ttft_samples": 0,
+                "tokens": 0,
+                "tps_total": 0.0,
+                "tps_samples": 0,
+            },
+        )
+        stats["streams"] += 1
+        stats["tokens"] += tokens
+        if ttft_ms is not None:
+            stats["ttft_samples"] += 1
+            stats["ttft_ms_total"] += ttft_ms
+            stats["ttft_ms_max"] = max(stats["ttft_ms_max"], ttft_ms)
+        if tokens_per_sec is not None:
+            stats["tps_samples"] += 1
+            stats["tps_total"] += tokens_per_sec
+
+    def stats(self) -> dict:
+        return {
+            kind: {
+                "streams": s["streams"],
+                "tokens": s["tokens"],
+                "avg_ttft_ms": (
+                    round(s["ttft_ms_total"] / s["ttft_samples"], 2)
+                    if s["ttft_samples"]
+                    else None
+                ),
+                "max_ttft_ms": round(s["ttft_ms_max"], 2),
+                "avg_tokens_per_sec": (
+                    round(s["tps_total"] / s["tps_samples"], 2)
+                    if s["tps_samples"]
+                    else None
+                ),
+            }
+            for kind, s in self._kinds.items()
+        }
@@ -0,0 +1,330 @@
+"""
+Structured (JSON) output for generated item lists such as quiz questions and
+flashcards: the schema sent to the upstream, tolerant parsing, per-item
+validation and local repair.
+"""
+
+import json
+import re
+from typing import Callable
+
+from pydantic import BaseModel, ValidationError
+
+from app.core.metrics import stage
+
+_JSON_START_RE = re.compile(r"[\[{]")
+# A label such as "A) ", "(b). " or "C: ". Whitespace after the separator is
+# required so option text like "B-lenfositler" or "C. elegans" is not a label.
+_OPTION_PREFIX_RE = re.compile(r"^\s*\(?([A-Da-d])\s*[\)\.:\-]\s+")
+_ANSWER_LETTERS = ("A", "B", "C", "D")
+
+
+def extract_json(text: str):
+    """
+    The first JSON value in `text`. Unlike a greedy `{.*}` match this stops at
+    the end of that value, so trailing prose or a second object cannot break it.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    decoder = json.JSONDecoder()
+    for match in _JSON_START_RE.finditer(text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+            return value
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("No JSON value found in model output")
+
+
+def _salvage_objects(text: str) -> list:
+    """
+    Complete objects of a truncated array (e.g. output cut off at num_predict):
+    `{"questions": [{...}, {...}, {"quest` yields the first two.
+    """
+    start = text.find("[")
+    if start < 0:
+        return []
+    decoder = json.JSONDecoder()
+    items = []
+    pos = start + 1
+    while True:
+        brace = text.find("{", pos)
+        if brace < 0:
+            return items
+        try:
+            value, pos = decoder.raw_decode(text, brace)
+        except json.JSONDecodeError:
+            return items
+        items.append(value)
+
+
+def _item_list(parsed, keys: tuple[str, ...]) -> list:
+    if isinstance(parsed, dict):
+        for key in keys:
+            if isinstance(parsed.get(key), list):
+                return parsed[key]
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def _strip_strings(item: dict) -> dict:
+    return {k: v.strip() if isinstance(v, str) else v for k, v in item.items()}
+
+
+def _strip_option_labels(options: list[str]) -> list[str]:
+    """
+    Options without their "A) ".."D) " labels, but only when all four carry
+    the labels in order; otherwise a leading letter is part of the text.
+    """
+    matches = [_OPTION_PREFIX_RE.match(option) for option in options]
+    if len(options) != len(_ANSWER_LETTERS) or not all(
+        match and match.group(1).upper() == letter
+        for match, letter in zip(matches, _ANSWER_LETTERS)
+    ):
+        return options
+    return [option[match.end() :].strip() for option, match in zip(options, matches)]
+
+
+def repair_quiz_question(item: dict) -> dict:
+    item = _strip_strings(item)
+
+    options = item.get("options")
+    if isinstance(options, dict):
+        options = [options[key] for key in sorted(options)]
+    if isinstance(options, list):
+        options = _strip_option_labels([str(option).strip() for option in options])
+        item["options"] = options
+
+    answer = str(item.get("answer", "")).strip()
+    if answer.upper() not in _ANSWER_LETTERS and answer:
+        # The model answered with the option text (or "B) text") instead of
+        # its letter; an exact option match wins over a label-like prefix.
+        texts = options[: len(_ANSWER_LETTERS)] if isinstance(options, list) else []
+        prefix = _OPTION_PREFIX_RE.match(answer)
+        exact = [
+            i for i, option in enumerate(texts) if answer.lower() == option.lower()
+        ]
+        if exact:
+            answer = _ANSWER_LETTERS[exact[0]]
+        elif prefix:
+            answer = prefix.group(1)
+        else:
+            for i, option in enumerate(texts):
+                if option.lower().startswith(
+                    answer.lower()
+                ) or answer.lower().startswith(option.lower()):
+                    answer = _ANSWER_LETTERS[i]
+                    break
+    item["answer"] = answer.upper()
+
+    item.setdefault("explanation", "")
+    return item
+
+
+_FLASHCARD_ALIASES = {
+    "front": ("question", "term", "concept"),
+    "back": ("answer", "definition", "explanation"),
+}
+
+
+def repair_flashcard(item: dict) -> dict:
+    item = _strip_strings(item)
+    for field, aliases in _FLASHCARD_ALIASES.items():
+        if not item.get(field):
+            for alias in aliases:
+                if item.get(alias):
+                    item[field] = item[alias]
+                    break
+    return item
+
+
+class ParsedItems:
+    def __init__(self):
+        self.items: list[dict] = []
+        self.invalid = 0
+        self.repaired = 0
+        self.salvaged = False
+        self.errors: list[str] = []
+
+
+class ItemParser:
+    """
+    Parses one kind of generated item list (`{"<key>": [item, ...]}`).
+
+    Every item is validated on its own: items that fail are first repaired
+    locally (answer letters, option prefixes, field aliases) and only dropped
+    if that does not help, so one bad item no longer loses the whole set. The
+    caller regenerates just the missing count.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        model: type[BaseModel],
+        keys: tuple[str, ...],
+        repair: Callable[[dict], dict],
+        dedupe_field: str,
+    ):
+        self.kind = kind
+        self.model = model
+        self.keys = keys
+        self.repair = repair
+        self.dedupe_field = dedupe_field
+        self.schema = {
+            "type": "object",
+            "properties": {
+                keys[0]: {"type": "array", "items": model.model_json_schema()}
+            },
+            "required": [keys[0]],
+        }
+
+        self.outputs = 0
+        self.salvaged_outputs = 0
+        self.valid_items = 0
+        self.repaired_items = 0
+        self.invalid_items = 0
+        self.regenerated_items = 0
+
+    def parse(self, text: str) -> ParsedItems:
+        with stage(self.kind, "parse"):
+            result = ParsedItems()
+            try:
+                raw_items = _item_list(extract_json(text), self.keys)
+            except ValueError:
+                raw_items = []
+            if not raw_items:
+                # Truncated output: the first decodable value is then an inner
+                # item, not the list, so recover the complete items instead.
+                raw_items = _salvage_objects(text)
+                result.salvaged = bool(raw_items)
+                if not raw_items:
+                    result.invalid += 1
+                    result.errors.append("no JSON item list in output")
+
+            for raw in raw_items:
+                self._add_item(raw, result)
+
+        self._record(result)
+        return result
+
+    def stream(self) -> "ItemStream":
+        return ItemStream(self)
+
+    def _add_item(self, raw, result: ParsedItems) -> dict | None:
+        """Repair and validate one raw item; the valid item is also returned."""
+        if not isinstance(raw, dict):
+            result.invalid += 1
+            return None
+        try:
+            item = self.model.model_validate(raw).model_dump()
+        except ValidationError:
+            # Only items that fail are repaired; a valid item is kept as is.
+            try:
+                item = self.model.model_validate(self.repair(raw)).model_dump()
+            except ValidationError as e:
+                result.invalid += 1
+                result.errors.append(str(e.errors()[0].get("msg")))
+                return None
+            result.repaired += 1
+        result.items.append(item)
+        return item
+
+    def _record(self, result: ParsedItems):
+        self.outputs += 1
+        self.salvaged_outputs += result.salvaged
+        self.valid_items += len(result.items)
+        self.repaired_items += result.repaired
+        self.invalid_items += result.invalid
+
+    def dump(self, items: list[dict]) -> str:
+        return json.dumps({self.keys[0]: items}, ensure_ascii=False)
+
+    def stats(self) -> dict:
+        return {
+            "outputs": self.outputs,
+            "salvaged_outputs": self.salvaged_outputs,
+            "valid_items": self.valid_items,
+            "repaired_items": self.repaired_items,
+            "invalid_items": self.invalid_items,
+            "regenerated_items": self.regenerated_items,
+        }
+
+
+class ItemStream:
+    """
+    Incremental counterpart of ItemParser.parse for streamed output: `feed`
+    takes text deltas and returns each item of the item array as soon as its
+    closing brace arrives, already repaired and validated.
+
+    Only string/escape state and nesting depth are tracked, so every delta is
+    scanned once; an item is decoded only when it is complete.
+    """
+
+    def __init__(self, parser: ItemParser):
+        self.parser = parser
+        self.result = ParsedItems()
+        self._text: list[str] = []
+        self._pending = ""  # text of the item being received
+        self._depth = 0
+        self._array_depth: int | None = None
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> list[dict]:
+        self._text.append(text)
+        items = []
+        item_depth = None if self._array_depth is None else self._array_depth + 1
+        start = 0 if self._pending else None
+        for i, ch in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+                if ch == "[" and self._array_depth is None:
+                    # The first array is the item list (`{"questions": [`).
+                    self._array_depth = self._depth
+                    item_depth = self._depth + 1
+                elif ch == "{" and self._depth == item_depth:
+                    start = i
+            elif ch == "}" or ch == "]":
+                if ch == "}" and self._depth == item_depth and start is not None:
+                    raw = self._pending + text[start : i + 1]
+                    self._pending = ""
+                    start = None
+                    item = self._decode(raw)
+                    if item is not None:
+                        items.append(item)
+                self._depth -= 1
+        if start is not None:
+            self._pending += text[start:]
+        return items
+
+    def _decode(self, raw: str) -> dict | None:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            self.result.invalid += 1
+            self.result.errors.append("undecodable item")
+            return None
+        return self.parser._add_item(value, self.result)
+
+    def finish(self) -> list[dict]:
+        """
+        Close the stream. If nothing could be picked out incrementally (e.g. an
+        unexpected shape), the whole output is parsed once and returned.
+        """
+        if self.result.items or self.result.invalid:
+            self.parser._record(self.result)
+            return []
+        self.result = self.parser.parse("".join(self._text))
+        return self.result.items
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import Callable
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.logger import logger
+from app.core.metrics import ERRORS, LLM_UPSTREAM_IN_FLIGHT
+
+# Consecutive failed requests after which an upstream is taken out of rotation
+# until the next successful health probe.
+UNHEALTHY_AFTER_ERRORS = 3
+HEALTH_PROBE_TIMEOUT = 5.0
+# An affinity request leaves its preferred upstream only when that one has
+# more than this many outstanding requests above the least loaded upstream.
+AFFINITY_MAX_EXTRA_OUTSTANDING = 2
+
+
+def _is_upstream_failure(exc: BaseException) -> bool:
+    """Errors that say something about the upstream itself, not the request."""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response is not None and exc.response.status_code >= 500
+    return False
+
+
+class Upstream:
+    """One Ollama server and the endpoint URLs used on it."""
+
+    def __init__(self, endpoints: dict[str, str | None]):
+        self.endpoints = endpoints
+        first = next(url for url in endpoints.values() if url)
+        parts = urlsplit(first)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        # Per-upstream feature flags learned at runtime (e.g. batch embeddings).
+        self.capabilities: dict[str, bool] = {}
+        # Chat API flavour detected at startup ("ollama" / "openai").
+        self.protocol: str | None = None
+
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.affinity_hits = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.avg_latency_ms: float | None = None
+        self.last_error: str | None = None
+        self.last_probe: float | None = None
+
+    def url(self, endpoint: str) -> str | None:
+        return self.endpoints.get(endpoint)
+
+    def record_success(self, latency_ms: float):
+        self.consecutive_errors = 0
+        if self.avg_latency_ms is None:
+            self.avg_latency_ms = latency_ms
+        else:
+            self.avg_latency_ms = 0.8 * self.avg_latency_ms + 0.2 * latency_ms
+
+    def record_failure(self, exc: BaseException, pool_name: str):
+        self.errors += 1
+        self.consecutive_errors += 1
+        self.last_error = f"{type(exc).__name__}: {exc}"
+        if self.healthy and self.consecutive_errors >= UNHEALTHY_AFTER_ERRORS:
+            self.healthy = False
+            logger.warning(
+                "[UPSTREAM] %s %s marked unhealthy after %s errors",
+                pool_name,
+                self.origin,
+                self.consecutive_errors,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "origin": self.origin,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "affinity_hits": self.affinity_hits,
+            "errors": self.errors,
+            "avg_latency_ms": (
+                round(self.avg_latency_ms, 2)
+                if self.avg_latency_ms is not None
+                else None
+            ),
+            "last_error": self.last_error,
+            "capabilities": dict(self.capabilities),
+            "protocol": self.protocol,
+        }
+
+
+class UpstreamPool:
+    """
+    A set of interchangeable upstreams. Requests go to the healthy upstream
+    with the fewest outstanding requests (lower average latency breaks ties);
+    if none is healthy, the least loaded one is tried anyway.
+
+    Requests with an `affinity` key prefer the same upstream every time
+    (rendezvous hashing), so the upstream's prompt cache for that key is reused.
+    """
+
+    def __init__(self, name: str, upstreams: list[Upstream]):
+        self.name = name
+        self.upstreams = upstreams
+        self._probe_task: asyncio.Task | None = None
+
+    def pick(
+        self, exclude: tuple[Upstream, ...] = (), affinity: str | None = None
+    ) -> Upstream:
+        available = [u for u in self.upstreams if u not in exclude]
+        if not available:
+            raise RuntimeError(f"No upstream configured for {self.name}")
+        candidates = [u for u in available if u.healthy] or available
+        least_loaded = min(
+            candidates,
+            key=lambda u: (
+                u.outstanding,
+                u.avg_latency_ms if u.avg_latency_ms is not None else 0.0,
+            ),
+        )
+        if affinity is None or len(candidates) == 1:
+            return least_loaded
+
+        # Rendezvous hashing: removing an upstream only remaps its own keys.
+        preferred = max(
+            candidates,
+            key=lambda u: hashlib.sha256(f"{affinity}|{u.origin}".encode()).digest(),
+        )
+        extra = preferred.outstanding - least_loaded.outstanding
+        if extra > AFFINITY_MAX_EXTRA_OUTSTANDING:
+            return least_loaded
+        preferred.affinity_hits += 1
+        return preferred
+
+    @asynccontextmanager
+    async def acquire(
+        self, exclude: tuple[Upstream, ...] = (), affinity: str | None = None
+    ):
+        upstream = self.pick(exclude, affinity)
+        upstream.outstanding += 1
+        upstream.requests += 1
+        LLM_UPSTREAM_IN_FLIGHT.inc(pool=self.name, upstream=upstream.origin)
+        start = time.perf_counter()
+        try:
+            yield upstream
+        except Exception as exc:
+            ERRORS.inc(where=f"upstream.{self.name}", type=type(exc).__name__)
+            if _is_upstream_failure(exc):
+                upstream.record_failure(exc, self.name)
+            raise
+        else:
+            upstream.record_success((time.perf_counter() - start) * 1000)
+        finally:
+            upstream.outstanding -= 1
+            LLM_UPSTREAM_IN_FLIGHT.dec(pool=self.name, upstream=upstream.origin)
+
+    async def probe(self, client: httpx.AsyncClient):
+        async def check(upstream: Upstream):
+            try:
+                response = await client.get(
+                    f"{upstream.origin}/api/tags", timeout=HEALTH_PROBE_TIMEOUT
+                )
+                healthy = response.status_code < 500
+                error = None if healthy else f"HTTP {response.status_code}"
+            except httpx.HTTPError as exc:
+                healthy = False
+                error = f"{type(exc).__name__}: {exc}"
+
+            upstream.last_probe = time.time()
+            if healthy != upstream.healthy:
+                logger.info(
+                    "[UPSTREAM] %s %s is now %s",
+                    self.name,
+                    upstream.origin,
+                    "healthy" if healthy else f"unhealthy ({error})",
+                )
+            upstream.healthy = healthy
+            if healthy:
+                upstream.consecutive_errors = 0
+            else:
+                upstream.last_error = error
+
+        await asyncio.gather(*(check(u) for u in self.upstreams))
+
+    def start(self, get_client: Callable[[], httpx.AsyncClient], interval: float):
+        if self._probe_task is not None or interval <= 0:
+            return
+
+        async def loop():
+            while True:
+                await self.probe(get_client())
+                await asyncio.sleep(interval)
+
+        self._probe_task = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._probe_task is None:
+            return
+        self._probe_task.cancel()
+        await asyncio.gather(self._probe_task, return_exceptions=True)
+        self._probe_task = None
+
+    def stats(self) -> list[dict]:
+        return [u.stats() for u in self.upstreams]
@@ -0,0 +1,37 @@
+import base64
+import struct
+import sys
+from array import array
+
+# Struct codes for little-endian packing of each supported encoding.
+_FORMATS = {"float32": "f", "float16": "e"}
+
+
+def pack_vectors(vectors: list[list[float]], encoding: str) -> dict:
+    """
+    Pack a list of equal-length vectors into one base64 blob of little-endian
+    floats (row-major), so clients can decode it without parsing decimal text.
+    """
+    if encoding not in _FORMATS:
+        raise ValueError(f"Unsupported vector encoding: {encoding}")
+
+    dims = len(vectors[0]) if vectors else 0
+    if any(len(vector) != dims for vector in vectors):
+        raise ValueError("All vectors must have the same dimension")
+
+    flat = [value for vector in vectors for value in vector]
+    if encoding == "float32":
+        values = array("f", flat)
+        if sys.byteorder == "big":
+            values.byteswap()
+        raw = values.tobytes()
+    else:
+        raw = struct.pack(f"<{len(flat)}e", *flat)
+
+    return {
+        "encoding": encoding,
+        "count": len(vectors),
+        "dims": dims,
+        "data": base64.b64encode(raw).decode("ascii"),
+    }
+
@@ -0,0 +1,171 @@
+import glob
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.logger import logger
+
+_DOC_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+class DocumentNotIndexed(LookupError):
+    pass
+
+
+def _validate_doc_id(document_id: str) -> str:
+    if not _DOC_ID_RE.match(document_id):
+        raise ValueError(f"Invalid document id: {document_id!r}")
+    return document_id
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    Per-document chunk vectors stored as L2-normalized float32 `.npy` files and
+    opened with mmap, so cosine similarity is a single matrix-vector product.
+    Chunk metadata lives in a `.json` manifest with the same row order, which
+    also names the current vector file: replacing the manifest is the single
+    commit point of an update.
+    """
+
+    def __init__(self, directory: str, max_open_documents: int = 64):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_open_documents = max_open_documents
+        self._open: OrderedDict[str, tuple[np.ndarray, list[dict]]] = OrderedDict()
+        # upsert() and delete() run in worker threads (file I/O off the loop).
+        self._lock = threading.Lock()
+        self.searches = 0
+
+    def _paths(self, document_id: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, _validate_doc_id(document_id))
+        return f"{base}.npy", f"{base}.json"
+
+    def _vector_files(self, document_id: str) -> list[str]:
+        """Every vector file of a document, including ones left by a crash."""
+        vec_path, _ = self._paths(document_id)
+        versioned = os.path.join(self.directory, f"{document_id}.*.npy")
+        return glob.glob(versioned) + ([vec_path] if os.path.exists(vec_path) else [])
+
+    def upsert(
+        self, document_id: str, chunks: list[dict], vectors: list[list[float]]
+    ) -> int:
+        if len(chunks) != len(vectors):
+            raise ValueError("chunks and vectors must have the same length")
+        if not chunks:
+            raise ValueError("At least one chunk is required")
+
+        matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        _, meta_path = self._paths(document_id)
+        vec_name = f"{document_id}.{uuid.uuid4().hex[:12]}.npy"
+        vec_path = os.path.join(self.directory, vec_name)
+
+        # The vectors go to a new file first; the manifest pointing at it is
+        # swapped in last, so a crash leaves either the old index or the new one.
+        # The lock keeps a concurrent update from removing an uncommitted file.
+        with self._lock:
+            with open(f"{vec_path}.tmp", "wb") as f:
+                np.save(f, matrix)
+            os.replace(f"{vec_path}.tmp", vec_path)
+            with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {"vectors": vec_name, "chunks": chunks}, f, ensure_ascii=False
+                )
+            self._open.pop(document_id, None)
+            os.replace(f"{meta_path}.tmp", meta_path)
+            for path in self._vector_files(document_id):
+                if path != vec_path:
+                    os.remove(path)
+
+        logger.info(
+            "Vector index updated: %s (%s chunks, dim %s)",
+            document_id,
+            matrix.shape[0],
+            matrix.shape[1],
+        )
+        return int(matrix.shape[1])
+
+    def delete(self, document_id: str) -> bool:
+        _, meta_path = self._paths(document_id)
+        with self._lock:
+            self._open.pop(document_id, None)
+            removed = False
+            for path in [meta_path] + self._vector_files(document_id):
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed = True
+        return removed
+
+    def _load(self, document_id: str) -> tuple[np.ndarray, list[dict]]:
+        cached = self._open.get(document_id)
+        if cached is not None:
+            self._open.move_to_end(document_id)
+            return cached
+
+        vec_path, meta_path = self._paths(document_id)
+        if not os.path.exists(meta_path):
+            raise DocumentNotIndexed(document_id)
+        with open(meta_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            chunks = manifest["chunks"]
+            vec_path = os.path.join(self.directory, manifest["vectors"])
+        else:
+            # Indexes written before the manifest: bare chunk list + `<id>.npy`.
+            chunks = manifest
+        if not os.path.exists(vec_path):
+            raise DocumentNotIndexed(document_id)
+
+        matrix = np.load(vec_path, mmap_mode="r")
+        if matrix.ndim != 2 or matrix.shape[0] != len(chunks):
+            logger.warning(
+                "Vector index for %s is inconsistent (%s rows, %s chunks); "
+                "it has to be indexed again",
+                document_id,
+                matrix.shape[0],
+                len(chunks),
+            )
+            raise DocumentNotIndexed(document_id)
+
+        self._open[document_id] = (matrix, chunks)
+        while len(self._open) > self.max_open_documents:
+            self._open.popitem(last=False)
+        return matrix, chunks
+
+    def search(
+        self, document_id: str, query_vector: list[float], top_k: int
+    ) -> list[dict]:
+        matrix, chunks = self._load(document_id)
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            raise ValueError(
+                f"Query dimension {query.shape[0]} does not match index dimension {matrix.shape[1]}"
+            )
+        norm = float(np.linalg.norm(query))
+        if norm > 0:
+            query = query / norm
+
+        scores = matrix @ query
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        self.searches += 1
+        return [{**chunks[i], "score": float(scores[i])} for i in top]
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "open_documents": len(self._open),
+            "searches": self.searches,
+        }
@@ -0,0 +1,216 @@
+import json
+import re
+from collections import Counter
+
+from app.core.logger import logger
+from app.core.text import content_stems
+
+VERIFICATION_MODES = ("always", "never", "adaptive")
+VERIFICATION_KINDS = ("rag", "quiz", "flashcards")
+
+NO_CONTEXT_MARKER = "[BAĞLAM_KULLANILMADI]"
+ANSWER_LETTERS = ("A", "B", "C", "D")
+
+_OPTION_PREFIX_RE = re.compile(r"^\s*[A-Da-d]\s*[\)\.:-]\s+")
+
+
+def grounding_score(text: str, context_stems: set[str]) -> float:
+    """Fraction of the text's content words that also appear in the context."""
+    stems = content_stems(text)
+    if not stems:
+        return 1.0
+    return len(stems & context_stems) / len(stems)
+
+
+def _load_items(raw: str, keys: tuple[str, ...]) -> list | None:
+    try:
+        parsed = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        for key in keys:
+            if isinstance(parsed.get(key), list):
+                return parsed[key]
+    return None
+
+
+def _is_text(value) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def check_rag_answer(answer: str, context: str, threshold: float) -> list[str]:
+    if not answer.strip():
+        return ["empty_answer"]
+    if NO_CONTEXT_MARKER in answer:
+        # The model says it answered without the document; nothing to ground.
+        return []
+    if grounding_score(answer, content_stems(context)) < threshold:
+        return ["low_grounding"]
+    return []
+
+
+def check_quiz(draft_json: str, context: str, threshold: float) -> list[str]:
+    questions = _load_items(draft_json, ("questions", "quiz"))
+    if questions is None:
+        return ["invalid_json"]
+    if not questions:
+        return ["empty_result"]
+
+    reasons: set[str] = set()
+    context_stems = content_stems(context)
+    for q in questions:
+        if not isinstance(q, dict):
+            reasons.add("schema")
+            continue
+        options = q.get("options")
+        if (
+            not _is_text(q.get("question"))
+            or not _is_text(q.get("explanation"))
+            or not isinstance(options, list)
+            or len(options) != 4
+            or not all(_is_text(opt) for opt in options)
+        ):
+            reasons.add("schema")
+            continue
+        if any(_OPTION_PREFIX_RE.match(opt) for opt in options):
+            reasons.add("option_prefix")
+
+        answer = str(q.get("answer", "")).strip().upper()
+        if answer not in ANSWER_LETTERS:
+            reasons.add("answer_letter")
+            continue
+
+        correct = options[ANSWER_LETTERS.index(answer)]
+        if grounding_score(f"{q['question']} {correct}", context_stems) < threshold:
+            reasons.add("low_grounding")
+
+    return sorted(reasons)
+
+
+def check_flashcards(draft_json: str, context: str, threshold: float) -> list[str]:
+    cards = _load_items(draft_json, ("cards", "flashcards"))
+    if cards is None:
+        return ["invalid_json"]
+    if not cards:
+        return ["empty_result"]
+
+    reasons: set[str] = set()
+    context_stems = content_stems(context)
+    for card in cards:
+        if (
+            not isinstance(card, dict)
+            or not _is_text(card.get("front"))
+            or not _is_text(card.get("back"))
+        ):
+            reasons.add("schema")
+            continue
+        if (
+            grounding_score(f"{card['front']} {card['back']}", context_stems)
+            < threshold
+        ):
+            reasons.add("low_grounding")
+
+    return sorted(reasons)
+
+
+_CHECKS = {
+    "rag": check_rag_answer,
+    "quiz": check_quiz,
+    "flashcards": check_flashcards,
+}
+
+
+def _normalize(kind: str, text: str) -> str:
+    if kind != "rag":
+        try:
+            return json.dumps(json.loads(text), sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError):
+            pass
+    return " ".join(text.split())
+
+
+class _KindStats:
+    def __init__(self):
+        self.drafts = 0
+        self.verified = 0
+        self.skipped = 0
+        self.changed = 0
+        self.failed = 0
+        self.reasons: Counter[str] = Counter()
+
+    def as_dict(self) -> dict:
+        return {
+            "drafts": self.drafts,
+            "verified": self.verified,
+            "skipped": self.skipped,
+            "changed": self.changed,
+            "failed": self.failed,
+            "skip_rate": round(self.skipped / self.drafts, 4) if self.drafts else 0.0,
+            "change_rate": (
+                round(self.changed / self.verified, 4) if self.verified else 0.0
+            ),
+            "reasons": dict(self.reasons),
+        }
+
+
+class VerificationPolicy:
+    """
+    Decides whether a draft needs the second (verification) LLM pass.
+
+    always:   every draft is verified (previous behaviour)
+    never:    drafts are returned as-is
+    adaptive: cheap local checks run first; the verifier is only called when
+              one of them fails
+    """
+
+    def __init__(self, modes: dict[str, str], grounding_threshold: float):
+        for kind, mode in modes.items():
+            if mode not in VERIFICATION_MODES:
+                raise ValueError(f"Invalid verification mode for {kind}: {mode}")
+        self.modes = modes
+        self.grounding_threshold = grounding_threshold
+        self._stats = {kind: _KindStats() for kind in VERIFICATION_KINDS}
+
+    def should_verify(self, kind: str, draft: str, context: str) -> bool:
+        stats = self._stats[kind]
+        stats.drafts += 1
+        mode = self.modes.get(kind, "always")
+
+        if mode == "always":
+            verify = True
+        elif mode == "never":
+            verify = False
+        else:
+            reasons = _CHECKS[kind](draft, context, self.grounding_threshold)
+            stats.reasons.update(reasons)
+            verify = bool(reasons)
+            logger.info(
+                "[VERIFY] %s: %s",
+                kind,
+                (
+                    f"verifying ({', '.join(reasons)})"
+                    if verify
+                    else "local checks passed"
+                ),
+            )
+
+        if not verify:
+            stats.skipped += 1
+        return verify
+
+    def record_result(self, kind: str, draft: str, verified: str):
+        stats = self._stats[kind]
+        stats.verified += 1
+        if _normalize(kind, draft) != _normalize(kind, verified):
+            stats.changed += 1
+
+    def record_failure(self, kind: str):
+        self._stats[kind].failed += 1
+
+    def stats(self) -> dict:
+        return {
+            kind: {"mode": self.modes.get(kind, "always"), **stats.as_dict()}
+            for kind, stats in self._stats.items()
+        }
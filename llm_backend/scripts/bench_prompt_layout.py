@@ -0,0 +1,173 @@
+"""
+Prompt-eval benchmark: legacy vs. prefix-stable prompt layout for /rag/answer.
+
+Simulates several study sessions, each asking follow-up questions about its own
+document, against a pool of upstreams. Each simulated upstream keeps a few
+prompt-cache slots (OLLAMA_NUM_PARALLEL) the way Ollama does and only evaluates the part of a prompt
+after the longest prefix it already has cached, so the numbers show how much
+prompt evaluation each layout avoids (not real model quality or speed).
+
+Usage (from llm_backend/):
+    python scripts/bench_prompt_layout.py --sessions 4 --turns 6 --upstreams 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OLLAMA_URL", "http://bench.local/api/chat")
+os.environ.setdefault("VERIFICATION_MODE", "never")
+os.environ.setdefault("HISTORY_COMPACTION", "false")
+
+import httpx  # noqa: E402
+
+from app.services import llm_service  # noqa: E402
+from app.services.upstream_pool import Upstream, UpstreamPool  # noqa: E402
+
+SLOT_SIMILARITY = 0.5
+ANSWER = "Bu sorunun cevabı dokümanın ilgili bölümünde açıklanmıştır. " * 3
+
+
+class FakeUpstream:
+    """Prompt cache of one server: `slots` most recently used prompts."""
+
+    def __init__(self, slots: int):
+        self.slots: list[list[str]] = [[] for _ in range(slots)]
+        self.prompt_tokens = 0
+        self.evaluated_tokens = 0
+
+    def evaluate(self, messages: list[dict]) -> int:
+        tokens = []
+        for message in messages:
+            tokens.append(f"<{message['role']}>")
+            tokens.extend(message["content"].split())
+
+        def common_prefix(cached: list[str]) -> int:
+            n = 0
+            for a, b in zip(cached, tokens):
+                if a != b:
+                    break
+                n += 1
+            return n
+
+        # Like llama.cpp's server: take the slot sharing the longest prefix if it
+        # covers at least half of the prompt, otherwise the least recently used.
+        best = max(range(len(self.slots)), key=lambda i: common_prefix(self.slots[i]))
+        if common_prefix(self.slots[best]) < len(tokens) * SLOT_SIMILARITY:
+            best = 0
+        reused = common_prefix(self.slots[best])
+        self.slots.pop(best)
+        self.slots.append(tokens)
+
+        evaluated = len(tokens) - reused
+        self.prompt_tokens += len(tokens)
+        self.evaluated_tokens += evaluated
+        return evaluated
+
+
+def _make_transport(
+    servers: dict[str, FakeUpstream], latency_s: float, prompt_token_s: float
+) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        server = servers[request.url.host]
+        evaluated = server.evaluate(json.loads(request.content)["messages"])
+        prompt_eval_s = evaluated * prompt_token_s
+        await asyncio.sleep(latency_s + prompt_eval_s)
+        return httpx.Response(
+            200,
+            json={
+                "message": {"role": "assistant", "content": ANSWER},
+                "prompt_eval_count": evaluated,
+                "prompt_eval_duration": int(prompt_eval_s * 1e9),
+            },
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def _document(session: int) -> str:
+    paragraphs = [
+        f"Doküman {session}, bölüm {p}: "
+        + " ".join(f"kavram{session}_{p}_{w}" for w in range(60))
+        + "."
+        for p in range(12)
+    ]
+    return "\n\n---\n\n".join(paragraphs)
+
+
+async def _run(label: str, args, layout: str, affinity: bool) -> dict:
+    hosts = [f"gpu{i}.bench.local" for i in range(args.upstreams)]
+    servers = {host: FakeUpstream(args.slots) for host in hosts}
+    llm_service._client = httpx.AsyncClient(
+        transport=_make_transport(
+            servers, args.latency_ms / 1000, args.prompt_token_ms / 1000
+        )
+    )
+    llm_service.chat_pool = UpstreamPool(
+        "chat", [Upstream({"chat": f"http://{host}/api/chat"}) for host in hosts]
+    )
+    for upstream in llm_service.chat_pool.upstreams:
+        upstream.protocol = "ollama"
+    llm_service.PROMPT_LAYOUT = layout
+    llm_service.SESSION_AFFINITY = affinity
+
+    async def session(index: int):
+        context = _document(index)
+        history: list[dict] = []
+        for turn in range(args.turns):
+            question = f"Oturum {index}, soru {turn}: kavram{index}_{turn}_1 nedir?"
+            answer = await llm_service.ask_document(question, context, history)
+            history += [
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ]
+
+    start = time.perf_counter()
+    try:
+        # Sessions interleave turn by turn, like concurrent users would.
+        await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    finally:
+        await llm_service.close_client()
+    elapsed = time.perf_counter() - start
+
+    prompt_tokens = sum(s.prompt_tokens for s in servers.values())
+    evaluated = sum(s.evaluated_tokens for s in servers.values())
+    print(
+        f"{label:<34} {elapsed * 1000:9.1f} ms  prompt tokens {prompt_tokens:7d}  "
+        f"evaluated {evaluated:7d} ({evaluated / prompt_tokens:6.1%})"
+    )
+    return {"elapsed": elapsed, "evaluated": evaluated}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--upstreams", type=int, default=2)
+    parser.add_argument("--slots", type=int, default=4, help="cached prompts/server")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--prompt-token-ms", type=float, default=0.2)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("AI-COACH").setLevel(logging.WARNING)
+
+    print(
+        f"{args.sessions} sessions x {args.turns} turns, {args.upstreams} upstreams "
+        f"with {args.slots} cache slots, {args.prompt_token_ms}ms per prompt token"
+    )
+    legacy = await _run("legacy layout, least loaded", args, "legacy", False)
+    await _run("prefix layout, least loaded", args, "prefix", False)
+    prefix = await _run("prefix layout + session affinity", args, "prefix", True)
+    print(
+        f"prompt eval: x{legacy['evaluated'] / prefix['evaluated']:.1f} fewer tokens, "
+        f"wall time x{legacy['elapsed'] / prefix['elapsed']:.1f} faster"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,310 @@
+"""
+Fake Ollama server for load tests without a GPU.
+
+Speaks the endpoints llm_backend uses: /api/chat (streaming and not),
+/v1/chat/completions (SSE and not), /api/embeddings, /api/embed,
+/api/generate, /api/tags and /v1/models. Responses are synthetic but shaped
+like the real ones: JSON-mode requests get valid quiz/flashcard items in the
+requested count, verification requests get their draft back.
+
+Timing follows a simple model of one GPU: at most --parallel requests are
+served at once (like OLLAMA_NUM_PARALLEL, the rest wait), each pays
+--latency-ms plus prompt evaluation at --prompt-tokens-per-sec, and output
+tokens are produced at --tokens-per-sec. --error-rate makes that fraction of
+requests fail with HTTP 500.
+
+Usage (from llm_backend/):
+    python scripts/fake_ollama.py --port 11500 --tokens-per-sec 40 --parallel 4
+    OLLAMA_URL=http://127.0.0.1:11500/api/chat MODEL_NAME=fake uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "hücre enerji fotosentez ışık madde bitki yaprak zar su tuz protein "
+    "oksijen karbon kök gövde sistem yapı görev örnek bilgi konu"
+).split()
+
+_COUNT_RE = re.compile(r"(\d+)\s+adet")
+_DRAFT_RE = re.compile(r"JSON:\n(.*)\Z", re.DOTALL)
+
+
+class Settings:
+    latency_s = 0.05
+    prompt_tokens_per_sec = 2000.0
+    tokens_per_sec = 50.0
+    answer_tokens = 120
+    embed_item_s = 0.002
+    dims = 768
+    error_rate = 0.0
+    parallel = 4
+
+
+settings = Settings()
+app = FastAPI(title="Fake Ollama")
+_gpu: asyncio.Semaphore | None = None
+_counters = {"requests": 0, "errors": 0, "tokens": 0}
+
+
+def _slots() -> asyncio.Semaphore:
+    global _gpu
+    if _gpu is None:
+        _gpu = asyncio.Semaphore(max(1, settings.parallel))
+    return _gpu
+
+
+def _maybe_fail():
+    _counters["requests"] += 1
+    if settings.error_rate and random.random() < settings.error_rate:
+        _counters["errors"] += 1
+        raise HTTPException(status_code=500, detail="fake upstream error")
+
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+
+
+def _quiz_item(i: int) -> dict:
+    topic = " ".join(random.sample(WORDS, 3))
+    return {
+        "question": f"Soru {i + 1}: {topic} ile ilgili hangisi doğrudur?",
+        "options": [f"{random.choice(WORDS)} {j}" for j in range(4)],
+        "answer": random.choice("ABCD"),
+        "explanation": f"{topic} konusunda açıklama.",
+    }
+
+
+def _flashcard_item(i: int) -> dict:
+    topic = " ".join(random.sample(WORDS, 2))
+    return {"front": f"Kavram {i + 1}: {topic}", "back": f"{topic} tanımı."}
+
+
+def _reply(messages: list[dict], response_format) -> str:
+    """Synthetic answer text, or item JSON when JSON output was requested."""
+    last = str(messages[-1].get("content", "")) if messages else ""
+    if not response_format:
+        return " ".join(random.choices(WORDS, k=settings.answer_tokens)) + "."
+
+    draft = _DRAFT_RE.search(last)
+    if draft:
+        # Verification: the draft is already correct.
+        return draft.group(1).strip()
+    if isinstance(response_format, dict):
+        key = (response_format.get("required") or ["questions"])[0]
+    else:
+        system = str(messages[0].get("content", "")).lower() if messages else ""
+        key = "cards" if "flash" in system else "questions"
+    match = _COUNT_RE.search(last)
+    count = int(match.group(1)) if match else 5
+    make = _flashcard_item if key == "cards" else _quiz_item
+    return json.dumps(
+        {key: [make(i) for i in range(count)]}, ensure_ascii=False, indent=1
+    )
+
+
+def _chunks(text: str) -> list[str]:
+    """Token-sized pieces (roughly one word, like a real tokenizer stream)."""
+    return re.findall(r"\S*\s*", text)[:-1] or [text]
+
+
+async def _generate(messages: list[dict], response_format, stream: bool):
+    """Yields (piece, stats); stats is None until the last piece."""
+    async with _slots():
+        start = time.perf_counter()
+        prompt_tokens = _prompt_tokens(messages)
+        await asyncio.sleep(
+            settings.latency_s + prompt_tokens / settings.prompt_tokens_per_sec
+        )
+        pieces = _chunks(_reply(messages, response_format))
+        token_s = 1 / settings.tokens_per_sec
+        if stream:
+            for piece in pieces:
+                await asyncio.sleep(token_s)
+                yield piece, None
+        else:
+            await asyncio.sleep(token_s * len(pieces))
+        _counters["tokens"] += len(pieces)
+        elapsed = time.perf_counter() - start
+        yield "" if stream else "".join(pieces), {
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": len(pieces),
+            "eval_duration": int(token_s * len(pieces) * 1e9),
+            "total_duration": int(elapsed * 1e9),
+        }
+
+
+async def _complete(messages: list[dict], response_format) -> tuple[str, dict]:
+    # Run the generator to its end, so the slot is released before replying.
+    async for text, stats in _generate(messages, response_format, False):
+        pass
+    return text, stats
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": "fake", "model": "fake"}]}
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "fake", "object": "model"}]}
+
+
+@app.get("/stats")
+async def stats():
+    return _counters
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    _maybe_fail()
+    await asyncio.sleep(settings.latency_s)
+    return {"model": body.get("model"), "response": "", "done": True}
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    _maybe_fail()
+    messages = body.get("messages", [])
+    response_format = body.get("format")
+    model = body.get("model")
+
+    if not body.get("stream", True):
+        text, stats = await _complete(messages, response_format)
+        return {
+            "model": model,
+            "message": {"role": "assistant", "content": text},
+            "done": True,
+            **stats,
+        }
+
+    async def lines():
+        async for piece, stats in _generate(messages, response_format, True):
+            line = {"model": model, "message": {"role": "assistant", "content": piece}}
+            if stats is not None:
+                line.update(done=True, **stats)
+            else:
+                line["done"] = False
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    _maybe_fail()
+    messages = body.get("messages", [])
+    response_format = (body.get("response_format") or {}).get("json_schema", {}).get(
+        "schema"
+    ) or bool(body.get("response_format"))
+
+    def usage(stats: dict) -> dict:
+        return {
+            "prompt_tokens": stats["prompt_eval_count"],
+            "completion_tokens": stats["eval_count"],
+            "total_tokens": stats["prompt_eval_count"] + stats["eval_count"],
+        }
+
+    if not body.get("stream"):
+        text, stats = await _complete(messages, response_format)
+        return {
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage(stats),
+        }
+
+    async def events():
+        async for piece, stats in _generate(messages, response_format, True):
+            if stats is None:
+                chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            else:
+                chunk = {"choices": [], "usage": usage(stats)}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _vector(text: str) -> list[float]:
+    rng = random.Random(text)
+    vector = [rng.uniform(-1, 1) for _ in range(settings.dims)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+async def _embed(texts: list[str]) -> list[list[float]]:
+    async with _slots():
+        await asyncio.sleep(settings.latency_s + settings.embed_item_s * len(texts))
+    return [_vector(text) for text in texts]
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    _maybe_fail()
+    return {"embedding": (await _embed([str(body.get("prompt", ""))]))[0]}
+
+
+@app.post("/api/embed")
+async def embed(request: Request):
+    body = await request.json()
+    _maybe_fail()
+    inputs = body.get("input", [])
+    texts = [inputs] if isinstance(inputs, str) else [str(t) for t in inputs]
+    return {"model": body.get("model"), "embeddings": await _embed(texts)}
+
+
+@app.exception_handler(HTTPException)
+async def http_error(request: Request, exc: HTTPException):
+    return JSONResponse(status_code=exc.status_code, content={"error": exc.detail})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--embed-item-ms", type=float, default=2.0)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--parallel", type=int, default=4, help="requests served at once"
+    )
+    args = parser.parse_args()
+
+    settings.latency_s = args.latency_ms / 1000
+    settings.prompt_tokens_per_sec = args.prompt_tokens_per_sec
+    settings.tokens_per_sec = args.tokens_per_sec
+    settings.answer_tokens = args.answer_tokens
+    settings.embed_item_s = args.embed_item_ms / 1000
+    settings.dims = args.dims
+    settings.error_rate = args.error_rate
+    settings.parallel = args.parallel
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Load test for llm_backend: latency percentiles and throughput per endpoint.
+
+Every scenario (one endpoint, streaming or not) is run at each concurrency
+level: `--requests` requests are spread over that many concurrent clients.
+Reported per run: requests/sec, p50/p95/p99 latency, time to first byte for
+streaming endpoints, and failures (429 = rejected by the scheduler).
+
+Requests are made unique (message, context) so caches and request
+coalescing do not hide upstream work; pass --identical to measure them.
+
+Against a running backend:
+    python scripts/load_test.py --base-url http://127.0.0.1:8000
+
+Self-contained, with the fake Ollama (scripts/fake_ollama.py) and a backend
+started as subprocesses on free ports:
+    python scripts/load_test.py --spawn --concurrency 1,4,16 --requests 32
+    python scripts/load_test.py --spawn --scenarios chat,rag_quiz_stream \\
+        --fake-args "--tokens-per-sec 30 --error-rate 0.02"
+
+--json-out writes the results, e.g. to compare two commits.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONTEXT = "\n\n---\n\n".join(
+    f"Bölüm {i}: Fotosentez, bitkilerin ışık enerjisini kullanarak karbondioksit "
+    f"ve sudan glikoz ürettiği süreçtir. Kloroplastlarda gerçekleşir ve oksijen "
+    f"açığa çıkar. Konu {i} ile ilgili ayrıntılar bu bölümde açıklanmıştır."
+    for i in range(8)
+)
+
+
+def _unique(text: str, i: int, identical: bool) -> str:
+    return text if identical else f"{text} (#{i})"
+
+
+# name -> (method, path, streamed, body(i, identical))
+SCENARIOS = {
+    "chat": (
+        "POST",
+        "/chat",
+        False,
+        lambda i, same: {"message": _unique("Fotosentez nedir?", i, same)},
+    ),
+    "chat_stream": (
+        "POST",
+        "/chat",
+        True,
+        lambda i, same: {
+            "message": _unique("Fotosentez nedir?", i, same),
+            "stream": True,
+            "stream_format": "ndjson",
+        },
+    ),
+    "rag_answer": (
+        "POST",
+        "/rag/answer",
+        False,
+        lambda i, same: {
+            "question": _unique("Fotosentez nerede gerçekleşir?", i, same),
+            "context": CONTEXT,
+        },
+    ),
+    "rag_answer_stream": (
+        "POST",
+        "/rag/answer",
+        True,
+        lambda i, same: {
+            "question": _unique("Fotosentez nerede gerçekleşir?", i, same),
+            "context": CONTEXT,
+            "stream": True,
+            "stream_format": "ndjson",
+        },
+    ),
+    "rag_quiz": (
+        "POST",
+        "/rag/quiz",
+        False,
+        lambda i, same: {
+            "context": _unique(CONTEXT, i, same),
+            "count": 5,
+            "use_cache": same,
+        },
+    ),
+    "rag_quiz_stream": (
+        "POST",
+        "/rag/quiz",
+        True,
+        lambda i, same: {
+            "context": _unique(CONTEXT, i, same),
+            "count": 5,
+            "use_cache": same,
+            "stream": True,
+        },
+    ),
+    "rag_flashcards": (
+        "POST",
+        "/rag/flashcards",
+        False,
+        lambda i, same: {
+            "context": _unique(CONTEXT, i, same),
+            "count": 5,
+            "use_cache": same,
+        },
+    ),
+    "rag_flashcards_stream": (
+        "POST",
+        "/rag/flashcards",
+        True,
+        lambda i, same: {
+            "context": _unique(CONTEXT, i, same),
+            "count": 5,
+            "use_cache": same,
+            "stream": True,
+        },
+    ),
+    "rag_embeddings": (
+        "POST",
+        "/rag/embeddings",
+        False,
+        lambda i, same: {
+            "texts": [_unique(f"Parça {j}: {CONTEXT[:300]}", i, same) for j in range(8)]
+        },
+    ),
+    "rag_search": (
+        "POST",
+        "/rag/search",
+        False,
+        lambda i, same: {
+            "document_id": "load-test",
+            "query": _unique("kloroplast", i, same),
+            "top_k": 5,
+        },
+    ),
+}
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+async def _one(
+    client: httpx.AsyncClient, scenario: str, i: int, identical: bool
+) -> dict:
+    method, path, streamed, body = SCENARIOS[scenario]
+    start = time.perf_counter()
+    ttfb = None
+    received = bytearray()
+    try:
+        async with client.stream(method, path, json=body(i, identical)) as response:
+            async for chunk in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                received += chunk
+            status = response.status_code
+            if streamed and status < 400 and b'"event": "error"' in received:
+                status = 599  # failed after the response had started
+    except httpx.HTTPError as exc:
+        return {"status": None, "error": type(exc).__name__}
+    return {
+        "status": status,
+        "latency": time.perf_counter() - start,
+        "ttfb": ttfb if streamed else None,
+    }
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: str,
+    concurrency: int,
+    requests: int,
+    identical: bool,
+) -> dict:
+    results: list[dict] = []
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            results.append(await _one(client, scenario, i, identical))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["status"] is not None and r["status"] < 400]
+    latencies = [r["latency"] for r in ok]
+    ttfbs = [r["ttfb"] for r in ok if r.get("ttfb") is not None]
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(r["status"] == 429 for r in results),
+        "failed": len(results) - len(ok) - sum(r["status"] == 429 for r in results),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "ttfb_p50_ms": ms(percentile(ttfbs, 50)),
+        "ttfb_p95_ms": ms(percentile(ttfbs, 95)),
+    }
+
+
+def _print_row(row: dict):
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print(
+        f"{row['scenario']:<22} {row['concurrency']:>4} {row['ok']:>4}/{row['requests']:<4}"
+        f" {row['rejected']:>4} {row['failed']:>4} {fmt(row['rps']):>8}"
+        f" {fmt(row['p50_ms']):>9} {fmt(row['p95_ms']):>9} {fmt(row['p99_ms']):>9}"
+        f" {fmt(row['ttfb_p50_ms']):>9} {fmt(row['ttfb_p95_ms']):>9}"
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+
+@contextmanager
+def spawned_servers(fake_args: str, backend_env: list[str]):
+    """Fake Ollama + backend subprocesses; yields the backend's base URL."""
+    fake_port, backend_port = _free_port(), _free_port()
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    env = {
+        **os.environ,
+        "OLLAMA_URL": f"http://127.0.0.1:{fake_port}/api/chat",
+        "MODEL_NAME": "fake",
+        "VECTOR_INDEX_DIR": os.path.join(workdir, "index"),
+        "LOG_LEVEL": "WARNING",
+    }
+    for item in backend_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    # Server output (e.g. errors injected with --error-rate) would garble the table.
+    log_path = os.path.join(workdir, "servers.log")
+    print(f"server output: {log_path}")
+    log = open(log_path, "w", encoding="utf-8")
+    output = {"stdout": log, "stderr": subprocess.STDOUT}
+
+    fake = subprocess.Popen(
+        [sys.executable, "scripts/fake_ollama.py", "--port", str(fake_port)]
+        + shlex.split(fake_args),
+        cwd=ROOT,
+        **output,
+    )
+    backend = None
+    try:
+        _wait_ready(f"http://127.0.0.1:{fake_port}/api/tags", fake)
+        backend = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app"]
+            + ["--port", str(backend_port), "--log-level", "warning"],
+            cwd=ROOT,
+            env=env,
+            **output,
+        )
+        base_url = f"http://127.0.0.1:{backend_port}"
+        _wait_ready(f"{base_url}/health", backend)
+        yield base_url
+    finally:
+        for process in (backend, fake):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+        log.close()
+
+
+async def _index_search_document(client: httpx.AsyncClient) -> bool:
+    chunks = [
+        {"id": f"c{i}", "text": text, "index": i}
+        for i, text in enumerate(CONTEXT.split("\n\n---\n\n"))
+    ]
+    response = await client.put("/rag/index/load-test", json={"chunks": chunks})
+    return response.status_code == 200
+
+
+async def main_async(args) -> list[dict]:
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    limits = httpx.Limits(max_connections=max(levels) + 8)
+    rows = []
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout, limits=limits
+    ) as client:
+        if "rag_search" in scenarios and not await _index_search_document(client):
+            print("rag_search skipped: vector index disabled (VECTOR_INDEX_DIR)")
+            scenarios.remove("rag_search")
+
+        print(
+            f"{'scenario':<22} {'conc':>4} {'ok':>9} {'429':>4} {'fail':>4}"
+            f" {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+            f" {'ttfb p50':>9} {'ttfb p95':>9}"
+        )
+        for scenario in scenarios:
+            for concurrency in levels:
+                requests = max(args.requests, concurrency)
+                row = await run_level(
+                    client, scenario, concurrency, requests, args.identical
+                )
+                _print_row(row)
+                rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=32, help="per level")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--identical", action="store_true")
+    parser.add_argument("--json-out")
+    parser.add_argument("--spawn", action="store_true")
+    parser.add_argument("--fake-args", default="", help="for fake_ollama.py")
+    parser.add_argument(
+        "--backend-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="extra backend settings with --spawn",
+    )
+    args = parser.parse_args()
+
+    if args.spawn:
+        with spawned_servers(args.fake_args, args.backend_env) as base_url:
+            args.base_url = base_url
+            rows = asyncio.run(main_async(args))
+    else:
+        rows = asyncio.run(main_async(args))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"base_url": args.base_url, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
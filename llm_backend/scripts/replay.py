@@ -0,0 +1,275 @@
+"""
+Replays traffic recorded with CAPTURE_TRAFFIC=true against a running backend.
+
+Requests are re-sent with their original method, path, query, body and
+Accept/Content-Type headers, at their original spacing divided by --speed
+(--speed 0: as fast as --concurrency allows). --copies N sends every request
+N times (each copy starts at the same offset) to scale the captured load up.
+
+Reported per route: requests, failures, status codes that differ from the
+capture, and p50/p95/p99 latency and time to first byte, captured vs
+replayed. The backend's /stats is read before and after the run and the
+change in every cache hit/miss counter is printed, so the same capture can
+compare latency and cache behaviour before and after a change.
+
+Usage (from llm_backend/):
+    python scripts/replay.py logs/capture/capture-*.jsonl --speed 2
+    python scripts/replay.py capture.jsonl --spawn --speed 0 --concurrency 16
+    python scripts/replay.py capture.jsonl --paths /rag/quiz --copies 4 \\
+        --json-out after.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.capture import load_capture  # noqa: E402
+from load_test import percentile, spawned_servers  # noqa: E402
+
+# An error event in a stream that had already started with status 200: an
+# `event: error` frame for SSE, an {"event": "error", ...} line for NDJSON.
+_SSE_ERROR_RE = re.compile(rb"^event: error\r?$", re.MULTILINE)
+_NDJSON_ERROR = b'"event": "error"'
+
+
+def _stream_failed(content_type: str, body: bytes) -> bool:
+    if content_type.startswith("text/event-stream"):
+        return _SSE_ERROR_RE.search(body) is not None
+    return _NDJSON_ERROR in body
+
+
+async def _send(client: httpx.AsyncClient, entry: dict) -> dict:
+    headers = dict(entry.get("headers") or {})
+    body = entry.get("request")
+    if body is None:
+        content = None
+    elif isinstance(body, str):
+        content = body.encode("utf-8")
+    else:
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+
+    start = time.perf_counter()
+    ttfb = None
+    received = bytearray()
+    try:
+        async with client.stream(
+            entry["method"], url, content=content, headers=headers
+        ) as response:
+            async for chunk in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                received += chunk
+            status = response.status_code
+            content_type = response.headers.get("content-type", "")
+            if status < 400 and _stream_failed(content_type, bytes(received)):
+                status = 599  # failed after the response had started
+    except httpx.HTTPError as exc:
+        return {"status": None, "error": type(exc).__name__}
+    return {
+        "status": status,
+        "latency": time.perf_counter() - start,
+        "ttfb": ttfb,
+    }
+
+
+async def replay(
+    client: httpx.AsyncClient,
+    entries: list[dict],
+    speed: float,
+    copies: int,
+    concurrency: int,
+) -> tuple[list[tuple[dict, dict]], float]:
+    """Sends every entry `copies` times on the captured schedule."""
+    slots = asyncio.Semaphore(concurrency)
+    t0 = entries[0]["ts"]
+    start = time.perf_counter()
+    results: list[tuple[dict, dict]] = []
+
+    async def one(entry: dict):
+        if speed > 0:
+            delay = (entry["ts"] - t0) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with slots:
+            results.append((entry, await _send(client, entry)))
+
+    await asyncio.gather(*(one(entry) for entry in entries for _ in range(copies)))
+    return results, time.perf_counter() - start
+
+
+def summarize(results: list[tuple[dict, dict]]) -> list[dict]:
+    routes: dict[str, list[tuple[dict, dict]]] = {}
+    for entry, result in results:
+        routes.setdefault(entry.get("route") or entry["path"], []).append(
+            (entry, result)
+        )
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    rows = []
+    for route, pairs in sorted(routes.items()):
+        ok = [(e, r) for e, r in pairs if r["status"] is not None and r["status"] < 400]
+        captured = [e["duration_ms"] / 1000 for e, _ in pairs]
+        captured_ttfb = [
+            e["ttfb_ms"] / 1000 for e, _ in pairs if e.get("ttfb_ms") is not None
+        ]
+        latencies = [r["latency"] for _, r in ok]
+        ttfbs = [r["ttfb"] for _, r in ok if r.get("ttfb") is not None]
+        rows.append(
+            {
+                "route": route,
+                "requests": len(pairs),
+                "failed": len(pairs) - len(ok),
+                "status_changed": sum(
+                    e.get("status") is not None and e["status"] != r["status"]
+                    for e, r in pairs
+                ),
+                "captured_p50_ms": ms(percentile(captured, 50)),
+                "p50_ms": ms(percentile(latencies, 50)),
+                "captured_p95_ms": ms(percentile(captured, 95)),
+                "p95_ms": ms(percentile(latencies, 95)),
+                "captured_p99_ms": ms(percentile(captured, 99)),
+                "p99_ms": ms(percentile(latencies, 99)),
+                "captured_ttfb_p50_ms": ms(percentile(captured_ttfb, 50)),
+                "ttfb_p50_ms": ms(percentile(ttfbs, 50)),
+            }
+        )
+    return rows
+
+
+def _print_row(row: dict):
+    def fmt(value):
+        return "-" if value is None else f"{value:.0f}"
+
+    def pair(name: str) -> str:
+        text = f"{fmt(row[f'captured_{name}'])} → {fmt(row[name])}"
+        return f"{text:>15}"
+
+    print(
+        f"{row['route']:<28} {row['requests']:>5} {row['failed']:>5}"
+        f" {row['status_changed']:>7} {pair('p50_ms')} {pair('p95_ms')}"
+        f" {pair('p99_ms')} {pair('ttfb_p50_ms')}"
+    )
+
+
+def _cache_counters(stats, prefix: str = "") -> dict[str, float]:
+    """Flattened numeric /stats fields whose name mentions hits or misses."""
+    counters = {}
+    if isinstance(stats, dict):
+        for key, value in stats.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict):
+                counters.update(_cache_counters(value, f"{name}."))
+            elif (
+                isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and ("hit" in key or "miss" in key)
+            ):
+                counters[name] = value
+    return counters
+
+
+async def _read_stats(client: httpx.AsyncClient) -> dict:
+    try:
+        response = await client.get("/stats")
+        return response.json() if response.status_code == 200 else {}
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+async def main_async(args, entries: list[dict]) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 8)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout, limits=limits
+    ) as client:
+        before = _cache_counters(await _read_stats(client))
+        results, elapsed = await replay(
+            client, entries, args.speed, args.copies, args.concurrency
+        )
+        after = _cache_counters(await _read_stats(client))
+
+    rows = summarize(results)
+    span = entries[-1]["ts"] - entries[0]["ts"]
+    print(
+        f"{len(results)} requests in {elapsed:.1f}s"
+        f" (captured: {len(entries)} in {span:.1f}s)"
+    )
+    print(
+        f"{'route':<28} {'reqs':>5} {'fail':>5} {'status≠':>7}"
+        f" {'p50 ms':>15} {'p95 ms':>15} {'p99 ms':>15} {'ttfb p50':>15}"
+    )
+    for row in rows:
+        _print_row(row)
+
+    caches = {
+        name: after[name] - before.get(name, 0)
+        for name in sorted(after)
+        if after[name] != before.get(name, 0)
+    }
+    if caches:
+        print("cache counters (change during replay):")
+        for name, delta in caches.items():
+            print(f"  {name:<48} {delta:>+8g}")
+    return {"elapsed_s": round(elapsed, 2), "routes": rows, "caches": caches}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("captures", nargs="+", help="capture-*.jsonl files")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="0 = as fast as possible"
+    )
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=64, help="in flight")
+    parser.add_argument("--paths", default="", help="comma-separated path prefixes")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json-out")
+    parser.add_argument("--spawn", action="store_true")
+    parser.add_argument("--fake-args", default="", help="for fake_ollama.py")
+    parser.add_argument(
+        "--backend-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="extra backend settings with --spawn",
+    )
+    args = parser.parse_args()
+    # app.core.logger (imported for load_capture) would log every request.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    entries = [entry for path in args.captures for entry in load_capture(path)]
+    prefixes = tuple(p.strip() for p in args.paths.split(",") if p.strip())
+    if prefixes:
+        entries = [e for e in entries if e["path"].startswith(prefixes)]
+    if not entries:
+        raise SystemExit("No captured requests to replay")
+    entries.sort(key=lambda e: e["ts"])
+
+    if args.spawn:
+        with spawned_servers(args.fake_args, args.backend_env) as base_url:
+            args.base_url = base_url
+            report = asyncio.run(main_async(args, entries))
+    else:
+        report = asyncio.run(main_async(args, entries))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
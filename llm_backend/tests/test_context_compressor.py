@@ -0,0 +1,22 @@
+from app.core.text import estimate_tokens
+from app.services.context_compressor import ContextCompressor
+
+
+def test_context_within_budget_is_unchanged():
+    context = "Başlık\n- madde bir.\n- madde iki\n\n| a | b |\n| 1 | 2 |"
+    result = ContextCompressor(True, 10_000).compress(context, "madde")
+    assert result.text == context
+
+
+def test_dropping_sentences_keeps_line_breaks():
+    context = "Fotosentez nedir.\nBitki ışık kullanır.\nBaşka bir cümle burada."
+    result = ContextCompressor(True, 12).compress(context, "fotosentez ışık")
+    assert result.text == "Fotosentez nedir.\nBitki ışık kullanır."
+
+
+def test_text_without_sentence_breaks_is_cut_not_emptied():
+    context = " ".join(f"kelime{i}" for i in range(2000))
+    result = ContextCompressor(True, 100).compress(context, "soru")
+    assert result.text
+    assert context.startswith(result.text)
+    assert 0 < estimate_tokens(result.text) <= 100
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.language import LanguageDetector, explicit_language
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Python lists are mutable sequences. Use list comprehensions to build "
+        "them concisely.",
+        "Database indexes accelerate queries. Normalization reduces redundancy "
+        "across tables.",
+        "Transactions guarantee atomicity, consistency, isolation and durability.",
+    ],
+)
+def test_technical_english_is_english(text):
+    assert LanguageDetector(0, 0).detect(text) == "English"
+
+
+@pytest.mark.parametrize(
+    "language, text",
+    [
+        ("Türkçe", "Veritabanı indeksleri sorguları hızlandırır ve tekrarı azaltır."),
+        (
+            "Français",
+            "Les index accélèrent les requêtes et la normalisation réduit la redondance dans les tables.",
+        ),
+        (
+            "Deutsch",
+            "Die Mannschaft hat am Samstag das Spiel gegen den Tabellenführer gewonnen.",
+        ),
+    ],
+)
+def test_prose_keeps_its_language(language, text):
+    assert LanguageDetector(0, 0).detect(text) == language
+
+
+@pytest.mark.parametrize(
+    "instructions, language",
+    [
+        ("English", "English"),
+        ("Please answer in English.", "English"),
+        ("Turkish", "Türkçe"),
+        ("Bunu İngilizceye çevir", "English"),
+        ("answer in french", "Français"),
+        ("Questions about the French Revolution", None),
+    ],
+)
+def test_explicit_language(instructions, language):
+    assert explicit_language(instructions) == language
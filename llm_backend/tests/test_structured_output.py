@@ -0,0 +1,38 @@
+from app.models.chat_models import QuizQuestion
+from app.services.structured_output import ItemParser, repair_quiz_question
+
+
+def _question(options, answer="A"):
+    return {
+        "question": "Hangisi?",
+        "options": options,
+        "answer": answer,
+        "explanation": "",
+    }
+
+
+def test_option_text_starting_with_a_letter_is_kept():
+    options = ["B-lenfositler", "A vitamini", "C. elegans", "D-glukoz"]
+    repaired = repair_quiz_question(_question(options, "C. elegans"))
+    assert repaired["options"] == options
+    assert repaired["answer"] == "C"
+
+
+def test_sequential_labels_are_stripped():
+    options = ["A) Mitokondri", "B) Ribozom", "C) Golgi", "D) Lizozom"]
+    repaired = repair_quiz_question(_question(options, "B) Ribozom"))
+    assert repaired["options"] == ["Mitokondri", "Ribozom", "Golgi", "Lizozom"]
+    assert repaired["answer"] == "B"
+
+
+def test_valid_items_are_not_repaired():
+    parser = ItemParser(
+        "quiz", QuizQuestion, ("questions",), repair_quiz_question, "question"
+    )
+    valid = _question(["B-lenfositler", "A vitamini", "C. elegans", "D-glukoz"])
+    broken = _question(["A) Bir", "B) İki", "C) Üç", "D) Dört"], "b")
+    result = parser.parse(parser.dump([valid, broken]))
+    assert result.items[0]["options"] == valid["options"]
+    assert result.items[1]["options"] == ["Bir", "İki", "Üç", "Dört"]
+    assert result.items[1]["answer"] == "B"
+    assert result.repaired == 1